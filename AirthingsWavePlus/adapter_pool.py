@@ -0,0 +1,130 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import time
+
+from Metrics.metrics_registry import REGISTRY
+
+ADAPTER_STRATEGIES = ('least_loaded', 'rssi', 'static')
+
+ADAPTER_CONNECTIONS = REGISTRY.gauge("airthings_adapter_connections", "Reads running or waiting on an adapter",
+                                     ("adapter",))
+ADAPTER_STALLS = REGISTRY.counter("airthings_adapter_stalls_total", "Times an adapter was marked as stalled",
+                                  ("adapter",))
+
+
+class AdapterStallError(Exception):
+    pass
+
+
+class BluetoothAdapter:
+    def __init__(self, name=None, max_concurrent_connections=1):
+        self.name = name
+        self.max_concurrent_connections = max(1, max_concurrent_connections)
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_connections)
+        self.assigned = 0
+        self.reads = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.stalls = 0
+        self.stalled_until = 0
+
+    def get_label(self):
+        return self.name if self.name is not None else "default"
+
+    def is_stalled(self):
+        return time.monotonic() < self.stalled_until
+
+    def get_load(self):
+        return self.assigned / self.max_concurrent_connections
+
+    def acquire(self):
+        self.assigned += 1
+        ADAPTER_CONNECTIONS.set(self.assigned, self.get_label())
+
+    def release(self):
+        self.assigned -= 1
+        ADAPTER_CONNECTIONS.set(self.assigned, self.get_label())
+
+    def to_dict(self):
+        return {
+            "max_concurrent_connections": self.max_concurrent_connections,
+            "assigned": self.assigned,
+            "reads": self.reads,
+            "failures": self.failures,
+            "stalls": self.stalls,
+            "stalled": self.is_stalled()
+        }
+
+
+class AdapterPool:
+    def __init__(self, adapters, strategy='least_loaded', stall_timeout=60, failover_threshold=3, stall_cooldown=300):
+        self.class_name = "AdapterPool"
+        if strategy not in ADAPTER_STRATEGIES:
+            raise Exception("Unknown adapter strategy: {0}. Use one of: {1}".format(
+                strategy, ", ".join(ADAPTER_STRATEGIES)))
+        self.adapters = adapters
+        self.adapters_by_name = {adapter.name: adapter for adapter in adapters}
+        self.strategy = strategy
+        self.stall_timeout = stall_timeout
+        self.failover_threshold = failover_threshold
+        self.stall_cooldown = stall_cooldown
+
+    def get_adapter_names(self):
+        return [adapter.name for adapter in self.adapters]
+
+    def select(self, rssi_by_adapter=None, static_adapter=None, excluded_adapters=()):
+        candidates = [adapter for adapter in self.adapters if adapter not in excluded_adapters]
+        healthy_candidates = [adapter for adapter in candidates if not adapter.is_stalled()]
+        # When every adapter is stalled, reads are still attempted rather than dropped
+        candidates = healthy_candidates if healthy_candidates else candidates
+        if not candidates:
+            return None
+
+        if self.strategy == 'static' and static_adapter is not None:
+            adapter = self.adapters_by_name.get(static_adapter)
+            if adapter in candidates:
+                return adapter
+        elif self.strategy == 'rssi' and rssi_by_adapter:
+            in_range_candidates = [adapter for adapter in candidates if rssi_by_adapter.get(adapter.name) is not None]
+            if in_range_candidates:
+                return max(in_range_candidates,
+                           key=lambda adapter: (rssi_by_adapter[adapter.name], -adapter.get_load()))
+        return min(candidates, key=lambda adapter: adapter.get_load())
+
+    def on_success(self, adapter):
+        adapter.reads += 1
+        adapter.consecutive_failures = 0
+
+    def on_failure(self, adapter, stalled=False):
+        log = logging.getLogger(self.class_name + ".on_failure")
+        adapter.failures += 1
+        adapter.consecutive_failures += 1
+        if not stalled and adapter.consecutive_failures < self.failover_threshold:
+            return False
+        # Devices fail over to the other adapters until the cooldown expires
+        adapter.stalls += 1
+        adapter.consecutive_failures = 0
+        adapter.stalled_until = time.monotonic() + self.stall_cooldown
+        ADAPTER_STALLS.inc(adapter.get_label())
+        log.warning("Adapter {0} stalled, not used for {1}s".format(adapter.get_label(), self.stall_cooldown))
+        return True
+
+    def to_dict(self):
+        return {adapter.get_label(): adapter.to_dict() for adapter in self.adapters}
@@ -0,0 +1,81 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import functools
+import logging
+from datetime import datetime
+
+from bleak import BleakScanner
+
+from AirthingsWavePlus.airthings_wave_plus import AIRTHINGS_COMPANY_ID, get_adapter_kwargs
+
+
+class AdvertisementUpdate:
+    def __init__(self, bluetooth_mac_address, serial_number, rssi, timestamp):
+        self.bluetooth_mac_address = bluetooth_mac_address
+        self.serial_number = serial_number
+        self.rssi = rssi
+        self.timestamp = timestamp
+
+
+class AdvertisementListener:
+    def __init__(self, discovery_cache, on_advertisement=None, adapters=None):
+        self.class_name = "AdvertisementListener"
+        self.discovery_cache = discovery_cache
+        self.on_advertisement = on_advertisement
+        self.adapters = adapters if adapters else [None]
+        self.scanners = []
+        self.advertisement_count = 0
+
+    def __detection_callback(self, adapter, device, advertisement_data):
+        log = logging.getLogger(self.class_name + ".__detection_callback")
+        # Wave Plus only advertises its serial number, sensor values have to be read over GATT
+        if AIRTHINGS_COMPANY_ID not in advertisement_data.manufacturer_data:
+            return
+
+        entry = self.discovery_cache.put(device, advertisement_data.manufacturer_data, advertisement_data.rssi, adapter)
+        self.advertisement_count += 1
+        log.debug("Advertisement from {0} ({1}), RSSI: {2}".format(
+            entry.mac_address, entry.serial_number, entry.rssi))
+
+        if self.on_advertisement is not None:
+            try:
+                self.on_advertisement(AdvertisementUpdate(entry.mac_address,
+                                                          entry.serial_number,
+                                                          entry.rssi,
+                                                          datetime.now()))
+            except Exception as e:
+                log.error("Error during processing of advertisement: {0}".format(str(e)))
+
+    async def start(self):
+        log = logging.getLogger(self.class_name + ".start")
+        for adapter in self.adapters:
+            scanner = BleakScanner(detection_callback=functools.partial(self.__detection_callback, adapter),
+                                   **get_adapter_kwargs(adapter))
+            await scanner.start()
+            self.scanners.append(scanner)
+        log.info("Listening for advertisements on {0} adapter(s)...".format(len(self.scanners)))
+
+    async def stop(self):
+        log = logging.getLogger(self.class_name + ".stop")
+        if not self.scanners:
+            return
+        for scanner in self.scanners:
+            await scanner.stop()
+        self.scanners = []
+        log.info("Stopped listening for advertisements [{0} advertisement(s) received].".format(
+            self.advertisement_count))
@@ -22,8 +22,9 @@ from datetime import datetime
 
 from bleak import BleakScanner, BleakClient
 
-from AirthingsWavePlus.sensor_measurement import SensorMeasurement
 from AirthingsWavePlus.sensor_measurements import SensorMeasurements
+from Metrics.metrics_registry import REGISTRY
+from Tracing.tracer import start_span
 
 # Handle 02: 00002a00-0000-1000-8000-00805f9b34fb (Handle: 2): Device Name
 GATT_CHAR_HANDLE_DEVICE_NAME = "00002a00-0000-1000-8000-00805f9b34fb"
@@ -31,10 +32,14 @@ GATT_CHAR_HANDLE_DEVICE_NAME = "00002a00-0000-1000-8000-00805f9b34fb"
 # Handle 12: b42e2a68-ade7-11e4-89d3-123b93f75cba (Handle: 12): Current Sensor ValuesOAD Extended Control
 GATT_CHAR_HANDLE_CURRENT_SENSOR_VALUES = "b42e2a68-ade7-11e4-89d3-123b93f75cba"
 CURRENT_SENSOR_VALUES_FORMAT = '<BBBBHHHHHHHH'
+CURRENT_SENSOR_VALUES_STRUCT = struct.Struct(CURRENT_SENSOR_VALUES_FORMAT)
 
 # Handle 15: b42e2d06-ade7-11e4-89d3-123b93f75cba (Handle: 15): Access Control Point
 GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT = "b42e2d06-ade7-11e4-89d3-123b93f75cba"
 ACCESS_CONTROL_POINT_RESPONSE_FORMAT = '<L12B6H'
+ACCESS_CONTROL_POINT_RESPONSE_STRUCT = struct.Struct(ACCESS_CONTROL_POINT_RESPONSE_FORMAT)
+# Access control point response starts with a 2-byte header
+ACCESS_CONTROL_POINT_RESPONSE_OFFSET = 2
 
 # Handle 39: 00002a24-0000-1000-8000-00805f9b34fb (Handle: 39): Model Number String
 GATT_CHAR_HANDLE_DEVICE_MODEL_NUMBER_STRING = "00002a24-0000-1000-8000-00805f9b34fb"
@@ -48,26 +53,54 @@ GATT_CHAR_HANDLE_DEVICE_HARDWARE_REVISION_STRING = "00002a27-0000-1000-8000-0080
 # Handle 47: 00002a29-0000-1000-8000-00805f9b34fb (Handle: 47): Manufacturer Name String
 GATT_CHAR_HANDLE_DEVICE_MANUFACTURER_NAME_STRING = "00002a29-0000-1000-8000-00805f9b34fb"
 
+# Static device info retrieved from GATT characteristics above, cached between readings
+DEVICE_INFO_KEYS = ('name', 'model', 'firmware_revision', 'hardware_revision', 'manufacturer_name')
+
+# Company identifier of Airthings AS used in BLE advertisement manufacturer data
+AIRTHINGS_COMPANY_ID = 820
+
+BLE_STAGE_DURATION = REGISTRY.histogram("airthings_ble_stage_duration_seconds",
+                                        "Duration of the stages of reading sensor data from a device",
+                                        ("device", "stage"))
+
+
+def parse_serial_number(manufacturer_data):
+    if manufacturer_data is None or len(manufacturer_data) < 4:
+        return None
+    return struct.unpack_from('<I', manufacturer_data)[0]
+
+
+def extract_serial_number(device):
+    return parse_serial_number(device.metadata.get('manufacturer_data', {}).get(AIRTHINGS_COMPANY_ID))
+
+
+def get_adapter_kwargs(adapter):
+    # Adapter is only passed when configured, so the default adapter of the backend is used otherwise
+    return {'adapter': adapter} if adapter is not None else {}
+
 
 class AirthingsWavePlus:
-    def __init__(self, wave_plus_bluetooth_mac_address, wave_plus_serial_number):
+    def __init__(self, wave_plus_bluetooth_mac_address, wave_plus_serial_number, device_info_cache=None):
         self.class_name = "AirthingsWavePlus"
         self.device_data = {}
-        self.control_point_data = {}
-        self.sensor_measurement_data = {}
+        self.control_point_raw_data = None
+        self.sensor_raw_data = None
+        self.timestamp = None
         self.event = set()
         self.device_mac_address = wave_plus_bluetooth_mac_address
         self.device_serial_number = wave_plus_serial_number
+        self.ble_device = None
+        self.device_info_cache = device_info_cache
 
-    async def __scan_for_device(self):
+    async def __scan_for_device(self, adapter=None):
         if self.device_mac_address is not None:
-            device = await self.__scan_for_device_mac_address()
+            device = await self.__scan_for_device_mac_address(adapter)
             self.device_data['bluetooth_mac_addr'] = self.device_mac_address
             self.device_data['serial_number'] = self.__extract_serial_number(device)
             return device
 
         elif self.device_serial_number is not None:
-            device = await self.__scan_for_device_serial_number()
+            device = await self.__scan_for_device_serial_number(adapter)
             self.device_data['bluetooth_mac_addr'] = device.address
             self.device_data['serial_number'] = self.device_serial_number
             return device
@@ -76,25 +109,34 @@ class AirthingsWavePlus:
             raise Exception("Missing device information. "
                             "Please enter either device bluetooth MAC address or serial number.")
 
-    async def __scan_for_device_mac_address(self):
+    def __use_discovered_device(self, device):
+        self.device_data['bluetooth_mac_addr'] = device.address
+        serial_number = extract_serial_number(device)
+        self.device_data['serial_number'] = serial_number if serial_number is not None else self.device_serial_number
+        return device
+
+    def get_device_identifier(self):
+        return self.device_mac_address if self.device_mac_address is not None else self.device_serial_number
+
+    async def __scan_for_device_mac_address(self, adapter=None):
         log = logging.getLogger(self.class_name + ".__scan_for_device_mac_address")
         log.info("Scanning for device with MAC Address: {}".format(self.device_mac_address))
-        device = await BleakScanner.find_device_by_address(self.device_mac_address)
+        device = await BleakScanner.find_device_by_address(self.device_mac_address, **get_adapter_kwargs(adapter))
         if device is None:
             raise Exception("Device not found!!!")
         log.info("Scanning complete [device found]...")
         return device
 
-    async def __scan_for_device_serial_number(self):
+    async def __scan_for_device_serial_number(self, adapter=None):
         log = logging.getLogger(self.class_name + ".__scan_for_device_serial_number")
         log.info("Scanning for device with serial number: {}".format(self.device_serial_number))
-        advertisements = await BleakScanner.discover(timeout=5)
+        advertisements = await BleakScanner.discover(timeout=5, **get_adapter_kwargs(adapter))
         log.info("Scanning complete...")
         device = None
 
         for advertisement in advertisements:
             log.info("Available device: {}".format(advertisement))
-            if 820 in advertisement.metadata['manufacturer_data']:
+            if AIRTHINGS_COMPANY_ID in advertisement.metadata['manufacturer_data']:
                 log.debug(advertisement.metadata['manufacturer_data'])
                 serial_number = self.__extract_serial_number(advertisement)
                 if serial_number == self.device_serial_number:
@@ -109,11 +151,9 @@ class AirthingsWavePlus:
     def __extract_serial_number(self, device):
         log = logging.getLogger(self.class_name + ".__extract_serial_number")
         log.debug(device.metadata['manufacturer_data'])
-        serial_number_bytes = device.metadata['manufacturer_data'].get(820)
-        log.debug(serial_number_bytes)
-        serial_number = struct.unpack_from('<I', serial_number_bytes)
-        log.info("Extracted serial number: {0}".format(serial_number[0]))
-        return serial_number[0]
+        serial_number = extract_serial_number(device)
+        log.info("Extracted serial number: {0}".format(serial_number))
+        return serial_number
 
     def __log_client_characteristics(self, client):
         log = logging.getLogger(self.class_name + ".__log_client_characteristics")
@@ -123,35 +163,73 @@ class AirthingsWavePlus:
                 log.info("Description: {}".format(x.description))
                 log.info("--------------------------------------")
 
+    def __get_device_info_cache_key(self):
+        if self.device_data.get('serial_number') is not None:
+            return self.device_data['serial_number']
+        return str(self.device_data['bluetooth_mac_addr']).upper()
+
+    async def __read_gatt_char(self, client, char_specifier, stage):
+        with start_span(stage), BLE_STAGE_DURATION.time(self.get_device_identifier(), stage):
+            return await client.read_gatt_char(char_specifier)
+
     async def __retrieve_and_process_device_info_data(self, client):
         log = logging.getLogger(self.class_name + ".__retrieve_and_process_device_info_data")
 
-        device_name_raw = await client.read_gatt_char(GATT_CHAR_HANDLE_DEVICE_NAME)
+        if self.device_info_cache is not None:
+            cache_key = self.__get_device_info_cache_key()
+            cached_device_info = self.device_info_cache.get(cache_key)
+            if cached_device_info is not None:
+                if not self.device_info_cache.is_expired(cache_key):
+                    log.debug("Using cached device info for {0}".format(cache_key))
+                    self.device_data.update(cached_device_info)
+                    return
+
+                # Static device info only changes with a firmware update, so check firmware revision first
+                firmware_revision_raw = await self.__read_gatt_char(
+                    client, GATT_CHAR_HANDLE_DEVICE_FIRMWARE_REVISION_STRING, "read_firmware_revision")
+                if firmware_revision_raw.decode("utf-8") == cached_device_info['firmware_revision']:
+                    log.debug("Firmware revision unchanged, renewing cached device info for {0}".format(cache_key))
+                    self.device_info_cache.renew(cache_key)
+                    self.device_data.update(cached_device_info)
+                    return
+                log.info("Firmware revision of {0} changed, refreshing device info".format(cache_key))
+
+        device_name_raw = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_DEVICE_NAME, "read_device_name")
         self.device_data['name'] = device_name_raw.decode("utf-8")
 
-        model_number_raw = await client.read_gatt_char(GATT_CHAR_HANDLE_DEVICE_MODEL_NUMBER_STRING)
+        model_number_raw = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_DEVICE_MODEL_NUMBER_STRING,
+                                                       "read_model_number")
         self.device_data['model'] = model_number_raw.decode("utf-8")
 
-        firmware_revision_raw = await client.read_gatt_char(GATT_CHAR_HANDLE_DEVICE_FIRMWARE_REVISION_STRING)
+        firmware_revision_raw = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_DEVICE_FIRMWARE_REVISION_STRING,
+                                                            "read_firmware_revision")
         self.device_data['firmware_revision'] = firmware_revision_raw.decode("utf-8")
 
-        hardware_revision_raw = await client.read_gatt_char(GATT_CHAR_HANDLE_DEVICE_HARDWARE_REVISION_STRING)
+        hardware_revision_raw = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_DEVICE_HARDWARE_REVISION_STRING,
+                                                            "read_hardware_revision")
         self.device_data['hardware_revision'] = hardware_revision_raw.decode("utf-8")
 
-        manufacturer_name_raw = await client.read_gatt_char(GATT_CHAR_HANDLE_DEVICE_MANUFACTURER_NAME_STRING)
+        manufacturer_name_raw = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_DEVICE_MANUFACTURER_NAME_STRING,
+                                                            "read_manufacturer_name")
         self.device_data['manufacturer_name'] = manufacturer_name_raw.decode("utf-8")
 
+        if self.device_info_cache is not None:
+            self.device_info_cache.put(self.__get_device_info_cache_key(),
+                                       {key: self.device_data[key] for key in DEVICE_INFO_KEYS})
+
     async def __retrieve_and_process_access_control_point_data(self, client):
         log = logging.getLogger(self.class_name + ".__retrieve_access_control_point_data")
         self.event = asyncio.Event()
         await client.start_notify(
             GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT,
             self.__access_control_point_notification_handler)
-        await client.write_gatt_char(GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT, struct.pack('<B', 0x6d))
-        try:
-            await asyncio.wait_for(self.event.wait(), 1)
-        except asyncio.TimeoutError:
-            log.warning("Timeout while retrieving access control point data.")
+        with start_span("control_point_notification"), \
+                BLE_STAGE_DURATION.time(self.get_device_identifier(), "control_point_notification"):
+            await client.write_gatt_char(GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT, struct.pack('<B', 0x6d))
+            try:
+                await asyncio.wait_for(self.event.wait(), 1)
+            except asyncio.TimeoutError:
+                log.warning("Timeout while retrieving access control point data.")
         await client.stop_notify(GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT)
 
     def __access_control_point_notification_handler(self, sender, control_point_raw_data):
@@ -163,109 +241,109 @@ class AirthingsWavePlus:
             log.warning("Missing control point data!!!")
             return
 
-        raw_data = control_point_raw_data[2:]
-        if len(raw_data) != struct.calcsize(ACCESS_CONTROL_POINT_RESPONSE_FORMAT):
+        data_length = len(control_point_raw_data) - ACCESS_CONTROL_POINT_RESPONSE_OFFSET
+        if data_length != ACCESS_CONTROL_POINT_RESPONSE_STRUCT.size:
             log.warning("Data length ({0}) is not according to format length ({1})!!!".format(
-                len(raw_data),
-                struct.calcsize(ACCESS_CONTROL_POINT_RESPONSE_FORMAT)))
+                data_length,
+                ACCESS_CONTROL_POINT_RESPONSE_STRUCT.size))
             return
 
-        unpacked_data = struct.unpack(ACCESS_CONTROL_POINT_RESPONSE_FORMAT, raw_data)
-        self.control_point_data['illuminance'] = SensorMeasurement(unpacked_data[2], "???")
-        self.control_point_data['ambient_light'] = SensorMeasurement(unpacked_data[3], "???")
-        self.control_point_data['measurement_periods'] = SensorMeasurement(unpacked_data[5], "???")
-        voltage = unpacked_data[17] / 1000.0
-        self.control_point_data['voltage'] = SensorMeasurement(voltage, "V")
-
-        voltage_min = 2.0
-        voltage_max = 3.0
-        battery_level = max(0, min(100, round((voltage - voltage_min) / (voltage_max - voltage_min) * 100)))
-        self.control_point_data['battery_level'] = SensorMeasurement(battery_level, "%")
+        # Unpacking with offset avoids copying the notification payload
+        self.control_point_raw_data = ACCESS_CONTROL_POINT_RESPONSE_STRUCT.unpack_from(
+            control_point_raw_data, ACCESS_CONTROL_POINT_RESPONSE_OFFSET)
 
     async def __retrieve_and_process_current_sensor_measurement_data(self, client):
-        sensor_byte_data = await client.read_gatt_char(GATT_CHAR_HANDLE_CURRENT_SENSOR_VALUES)
-        sensor_raw_data = struct.unpack(CURRENT_SENSOR_VALUES_FORMAT, sensor_byte_data)
-        self.device_data['sensor_version'] = sensor_raw_data[0]
-        self.sensor_measurement_data['timestamp'] = datetime.now()
-
-        if self.device_data['sensor_version'] == 1:
-            self.sensor_measurement_data['temperature'] = SensorMeasurement(sensor_raw_data[6] / 100.0, "degC")
-            self.sensor_measurement_data['humidity'] = SensorMeasurement(sensor_raw_data[1] / 2.0, "%rH")
-            self.sensor_measurement_data['pressure'] = SensorMeasurement(sensor_raw_data[7] / 50.0, "hPa")
-            self.sensor_measurement_data['radon_short_term_avg'] = \
-                SensorMeasurement(self.__conv2radon(sensor_raw_data[4]), "Bq/m3")
-            self.sensor_measurement_data['radon_long_term_avg'] = \
-                SensorMeasurement(self.__conv2radon(sensor_raw_data[5]), "Bq/m3")
-            self.sensor_measurement_data['co2_level'] = SensorMeasurement(sensor_raw_data[8] * 1.0, "ppm")
-            self.sensor_measurement_data['voc_level'] = SensorMeasurement(sensor_raw_data[9] * 1.0, "ppb")
-        else:
-            raise Exception("Unknown sensor version: {}".format(self.sensor_measurement_data['sensor_version']))
+        sensor_byte_data = await self.__read_gatt_char(client, GATT_CHAR_HANDLE_CURRENT_SENSOR_VALUES,
+                                                       "read_current_sensor_values")
+        sensor_raw_data = CURRENT_SENSOR_VALUES_STRUCT.unpack_from(sensor_byte_data)
+        self.timestamp = datetime.now()
 
-    def __conv2radon(self, radon_raw):
-        radon = "N/A"  # Either invalid measurement, or not available
-        if 0 <= radon_raw <= 16383:
-            radon = radon_raw
-        return radon
+        if sensor_raw_data[0] != 1:
+            raise Exception("Unknown sensor version: {}".format(sensor_raw_data[0]))
+        self.sensor_raw_data = sensor_raw_data
 
-    async def read_sensor_data(self) -> SensorMeasurements:
+    async def read_sensor_data(self, device=None, adapter=None) -> SensorMeasurements:
         log = logging.getLogger(self.class_name + ".read_sensor_data")
-        device = await self.__scan_for_device()
+        if device is None:
+            with start_span("scan"), BLE_STAGE_DURATION.time(self.get_device_identifier(), "scan"):
+                device = await self.__scan_for_device(adapter)
 
-        log.info("Connecting to device: {}".format(self.device_mac_address))
-        async with BleakClient(device, timeout=15) as client:
+        log.info("Connecting to device: {}".format(device.address))
+        client = BleakClient(device, timeout=15, **get_adapter_kwargs(adapter))
+        with start_span("connect"), BLE_STAGE_DURATION.time(self.get_device_identifier(), "connect"):
+            await client.connect()
+        try:
             log.info("Device connected...")
-
-            # List device characteristics
-            # self.__log_client_characteristics(client)
-
-            # Retrieving and processing device data
+            return await self.read_sensor_data_from_client(client, device)
+        finally:
+            await client.disconnect()
+
+    async def read_sensor_data_from_client(self, client, device) -> SensorMeasurements:
+        log = logging.getLogger(self.class_name + ".read_sensor_data_from_client")
+        self.ble_device = self.__use_discovered_device(device)
+        # Values from a previous read must never be published with this one
+        self.control_point_raw_data = None
+        self.sensor_raw_data = None
+
+        # List device characteristics
+        # self.__log_client_characteristics(client)
+
+        # Retrieving and processing device data
+        with start_span("device_info"):
             await self.__retrieve_and_process_device_info_data(client)
+        with start_span("control_point"):
             await self.__retrieve_and_process_access_control_point_data(client)
+        with start_span("sensor_values"):
             await self.__retrieve_and_process_current_sensor_measurement_data(client)
 
-            measurements = SensorMeasurements(self.device_data, self.sensor_measurement_data, self.control_point_data)
-
-            log.info("Device name: {0}".format(measurements.get_device_name()))
-            log.info("Device model: {0}".format(measurements.get_device_model()))
-            log.info("Device sensor version: {0}".format(measurements.get_device_sensor_version()))
-            log.info("Device Bluetooth MAC address: {0}".format(measurements.get_device_bluetooth_mac_address()))
-            log.info("Device Serial Number: {0}".format(measurements.get_device_serial_number()))
-            log.info("Measurement timestamp: {0}".format(measurements.get_timestamp().isoformat()))
-            log.info("Temperature: {0} {1}".format(
-                measurements.get_temperature().value,
-                measurements.get_temperature().unit))
-            log.info("Humidity: {0} {1}".format(
-                measurements.get_humidity().value,
-                measurements.get_humidity().unit))
-            log.info("Pressure: {0} {1}".format(
-                measurements.get_pressure().value,
-                measurements.get_pressure().unit))
-            log.info("Radon short term average: {0} {1}".format(
-                measurements.get_radon_short_term_average().value,
-                measurements.get_radon_short_term_average().unit))
-            log.info("Radon long term average: {0} {1}".format(
-                measurements.get_radon_long_term_average().value,
-                measurements.get_radon_long_term_average().unit))
-            log.info("CO2 Level: {0} {1}".format(
-                measurements.get_co2_level().value,
-                measurements.get_co2_level().unit))
-            log.info("VOC Level: {0} {1}".format(
-                measurements.get_voc_level().value,
-                measurements.get_voc_level().unit))
-            log.info("Illuminance: {0} {1}".format(
-                measurements.get_illuminance().value,
-                measurements.get_illuminance().unit))
-            log.info("Ambient light: {0} {1}".format(
-                measurements.get_ambient_light().value,
-                measurements.get_ambient_light().unit))
-            log.info("Measurement period: {0} {1}".format(
-                measurements.get_measurement_periods().value,
-                measurements.get_measurement_periods().unit))
-            log.info("Voltage: {0} {1}".format(
-                measurements.get_device_voltage().value,
-                measurements.get_device_voltage().unit))
-            log.info("Battery level: {0} {1}".format(
-                measurements.get_device_battery_level().value,
-                measurements.get_device_battery_level().unit))
-
-            return measurements
+        if self.control_point_raw_data is None:
+            raise Exception("Missing control point data!!!")
+        measurements = SensorMeasurements.from_raw_data(self.device_data,
+                                                        self.timestamp,
+                                                        self.sensor_raw_data,
+                                                        self.control_point_raw_data)
+
+        log.info("Device name: {0}".format(measurements.get_device_name()))
+        log.info("Device model: {0}".format(measurements.get_device_model()))
+        log.info("Device sensor version: {0}".format(measurements.get_device_sensor_version()))
+        log.info("Device Bluetooth MAC address: {0}".format(measurements.get_device_bluetooth_mac_address()))
+        log.info("Device Serial Number: {0}".format(measurements.get_device_serial_number()))
+        log.info("Measurement timestamp: {0}".format(measurements.get_timestamp().isoformat()))
+        log.info("Temperature: {0} {1}".format(
+            measurements.get_temperature().value,
+            measurements.get_temperature().unit))
+        log.info("Humidity: {0} {1}".format(
+            measurements.get_humidity().value,
+            measurements.get_humidity().unit))
+        log.info("Pressure: {0} {1}".format(
+            measurements.get_pressure().value,
+            measurements.get_pressure().unit))
+        log.info("Radon short term average: {0} {1}".format(
+            measurements.get_radon_short_term_average().value,
+            measurements.get_radon_short_term_average().unit))
+        log.info("Radon long term average: {0} {1}".format(
+            measurements.get_radon_long_term_average().value,
+            measurements.get_radon_long_term_average().unit))
+        log.info("CO2 Level: {0} {1}".format(
+            measurements.get_co2_level().value,
+            measurements.get_co2_level().unit))
+        log.info("VOC Level: {0} {1}".format(
+            measurements.get_voc_level().value,
+            measurements.get_voc_level().unit))
+        log.info("Illuminance: {0} {1}".format(
+            measurements.get_illuminance().value,
+            measurements.get_illuminance().unit))
+        log.info("Ambient light: {0} {1}".format(
+            measurements.get_ambient_light().value,
+            measurements.get_ambient_light().unit))
+        log.info("Measurement period: {0} {1}".format(
+            measurements.get_measurement_periods().value,
+            measurements.get_measurement_periods().unit))
+        log.info("Voltage: {0} {1}".format(
+            measurements.get_device_voltage().value,
+            measurements.get_device_voltage().unit))
+        log.info("Battery level: {0} {1}".format(
+            measurements.get_device_battery_level().value,
+            measurements.get_device_battery_level().unit))
+
+        return measurements
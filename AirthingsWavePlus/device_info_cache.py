@@ -0,0 +1,76 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import logging
+import os.path
+import time
+
+
+class DeviceInfoCache:
+    def __init__(self, ttl=86400, filename=None):
+        self.class_name = "DeviceInfoCache"
+        self.ttl = ttl
+        self.filename = filename
+        self.entries = {}
+        self.__load()
+
+    def __load(self):
+        log = logging.getLogger(self.class_name + ".__load")
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, "r") as cache_file:
+                self.entries = json.load(cache_file)
+            log.info("Loaded device info of {0} device(s) from {1}".format(len(self.entries), self.filename))
+        except (OSError, ValueError) as e:
+            log.warning("Unable to load device info cache {0}: {1}".format(self.filename, str(e)))
+            self.entries = {}
+
+    def __save(self):
+        log = logging.getLogger(self.class_name + ".__save")
+        if self.filename is None:
+            return
+        try:
+            temp_filename = self.filename + ".tmp"
+            with open(temp_filename, "w") as cache_file:
+                json.dump(self.entries, cache_file, indent=2)
+            os.replace(temp_filename, self.filename)
+        except OSError as e:
+            log.warning("Unable to save device info cache {0}: {1}".format(self.filename, str(e)))
+
+    def get(self, key):
+        entry = self.entries.get(str(key))
+        return dict(entry['device_info']) if entry is not None else None
+
+    def is_expired(self, key):
+        entry = self.entries.get(str(key))
+        return entry is None or time.time() - entry['updated_at'] >= self.ttl
+
+    def put(self, key, device_info):
+        self.entries[str(key)] = {'device_info': dict(device_info), 'updated_at': time.time()}
+        self.__save()
+
+    def renew(self, key):
+        entry = self.entries.get(str(key))
+        if entry is not None:
+            entry['updated_at'] = time.time()
+            self.__save()
+
+    def invalidate(self, key):
+        if self.entries.pop(str(key), None) is not None:
+            self.__save()
@@ -0,0 +1,135 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import time
+
+from bleak import BleakScanner
+
+from AirthingsWavePlus.airthings_wave_plus import AIRTHINGS_COMPANY_ID, parse_serial_number, get_adapter_kwargs
+from Metrics.metrics_registry import REGISTRY
+
+SCAN_DURATION = REGISTRY.histogram("airthings_ble_scan_duration_seconds", "Duration of shared BLE scans")
+
+
+class DiscoveredDevice:
+    def __init__(self, device, serial_number, manufacturer_data, rssi, discovered_at):
+        self.device = device
+        self.mac_address = device.address.upper()
+        self.serial_number = serial_number
+        self.manufacturer_data = manufacturer_data
+        self.rssi = rssi
+        self.discovered_at = discovered_at
+        # Discovered devices are bound to the adapter which received the advertisement
+        self.devices_by_adapter = {}
+        self.rssi_by_adapter = {}
+
+
+class DiscoveryCache:
+    def __init__(self, ttl=3600, scan_timeout=5, adapters=None):
+        self.class_name = "DiscoveryCache"
+        self.ttl = ttl
+        self.scan_timeout = scan_timeout
+        self.adapters = adapters if adapters else [None]
+        self.devices_by_mac_address = {}
+        self.devices_by_serial_number = {}
+        self.scan_count = 0
+        self.scan_lock = asyncio.Lock()
+
+    def __is_valid(self, entry):
+        return entry is not None and time.monotonic() - entry.discovered_at < self.ttl
+
+    def get(self, mac_address=None, serial_number=None):
+        entry = None
+        if mac_address is not None:
+            entry = self.devices_by_mac_address.get(str(mac_address).upper())
+        elif serial_number is not None:
+            entry = self.devices_by_serial_number.get(serial_number)
+        return entry if self.__is_valid(entry) else None
+
+    def put(self, device, manufacturer_data=None, rssi=None, adapter=None):
+        if manufacturer_data is None:
+            manufacturer_data = device.metadata.get('manufacturer_data', {})
+        entry = DiscoveredDevice(device,
+                                 parse_serial_number(manufacturer_data.get(AIRTHINGS_COMPANY_ID)),
+                                 manufacturer_data.get(AIRTHINGS_COMPANY_ID),
+                                 rssi if rssi is not None else device.rssi,
+                                 time.monotonic())
+        previous_entry = self.get(entry.mac_address)
+        if previous_entry is not None:
+            entry.devices_by_adapter.update(previous_entry.devices_by_adapter)
+            entry.rssi_by_adapter.update(previous_entry.rssi_by_adapter)
+        entry.devices_by_adapter[adapter] = device
+        entry.rssi_by_adapter[adapter] = entry.rssi
+        self.devices_by_mac_address[entry.mac_address] = entry
+        if entry.serial_number is not None:
+            self.devices_by_serial_number[entry.serial_number] = entry
+        return entry
+
+    def invalidate(self, mac_address=None, serial_number=None):
+        log = logging.getLogger(self.class_name + ".invalidate")
+        entry = self.get(mac_address, serial_number)
+        if entry is None:
+            return
+        log.info("Invalidating cached device {0} ({1})".format(entry.mac_address, entry.serial_number))
+        self.devices_by_mac_address.pop(entry.mac_address, None)
+        if entry.serial_number is not None:
+            self.devices_by_serial_number.pop(entry.serial_number, None)
+
+    async def __scan_adapter(self, adapter):
+        with SCAN_DURATION.time():
+            return await BleakScanner.discover(timeout=self.scan_timeout, **get_adapter_kwargs(adapter))
+
+    async def scan(self):
+        log = logging.getLogger(self.class_name + ".scan")
+        log.info("Scanning for devices...")
+        # All adapters scan at the same time, so every adapter knows the devices in its range
+        results = await asyncio.gather(*[self.__scan_adapter(adapter) for adapter in self.adapters],
+                                       return_exceptions=True)
+        self.scan_count += 1
+        for adapter, advertisements in zip(self.adapters, results):
+            if isinstance(advertisements, Exception):
+                log.error("Error during scan on adapter {0}: {1}".format(adapter, str(advertisements)))
+                continue
+            # Only Airthings devices are cached, a busy environment would otherwise fill the cache with other devices
+            airthings_advertisements = [advertisement for advertisement in advertisements
+                                        if AIRTHINGS_COMPANY_ID in advertisement.metadata.get('manufacturer_data', {})]
+            log.info("Scanning complete [{0} advertisement(s), {1} Airthings device(s)]...".format(
+                len(advertisements), len(airthings_advertisements)))
+            for advertisement in airthings_advertisements:
+                self.put(advertisement, adapter=adapter)
+        if all(isinstance(advertisements, Exception) for advertisements in results):
+            raise results[0]
+
+    async def resolve(self, identifiers, scan_on_miss=True):
+        log = logging.getLogger(self.class_name + ".resolve")
+        if any(self.get(mac_address, serial_number) is None for mac_address, serial_number in identifiers):
+            if scan_on_miss:
+                scan_count = self.scan_count
+                async with self.scan_lock:
+                    # Concurrent resolvers share one scan instead of each starting their own
+                    if self.scan_count == scan_count:
+                        await self.scan()
+        else:
+            log.debug("All {0} device(s) resolved from cache.".format(len(identifiers)))
+
+        resolved_devices = []
+        for mac_address, serial_number in identifiers:
+            entry = self.get(mac_address, serial_number)
+            resolved_devices.append(entry.device if entry is not None else None)
+        return resolved_devices
@@ -0,0 +1,353 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import time
+
+from AirthingsWavePlus.adapter_pool import AdapterPool, AdapterStallError, BluetoothAdapter
+from AirthingsWavePlus.advertisement_listener import AdvertisementListener
+from AirthingsWavePlus.airthings_wave_plus import AirthingsWavePlus
+from AirthingsWavePlus.device_info_cache import DeviceInfoCache
+from AirthingsWavePlus.discovery_cache import DiscoveryCache
+from AirthingsWavePlus.persistent_connection import PersistentConnection, ReconnectBackoffError
+from AirthingsWavePlus.refresh_tracker import RefreshTracker, REFRESH_PERIOD
+from Metrics.metrics_registry import REGISTRY
+from TimeSeries.time_series_store import METRICS
+
+READ_DURATION = REGISTRY.histogram("airthings_read_duration_seconds",
+                                   "Duration of a complete sensor read including waiting for a connection slot",
+                                   ("device",))
+READS = REGISTRY.counter("airthings_reads_total", "Sensor reads by result", ("device", "result"))
+SENSOR_VALUE = REGISTRY.gauge("airthings_sensor_value", "Latest sensor value", ("device", "metric"))
+BATTERY_LEVEL = REGISTRY.gauge("airthings_battery_level_percent", "Latest device battery level", ("device",))
+RSSI = REGISTRY.gauge("airthings_ble_rssi_dbm", "Latest received signal strength of device advertisements",
+                      ("device",))
+LAST_ADVERTISEMENT = REGISTRY.gauge("airthings_last_advertisement_timestamp_seconds",
+                                    "Time of the latest advertisement received from the device", ("device",))
+
+
+class FleetPoller:
+    def __init__(self,
+                 devices,
+                 max_concurrent_connections=1,
+                 scan_timeout=5,
+                 discovery_cache_ttl=3600,
+                 passive_mode=False,
+                 measurement_max_age=0,
+                 device_info_cache_ttl=86400,
+                 device_info_cache_file=None,
+                 persistent_connections=False,
+                 reconnect_backoff_initial_delay=1,
+                 reconnect_backoff_max_delay=300,
+                 deduplicate_measurements=False,
+                 refresh_period=REFRESH_PERIOD,
+                 read_margin=10,
+                 adapters=None,
+                 adapter_strategy='least_loaded',
+                 adapter_stall_timeout=60,
+                 adapter_failover_threshold=3,
+                 adapter_stall_cooldown=300):
+        self.class_name = "FleetPoller"
+        self.device_info_cache = DeviceInfoCache(device_info_cache_ttl, device_info_cache_file)
+        self.readers = [AirthingsWavePlus(device.get('mac_address'), device.get('serial_number'),
+                                          self.device_info_cache)
+                        for device in devices]
+        # Indexes of devices stay stable: a removed device keeps its (inactive) slot and gets it back when re-added
+        self.device_indexes = {self.get_device_key(device): index for index, device in enumerate(devices)}
+        self.active_devices = [True] * len(self.readers)
+        self.max_concurrent_connections = max(1, max_concurrent_connections)
+        # Without configured adapters all reads go through the default adapter of the backend
+        self.adapter_pool = AdapterPool([BluetoothAdapter(adapter.get('name'),
+                                                          adapter.get('max_concurrent_connections') or
+                                                          self.max_concurrent_connections)
+                                         for adapter in adapters] if adapters else
+                                        [BluetoothAdapter(None, self.max_concurrent_connections)],
+                                        adapter_strategy,
+                                        adapter_stall_timeout,
+                                        adapter_failover_threshold,
+                                        adapter_stall_cooldown)
+        self.static_adapters = [device.get('adapter') for device in devices]
+        self.discovery_cache = DiscoveryCache(discovery_cache_ttl, scan_timeout, self.adapter_pool.get_adapter_names())
+        self.passive_mode = passive_mode
+        self.measurement_max_age = measurement_max_age
+        self.last_read_times = [None] * len(self.readers)
+        self.advertisement_listener = AdvertisementListener(self.discovery_cache,
+                                                            on_advertisement=self.__on_advertisement,
+                                                            adapters=self.adapter_pool.get_adapter_names()) \
+            if passive_mode else None
+        # Indexes of advertised devices by address and serial number, None for devices that are not polled
+        self.advertised_device_indexes = {}
+        self.reconnect_backoff_initial_delay = reconnect_backoff_initial_delay
+        self.reconnect_backoff_max_delay = reconnect_backoff_max_delay
+        self.persistent_connections = [self.__create_persistent_connection(reader)
+                                       for reader in self.readers] if persistent_connections else None
+        self.deduplicate_measurements = deduplicate_measurements
+        self.refresh_period = refresh_period
+        self.read_margin = read_margin
+        self.refresh_trackers = [RefreshTracker(refresh_period, read_margin) for _ in self.readers]
+
+    def __create_persistent_connection(self, reader):
+        return PersistentConnection(reader,
+                                    backoff_initial_delay=self.reconnect_backoff_initial_delay,
+                                    backoff_max_delay=self.reconnect_backoff_max_delay)
+
+    @staticmethod
+    def get_device_key(device):
+        return device.get('mac_address'), device.get('serial_number')
+
+    def get_device_index(self, device):
+        return self.device_indexes.get(self.get_device_key(device))
+
+    def add_device(self, device):
+        # Also updates the static adapter of a device that is already polled
+        log = logging.getLogger(self.class_name + ".add_device")
+        index = self.get_device_index(device)
+        if index is None:
+            reader = AirthingsWavePlus(device.get('mac_address'), device.get('serial_number'), self.device_info_cache)
+            self.readers.append(reader)
+            self.static_adapters.append(device.get('adapter'))
+            self.last_read_times.append(None)
+            self.refresh_trackers.append(RefreshTracker(self.refresh_period, self.read_margin))
+            if self.persistent_connections is not None:
+                self.persistent_connections.append(self.__create_persistent_connection(reader))
+            self.active_devices.append(True)
+            index = len(self.readers) - 1
+            self.device_indexes[self.get_device_key(device)] = index
+            self.advertised_device_indexes.clear()
+            log.info("Added device {0}".format(reader.get_device_identifier()))
+        else:
+            self.static_adapters[index] = device.get('adapter')
+            if not self.active_devices[index]:
+                self.active_devices[index] = True
+                log.info("Added device {0}".format(self.readers[index].get_device_identifier()))
+        return index
+
+    async def remove_device(self, index):
+        log = logging.getLogger(self.class_name + ".remove_device")
+        self.active_devices[index] = False
+        if self.persistent_connections is not None:
+            await self.persistent_connections[index].disconnect()
+        log.info("Removed device {0}".format(self.readers[index].get_device_identifier()))
+
+    def __get_active_indexes(self):
+        return [index for index, active in enumerate(self.active_devices) if active]
+
+    async def start(self):
+        if self.advertisement_listener is not None:
+            await self.advertisement_listener.start()
+
+    async def stop(self):
+        if self.advertisement_listener is not None:
+            await self.advertisement_listener.stop()
+        if self.persistent_connections is not None:
+            for connection in self.persistent_connections:
+                await connection.disconnect()
+
+    def get_connection_health(self):
+        if self.persistent_connections is None:
+            return {}
+        return {self.persistent_connections[index].reader.get_device_identifier():
+                self.persistent_connections[index].health.to_dict()
+                for index in self.__get_active_indexes()}
+
+    def get_adapter_health(self):
+        return self.adapter_pool.to_dict()
+
+    def get_refresh_metrics(self):
+        return {self.readers[index].get_device_identifier(): self.refresh_trackers[index].get_metrics()
+                for index in self.__get_active_indexes()}
+
+    def get_next_poll_delay(self, index):
+        return self.refresh_trackers[index].get_next_poll_delay(time.monotonic())
+
+    @staticmethod
+    def __update_sensor_gauges(device_identifier, measurements):
+        for metric in METRICS:
+            value = getattr(measurements, metric)
+            # Radon averages are "N/A" until enough data is collected
+            if not isinstance(value, str):
+                SENSOR_VALUE.set(value, device_identifier, metric)
+        BATTERY_LEVEL.set(measurements.device_battery_level, device_identifier)
+
+    def __update_rssi_gauge(self, reader):
+        entry = self.discovery_cache.get(reader.device_mac_address, reader.device_serial_number)
+        if entry is not None and entry.rssi is not None:
+            RSSI.set(entry.rssi, reader.get_device_identifier())
+
+    def __find_advertised_device_index(self, update):
+        key = (update.bluetooth_mac_address, update.serial_number)
+        if key not in self.advertised_device_indexes:
+            self.advertised_device_indexes[key] = next(
+                (index for index, reader in enumerate(self.readers)
+                 if (reader.device_mac_address is not None and
+                     str(reader.device_mac_address).upper() == update.bluetooth_mac_address) or
+                 (reader.device_serial_number is not None and
+                  str(reader.device_serial_number) == str(update.serial_number))), None)
+        return self.advertised_device_indexes[key]
+
+    def __on_advertisement(self, update):
+        # Advertisements keep signal strength and presence of devices up to date between reads
+        index = self.__find_advertised_device_index(update)
+        if index is None or not self.active_devices[index]:
+            return
+        device_identifier = self.readers[index].get_device_identifier()
+        if update.rssi is not None:
+            RSSI.set(update.rssi, device_identifier)
+        LAST_ADVERTISEMENT.set(update.timestamp.timestamp(), device_identifier)
+
+    def __is_measurement_stale(self, index):
+        last_read_time = self.last_read_times[index]
+        return last_read_time is None or time.monotonic() - last_read_time >= self.measurement_max_age
+
+    async def __wait_for_read(self, reading):
+        # Only expiry of stall_timeout is a stall, timeouts raised by the read itself (e.g. connect) are failures
+        if not self.adapter_pool.stall_timeout:
+            return await reading
+        task = asyncio.ensure_future(reading)
+        try:
+            done, _ = await asyncio.wait({task}, timeout=self.adapter_pool.stall_timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            task.cancel()
+            await asyncio.wait({task})
+            raise AdapterStallError()
+        return task.result()
+
+    async def __read_device_on_adapter(self, index, device, adapter):
+        # Returns the measurements and whether the adapter stalled during the read
+        log = logging.getLogger(self.class_name + ".__read_device_on_adapter")
+        reader = self.readers[index]
+        device_identifier = reader.get_device_identifier()
+        with READ_DURATION.time(device_identifier):
+            adapter.acquire()
+            try:
+                async with adapter.semaphore:
+                    if self.persistent_connections is not None:
+                        reading = self.persistent_connections[index].read_sensor_data(device, adapter.name)
+                    else:
+                        reading = reader.read_sensor_data(device, adapter.name)
+                    measurements = await self.__wait_for_read(reading)
+            except ReconnectBackoffError as e:
+                READS.inc(device_identifier, "backoff")
+                log.info("Skipping device {0}: {1}".format(device_identifier, str(e)))
+                return None, False
+            except AdapterStallError:
+                READS.inc(device_identifier, "timeout")
+                log.error("Read of device {0} on adapter {1} did not finish within {2}s".format(
+                    device_identifier, adapter.get_label(), self.adapter_pool.stall_timeout))
+                if self.persistent_connections is not None:
+                    await self.persistent_connections[index].disconnect()
+                return None, self.adapter_pool.on_failure(adapter, stalled=True)
+            except Exception as e:
+                READS.inc(device_identifier, "failure")
+                # Device might have been moved or its cached advertisement might be stale: rescan on next cycle
+                self.discovery_cache.invalidate(reader.device_mac_address, reader.device_serial_number)
+                log.error("Error during retrieval of sensor data from device {0}: {1}".format(
+                    device_identifier, str(e) or type(e).__name__))
+                return None, self.adapter_pool.on_failure(adapter)
+            finally:
+                adapter.release()
+
+        self.adapter_pool.on_success(adapter)
+        if device is None and reader.ble_device is not None:
+            self.discovery_cache.put(reader.ble_device, adapter=adapter.name)
+        self.last_read_times[index] = time.monotonic()
+        self.__update_sensor_gauges(device_identifier, measurements)
+        self.__update_rssi_gauge(reader)
+        changed = self.refresh_trackers[index].update(reader.sensor_raw_data,
+                                                      measurements.measurement_periods,
+                                                      self.last_read_times[index])
+        if not changed and self.deduplicate_measurements:
+            READS.inc(device_identifier, "duplicate")
+            log.info("Skipping unchanged measurement of device {0}.".format(device_identifier))
+            return None, False
+        READS.inc(device_identifier, "success")
+        return measurements, False
+
+    async def __read_device(self, index, device):
+        log = logging.getLogger(self.class_name + ".__read_device")
+        reader = self.readers[index]
+        entry = self.discovery_cache.get(reader.device_mac_address, reader.device_serial_number)
+        excluded_adapters = []
+        while True:
+            adapter = self.adapter_pool.select(entry.rssi_by_adapter if entry is not None else None,
+                                               self.static_adapters[index],
+                                               excluded_adapters)
+            # Discovered devices are bound to their adapter, without one the reader scans on the selected adapter
+            adapter_device = entry.devices_by_adapter.get(adapter.name) if entry is not None else device
+            measurements, stalled = await self.__read_device_on_adapter(index, adapter_device, adapter)
+            excluded_adapters.append(adapter)
+            if not stalled or len(excluded_adapters) >= len(self.adapter_pool.adapters):
+                return measurements
+            log.warning("Failing over device {0} from adapter {1}".format(reader.get_device_identifier(),
+                                                                          adapter.get_label()))
+
+    async def poll_device(self, index):
+        log = logging.getLogger(self.class_name + ".poll_device")
+        reader = self.readers[index]
+        if not self.__is_measurement_stale(index):
+            log.info("Skipping device {0} with measurement younger than {1}s.".format(
+                reader.get_device_identifier(), self.measurement_max_age))
+            return None
+
+        try:
+            device = (await self.discovery_cache.resolve([(reader.device_mac_address, reader.device_serial_number)],
+                                                         scan_on_miss=not self.passive_mode))[0]
+        except Exception as e:
+            log.error("Error during scan, falling back to per-device scan: {0}".format(str(e)))
+            device = None
+        if device is None:
+            log.warning("Device {0} not found.".format(reader.get_device_identifier()))
+            if self.passive_mode:
+                return None
+
+        return await self.__read_device(index, device)
+
+    async def poll(self):
+        log = logging.getLogger(self.class_name + ".poll")
+        active_indexes = self.__get_active_indexes()
+        try:
+            # In passive mode the discovery cache is kept up to date by the advertisement listener
+            resolved_devices = await self.discovery_cache.resolve(
+                [(self.readers[index].device_mac_address, self.readers[index].device_serial_number)
+                 for index in active_indexes], scan_on_miss=not self.passive_mode)
+            devices = dict(zip(active_indexes, resolved_devices))
+            for index, device in devices.items():
+                if device is None:
+                    log.warning("Device {0} not found.".format(self.readers[index].get_device_identifier()))
+        except Exception as e:
+            log.error("Error during shared scan, falling back to per-device scan: {0}".format(str(e)))
+            devices = {index: None for index in active_indexes}
+
+        indexes = [index for index in active_indexes if self.__is_measurement_stale(index)]
+        if len(indexes) < len(active_indexes):
+            log.info("Skipping {0} device(s) with measurements younger than {1}s.".format(
+                len(active_indexes) - len(indexes), self.measurement_max_age))
+
+        if self.passive_mode:
+            # Do not fall back to per-device scans while the advertisement listener owns the scanner
+            indexes = [index for index in indexes if devices[index] is not None]
+
+        results = await asyncio.gather(*[self.__read_device(index, devices[index]) for index in indexes])
+        measurements = [measurement for measurement in results if measurement is not None]
+        log.info("Polling complete: {0}/{1} device(s) read successfully.".format(len(measurements), len(indexes)))
+        if self.persistent_connections is not None:
+            log.debug("Connection health: {0}".format(self.get_connection_health()))
+        return measurements
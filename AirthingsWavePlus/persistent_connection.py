@@ -0,0 +1,154 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import random
+import time
+
+from bleak import BleakClient
+
+from AirthingsWavePlus.airthings_wave_plus import BLE_STAGE_DURATION, get_adapter_kwargs
+from Tracing.tracer import start_span
+
+
+class ReconnectBackoffError(Exception):
+    pass
+
+
+class ConnectionHealth:
+    def __init__(self):
+        self.connects = 0
+        self.failed_connects = 0
+        self.disconnects = 0
+        self.reads = 0
+        self.failed_reads = 0
+        self.consecutive_failures = 0
+        self.last_connected_at = None
+
+    def to_dict(self):
+        return {
+            "connects": self.connects,
+            "failed_connects": self.failed_connects,
+            "disconnects": self.disconnects,
+            "reads": self.reads,
+            "failed_reads": self.failed_reads,
+            "consecutive_failures": self.consecutive_failures,
+            "last_connected_at": self.last_connected_at
+        }
+
+
+class PersistentConnection:
+    def __init__(self,
+                 reader,
+                 connect_timeout=15,
+                 backoff_initial_delay=1,
+                 backoff_max_delay=300,
+                 backoff_factor=2):
+        self.class_name = "PersistentConnection"
+        self.reader = reader
+        self.connect_timeout = connect_timeout
+        self.backoff_initial_delay = backoff_initial_delay
+        self.backoff_max_delay = backoff_max_delay
+        self.backoff_factor = backoff_factor
+        self.client = None
+        self.device = None
+        self.adapter = None
+        self.next_connect_attempt_at = 0
+        self.health = ConnectionHealth()
+
+    def is_connected(self):
+        return self.client is not None and self.client.is_connected
+
+    def __on_disconnected(self, client):
+        log = logging.getLogger(self.class_name + ".__on_disconnected")
+        if client is not self.client:
+            return
+        self.health.disconnects += 1
+        log.warning("Device {0} disconnected.".format(self.reader.get_device_identifier()))
+
+    def __schedule_reconnect(self):
+        log = logging.getLogger(self.class_name + ".__schedule_reconnect")
+        self.health.consecutive_failures += 1
+        delay = min(self.backoff_max_delay,
+                    self.backoff_initial_delay * self.backoff_factor ** (self.health.consecutive_failures - 1))
+        # Equal jitter: keep at least half of the delay, randomize the rest to avoid reconnect storms
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.next_connect_attempt_at = time.monotonic() + delay
+        log.info("Next connection attempt to {0} in {1:.1f}s".format(self.reader.get_device_identifier(), delay))
+
+    async def __connect(self):
+        log = logging.getLogger(self.class_name + ".__connect")
+        if time.monotonic() < self.next_connect_attempt_at:
+            raise ReconnectBackoffError("Reconnect backoff active for {0:.1f}s".format(
+                self.next_connect_attempt_at - time.monotonic()))
+
+        log.info("Connecting to device: {0}".format(self.device.address))
+        client = BleakClient(self.device, disconnected_callback=self.__on_disconnected, timeout=self.connect_timeout,
+                             **get_adapter_kwargs(self.adapter))
+        self.client = client
+        try:
+            with start_span("connect"), BLE_STAGE_DURATION.time(self.reader.get_device_identifier(), "connect"):
+                await client.connect()
+        except Exception:
+            self.client = None
+            self.health.failed_connects += 1
+            self.__schedule_reconnect()
+            raise
+        self.health.connects += 1
+        self.health.last_connected_at = time.time()
+        log.info("Device connected...")
+
+    async def read_sensor_data(self, device=None, adapter=None):
+        log = logging.getLogger(self.class_name + ".read_sensor_data")
+        if adapter != self.adapter:
+            # Device was moved to another adapter, the discovered device of the previous adapter cannot be used
+            if self.client is not None:
+                log.info("Moving device {0} from adapter {1} to {2}".format(
+                    self.reader.get_device_identifier(), self.adapter, adapter))
+                await self.disconnect()
+            self.adapter = adapter
+            self.device = None
+            self.next_connect_attempt_at = 0
+        if device is not None:
+            self.device = device
+        if self.device is None:
+            raise Exception("Device {0} has not been discovered yet.".format(self.reader.get_device_identifier()))
+
+        if not self.is_connected():
+            await self.__connect()
+
+        try:
+            measurements = await self.reader.read_sensor_data_from_client(self.client, self.device)
+        except Exception:
+            self.health.failed_reads += 1
+            await self.disconnect()
+            self.__schedule_reconnect()
+            raise
+        self.health.reads += 1
+        self.health.consecutive_failures = 0
+        return measurements
+
+    async def disconnect(self):
+        log = logging.getLogger(self.class_name + ".disconnect")
+        client = self.client
+        self.client = None
+        if client is None:
+            return
+        try:
+            await client.disconnect()
+        except Exception as e:
+            log.warning("Error while disconnecting from {0}: {1}".format(self.reader.get_device_identifier(), str(e)))
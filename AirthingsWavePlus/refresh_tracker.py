@@ -0,0 +1,110 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+
+# Airthings Wave Plus refreshes its current sensor values every 5 minutes
+REFRESH_PERIOD = 300
+
+
+class RefreshTracker:
+    def __init__(self, refresh_period=REFRESH_PERIOD, read_margin=10, resolution=20, min_delay=10, drift=0.5):
+        self.refresh_period = refresh_period
+        self.drift = drift
+        self.read_margin = read_margin
+        self.resolution = resolution
+        self.min_delay = min_delay
+        self.last_sensor_raw_data = None
+        self.last_measurement_periods = None
+        self.last_read_time = None
+        # Interval (lower, upper] containing one of the device's refresh instants
+        self.refresh_lower = None
+        self.refresh_upper = None
+        self.reads = 0
+        self.duplicates = 0
+
+    def __project(self, previous_read_time, read_time):
+        # Move the known refresh interval by whole periods next to the observed interval, widened by the clock drift
+        shift = round(((previous_read_time + read_time) - (self.refresh_lower + self.refresh_upper)) / 2.0
+                      / self.refresh_period)
+        return self.refresh_lower + shift * self.refresh_period - abs(shift) * self.drift, \
+            self.refresh_upper + shift * self.refresh_period + abs(shift) * self.drift
+
+    def __on_changed(self, previous_read_time, read_time):
+        if self.refresh_lower is not None:
+            lower, upper = self.__project(previous_read_time, read_time)
+            lower, upper = max(lower, previous_read_time), min(upper, read_time)
+            if lower < upper:
+                self.refresh_lower, self.refresh_upper = lower, upper
+                return
+        # No estimate yet or the device clock drifted away from it
+        self.refresh_lower, self.refresh_upper = max(previous_read_time, read_time - self.refresh_period), read_time
+
+    def __on_unchanged(self, previous_read_time, read_time):
+        if self.refresh_lower is None:
+            return
+        lower, upper = self.__project(previous_read_time, read_time)
+        if read_time <= lower or previous_read_time >= upper:
+            return
+        if previous_read_time <= lower:
+            lower = read_time
+        elif read_time >= upper:
+            upper = previous_read_time
+        if lower < upper:
+            self.refresh_lower, self.refresh_upper = lower, upper
+        else:
+            # Estimate contradicts the observation, learn the phase again
+            self.refresh_lower, self.refresh_upper = None, None
+
+    def update(self, sensor_raw_data, measurement_periods, read_time):
+        changed = self.last_sensor_raw_data is None or sensor_raw_data != self.last_sensor_raw_data \
+            or measurement_periods != self.last_measurement_periods
+        if self.last_read_time is not None:
+            if changed:
+                self.__on_changed(self.last_read_time, read_time)
+            else:
+                self.__on_unchanged(self.last_read_time, read_time)
+
+        self.reads += 1
+        if not changed:
+            self.duplicates += 1
+        self.last_sensor_raw_data = sensor_raw_data
+        self.last_measurement_periods = measurement_periods
+        self.last_read_time = read_time
+        return changed
+
+    def is_converged(self):
+        return self.refresh_lower is not None and self.refresh_upper - self.refresh_lower <= self.resolution
+
+    def get_next_poll_delay(self, now):
+        if self.refresh_lower is None:
+            return self.refresh_period
+        if self.is_converged():
+            target = self.refresh_upper + self.read_margin
+        else:
+            # Probe the middle of the refresh interval to halve it
+            target = (self.refresh_lower + self.refresh_upper) / 2.0
+        if target < now + self.min_delay:
+            target += math.ceil((now + self.min_delay - target) / self.refresh_period) * self.refresh_period
+        return target - now
+
+    def get_metrics(self):
+        return {
+            "reads": self.reads,
+            "duplicates": self.duplicates,
+            "refresh_uncertainty": self.refresh_upper - self.refresh_lower if self.refresh_lower is not None else None
+        }
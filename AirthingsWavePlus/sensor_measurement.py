@@ -15,7 +15,21 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+# Units shared by all measurements
+UNIT_TEMPERATURE = "degC"
+UNIT_HUMIDITY = "%rH"
+UNIT_PRESSURE = "hPa"
+UNIT_RADON = "Bq/m3"
+UNIT_CO2_LEVEL = "ppm"
+UNIT_VOC_LEVEL = "ppb"
+UNIT_VOLTAGE = "V"
+UNIT_BATTERY_LEVEL = "%"
+UNIT_UNKNOWN = "???"
+
+
 class SensorMeasurement:
+    __slots__ = ('value', 'unit')
+
     def __init__(self, value, unit):
         self.value = value
         self.unit = unit
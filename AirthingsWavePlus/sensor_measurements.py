@@ -17,9 +17,87 @@
 
 import json
 
+from AirthingsWavePlus.sensor_measurement import SensorMeasurement, UNIT_TEMPERATURE, UNIT_HUMIDITY, UNIT_PRESSURE, \
+    UNIT_RADON, UNIT_CO2_LEVEL, UNIT_VOC_LEVEL, UNIT_VOLTAGE, UNIT_BATTERY_LEVEL, UNIT_UNKNOWN
+
+# Indexes of values unpacked with CURRENT_SENSOR_VALUES_FORMAT ('<BBBBHHHHHHHH')
+SENSOR_VERSION_INDEX = 0
+HUMIDITY_INDEX = 1
+RADON_SHORT_TERM_AVG_INDEX = 4
+RADON_LONG_TERM_AVG_INDEX = 5
+TEMPERATURE_INDEX = 6
+PRESSURE_INDEX = 7
+CO2_LEVEL_INDEX = 8
+VOC_LEVEL_INDEX = 9
+
+# Indexes of values unpacked with ACCESS_CONTROL_POINT_RESPONSE_FORMAT ('<L12B6H')
+ILLUMINANCE_INDEX = 2
+AMBIENT_LIGHT_INDEX = 3
+MEASUREMENT_PERIODS_INDEX = 5
+VOLTAGE_INDEX = 17
+
+VOLTAGE_MIN = 2.0
+VOLTAGE_MAX = 3.0
+
+
+def conv2radon(radon_raw):
+    radon = "N/A"  # Either invalid measurement, or not available
+    if 0 <= radon_raw <= 16383:
+        radon = radon_raw
+    return radon
+
 
 class SensorMeasurements:
+    # Values are kept as plain numbers in slots, SensorMeasurement objects are only created by getters
+    __slots__ = ('device_name', 'device_model', 'device_bluetooth_mac_address', 'device_serial_number',
+                 'device_hardware_revision', 'device_firmware_revision', 'device_manufacturer_name',
+                 'device_sensor_version', 'timestamp', 'temperature', 'humidity', 'pressure',
+                 'radon_short_term_avg', 'radon_long_term_avg', 'co2_level', 'voc_level', 'illuminance',
+                 'ambient_light', 'measurement_periods', 'device_voltage', 'device_battery_level')
+
     def __init__(self, device_data, sensor_data, control_point_data):
+        self.__set_device_data(device_data)
+
+        self.timestamp = sensor_data['timestamp']
+        self.temperature = sensor_data['temperature'].value
+        self.humidity = sensor_data['humidity'].value
+        self.pressure = sensor_data['pressure'].value
+        self.radon_short_term_avg = sensor_data['radon_short_term_avg'].value
+        self.radon_long_term_avg = sensor_data['radon_long_term_avg'].value
+        self.co2_level = sensor_data['co2_level'].value
+        self.voc_level = sensor_data['voc_level'].value
+
+        self.illuminance = control_point_data['illuminance'].value
+        self.ambient_light = control_point_data['ambient_light'].value
+        self.measurement_periods = control_point_data['measurement_periods'].value
+        self.device_voltage = control_point_data['voltage'].value
+        self.device_battery_level = control_point_data['battery_level'].value
+
+    @classmethod
+    def from_raw_data(cls, device_data, timestamp, sensor_raw_data, control_point_raw_data):
+        measurements = cls.__new__(cls)
+        measurements.__set_device_data(device_data)
+        measurements.device_sensor_version = sensor_raw_data[SENSOR_VERSION_INDEX]
+
+        measurements.timestamp = timestamp
+        measurements.temperature = sensor_raw_data[TEMPERATURE_INDEX] / 100.0
+        measurements.humidity = sensor_raw_data[HUMIDITY_INDEX] / 2.0
+        measurements.pressure = sensor_raw_data[PRESSURE_INDEX] / 50.0
+        measurements.radon_short_term_avg = conv2radon(sensor_raw_data[RADON_SHORT_TERM_AVG_INDEX])
+        measurements.radon_long_term_avg = conv2radon(sensor_raw_data[RADON_LONG_TERM_AVG_INDEX])
+        measurements.co2_level = sensor_raw_data[CO2_LEVEL_INDEX] * 1.0
+        measurements.voc_level = sensor_raw_data[VOC_LEVEL_INDEX] * 1.0
+
+        measurements.illuminance = control_point_raw_data[ILLUMINANCE_INDEX]
+        measurements.ambient_light = control_point_raw_data[AMBIENT_LIGHT_INDEX]
+        measurements.measurement_periods = control_point_raw_data[MEASUREMENT_PERIODS_INDEX]
+        voltage = control_point_raw_data[VOLTAGE_INDEX] / 1000.0
+        measurements.device_voltage = voltage
+        measurements.device_battery_level = \
+            max(0, min(100, round((voltage - VOLTAGE_MIN) / (VOLTAGE_MAX - VOLTAGE_MIN) * 100)))
+        return measurements
+
+    def __set_device_data(self, device_data):
         self.device_name = device_data['name']
         self.device_model = device_data['model']
         self.device_bluetooth_mac_address = device_data['bluetooth_mac_addr']
@@ -27,22 +105,7 @@ class SensorMeasurements:
         self.device_hardware_revision = device_data['hardware_revision']
         self.device_firmware_revision = device_data['firmware_revision']
         self.device_manufacturer_name = device_data['manufacturer_name']
-        self.device_sensor_version = device_data['sensor_version']
-
-        self.timestamp = sensor_data['timestamp']
-        self.temperature = sensor_data['temperature'];
-        self.humidity = sensor_data['humidity']
-        self.pressure = sensor_data['pressure']
-        self.radon_short_term_avg = sensor_data['radon_short_term_avg']
-        self.radon_long_term_avg = sensor_data['radon_long_term_avg']
-        self.co2_level = sensor_data['co2_level']
-        self.voc_level = sensor_data['voc_level']
-
-        self.illuminance = control_point_data['illuminance']
-        self.ambient_light = control_point_data['ambient_light']
-        self.measurement_periods = control_point_data['measurement_periods']
-        self.device_voltage = control_point_data['voltage']
-        self.device_battery_level = control_point_data['battery_level']
+        self.device_sensor_version = device_data.get('sensor_version')
 
     def get_device_name(self):
         return self.device_name
@@ -72,42 +135,42 @@ class SensorMeasurements:
         return self.timestamp
 
     def get_temperature(self):
-        return self.temperature
+        return SensorMeasurement(self.temperature, UNIT_TEMPERATURE)
 
     def get_humidity(self):
-        return self.humidity
+        return SensorMeasurement(self.humidity, UNIT_HUMIDITY)
 
     def get_pressure(self):
-        return self.pressure
+        return SensorMeasurement(self.pressure, UNIT_PRESSURE)
 
     def get_radon_short_term_average(self):
-        return self.radon_short_term_avg
+        return SensorMeasurement(self.radon_short_term_avg, UNIT_RADON)
 
     def get_radon_long_term_average(self):
-        return self.radon_long_term_avg
+        return SensorMeasurement(self.radon_long_term_avg, UNIT_RADON)
 
     def get_co2_level(self):
-        return self.co2_level
+        return SensorMeasurement(self.co2_level, UNIT_CO2_LEVEL)
 
     def get_voc_level(self):
-        return self.voc_level
+        return SensorMeasurement(self.voc_level, UNIT_VOC_LEVEL)
 
     def get_illuminance(self):
-        return self.illuminance
+        return SensorMeasurement(self.illuminance, UNIT_UNKNOWN)
 
     def get_ambient_light(self):
-        return self.ambient_light
+        return SensorMeasurement(self.ambient_light, UNIT_UNKNOWN)
 
     def get_measurement_periods(self):
-        return self.measurement_periods
+        return SensorMeasurement(self.measurement_periods, UNIT_UNKNOWN)
 
     def get_device_voltage(self):
-        return self.device_voltage
+        return SensorMeasurement(self.device_voltage, UNIT_VOLTAGE)
 
     def get_device_battery_level(self):
-        return self.device_battery_level
+        return SensorMeasurement(self.device_battery_level, UNIT_BATTERY_LEVEL)
 
-    def to_json(self):
+    def to_json(self, indent=2):
         measurement_object = {
             "device": {
                 "name": self.device_name,
@@ -119,41 +182,41 @@ class SensorMeasurements:
                 "hardware_revision": self.device_hardware_revision,
                 "firmware_revision": self.device_firmware_revision,
                 "battery_level": {
-                    "value": self.device_battery_level.value,
-                    "unit": self.device_battery_level.unit
+                    "value": self.device_battery_level,
+                    "unit": UNIT_BATTERY_LEVEL
                 }
             },
             "measurements": {
                 "timestamp": self.timestamp.isoformat(),
                 "temperature": {
-                    "value": self.temperature.value,
-                    "unit": self.temperature.unit
+                    "value": self.temperature,
+                    "unit": UNIT_TEMPERATURE
                 },
                 "humidity": {
-                    "value": self.humidity.value,
-                    "unit": self.humidity.unit
+                    "value": self.humidity,
+                    "unit": UNIT_HUMIDITY
                 },
                 "pressure": {
-                    "value": self.pressure.value,
-                    "unit": self.pressure.unit
+                    "value": self.pressure,
+                    "unit": UNIT_PRESSURE
                 },
                 "radon_short_term_avg": {
-                    "value": self.radon_short_term_avg.value,
-                    "unit": self.radon_short_term_avg.unit
+                    "value": self.radon_short_term_avg,
+                    "unit": UNIT_RADON
                 },
                 "radon_long_term_avg": {
-                    "value": self.radon_long_term_avg.value,
-                    "unit": self.radon_long_term_avg.unit
+                    "value": self.radon_long_term_avg,
+                    "unit": UNIT_RADON
                 },
                 "co2_level": {
-                    "value": self.co2_level.value,
-                    "unit": self.co2_level.unit
+                    "value": self.co2_level,
+                    "unit": UNIT_CO2_LEVEL
                 },
                 "voc_level": {
-                    "value": self.voc_level.value,
-                    "unit": self.voc_level.unit
+                    "value": self.voc_level,
+                    "unit": UNIT_VOC_LEVEL
                 }
             }
         }
-        return json.dumps(measurement_object, indent=2, sort_keys=False, default=str, separators=(',', ':'))\
+        return json.dumps(measurement_object, indent=indent, sort_keys=False, default=str, separators=(',', ':'))\
             .encode('utf-8')
@@ -0,0 +1,169 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from AirthingsWavePlus.fleet_poller import FleetPoller
+from Benchmarks.simulated_brokers import SimulatedBroker, simulated_brokers
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+from Gateway.collector import Collector, run_collector
+from Gateway.gateway import Gateway, assign_devices
+from Kafka.kafka_publisher import KafkaPublisher
+from MQTT.mqtt_publisher import MqttPublisher
+from Pipeline.measurement_pipeline import MeasurementPipeline
+from Pipeline.publisher_fanout import PublisherFanout
+from Serialization.serializers import get_serializer
+from Sinks.kafka_sinks import KafkaSink
+from Sinks.mqtt_sinks import MqttSink
+
+
+class PipelineWriter:
+    # Hands measurements directly to the pipeline, as app.py does without gateway mode
+    def __init__(self, measurement_pipeline):
+        self.measurement_pipeline = measurement_pipeline
+        self.received = 0
+
+    async def put(self, sensor_measurement):
+        self.received += 1
+        await self.measurement_pipeline.process(sensor_measurement)
+        return True
+
+
+def run_simulated_collector(name, devices, interval, measurement_queue, device_count=0, profile_options=None,
+                            **kwargs):
+    # Collector process entry point reading simulated devices, device addresses are the same in every process
+    environment = SimulatedEnvironment(device_count, SimulationProfile(**(profile_options or {})))
+    with simulated_bleak(environment):
+        run_collector(name, devices, interval, measurement_queue, **kwargs)
+
+
+def create_pipeline(broker_latency):
+    kafka = KafkaSink("Kafka", KafkaPublisher("localhost:9092", "PLAINTEXT", None))
+    mqtt = MqttSink("MQTT", MqttPublisher("localhost"), qos=1)
+    publisher_fanout = PublisherFanout()
+    publisher_fanout.add_sink("Kafka", kafka, get_serializer("json"), "benchmark")
+    publisher_fanout.add_sink("MQTT", mqtt, get_serializer("json"), "benchmark")
+    return MeasurementPipeline(publisher_fanout), [kafka, mqtt]
+
+
+async def measure_throughput(get_received, duration, warmup):
+    # Startup (process spawn, first scan) is excluded by waiting for the warmup before counting
+    await asyncio.sleep(warmup)
+    received = get_received()
+    begin = time.perf_counter()
+    await asyncio.sleep(duration)
+    return (get_received() - received) / (time.perf_counter() - begin)
+
+
+async def benchmark_single_process(profile, devices, interval, duration, warmup, broker_latency,
+                                   max_concurrent_connections):
+    environment = SimulatedEnvironment(devices, profile)
+    device_configs, _ = assign_devices([{'mac_address': device.mac_address} for device in environment.devices],
+                                       interval)[0]
+    with simulated_bleak(environment), simulated_brokers(SimulatedBroker(broker_latency),
+                                                         SimulatedBroker(broker_latency)):
+        measurement_pipeline, sinks = create_pipeline(broker_latency)
+        measurement_writer = PipelineWriter(measurement_pipeline)
+        collector = Collector("single-process", FleetPoller(device_configs, max_concurrent_connections),
+                              measurement_writer, device_configs, interval)
+        await measurement_pipeline.start()
+        task = asyncio.get_running_loop().create_task(collector.run())
+        measurements_per_second = await measure_throughput(lambda: measurement_writer.received, duration, warmup)
+        task.cancel()
+        await task
+        await measurement_pipeline.close()
+        for sink in sinks:
+            await sink.close()
+    return {"collectors": 0, "measurements_per_second": measurements_per_second}
+
+
+async def benchmark_gateway(profile, devices, interval, duration, warmup, broker_latency, max_concurrent_connections,
+                            collectors):
+    environment = SimulatedEnvironment(devices, profile)
+    device_configs = [{'mac_address': device.mac_address} for device in environment.devices]
+    gateway = Gateway([{
+        "name": "collector-{0}".format(index),
+        "devices": collector_devices,
+        "interval": interval,
+        "device_count": devices,
+        "profile_options": profile.to_dict(),
+        "poller_options": {"max_concurrent_connections": max_concurrent_connections},
+        "log_level": logging.WARNING
+    } for index, (collector_devices, _) in enumerate(assign_devices(device_configs, interval, collectors))],
+        collector_target=run_simulated_collector)
+    with simulated_brokers(SimulatedBroker(broker_latency), SimulatedBroker(broker_latency)):
+        measurement_pipeline, sinks = create_pipeline(broker_latency)
+        await measurement_pipeline.start()
+        await gateway.start(measurement_pipeline)
+        measurements_per_second = await measure_throughput(lambda: gateway.reader.received, duration, warmup)
+        await gateway.close()
+        await measurement_pipeline.close()
+        for sink in sinks:
+            await sink.close()
+    return {"collectors": collectors, "measurements_per_second": measurements_per_second}
+
+
+async def run_gateway_benchmark(profile, devices, interval, duration, warmup, broker_latency,
+                                max_concurrent_connections, collector_counts):
+    results = {"single_process": await benchmark_single_process(profile, devices, interval, duration, warmup,
+                                                                broker_latency, max_concurrent_connections)}
+    for collectors in collector_counts:
+        results["gateway_{0}_collectors".format(collectors)] = await benchmark_gateway(
+            profile, devices, interval, duration, warmup, broker_latency, max_concurrent_connections, collectors)
+    return results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level="WARNING")
+    log = logging.getLogger("gateway_benchmark")
+    log.setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Throughput of gateway mode with 1..n collector processes compared "
+                                                 "to a single process, against simulated devices and brokers")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=1.0, help="Polling interval of each device in seconds")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--broker-latency", type=float, default=0.002)
+    parser.add_argument("--max-concurrent-connections", type=int, default=8,
+                        help="Connections per collector, high enough for reads to be CPU bound")
+    parser.add_argument("--collectors", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--time-scale", type=float, default=0.001,
+                        help="Scales simulated BLE latencies, small values make reads CPU bound")
+    parser.add_argument("--output", help="File the results are written to as JSON")
+    arguments = parser.parse_args()
+
+    simulation_profile = SimulationProfile(time_scale=arguments.time_scale)
+    benchmark_results = asyncio.run(run_gateway_benchmark(simulation_profile,
+                                                          arguments.devices,
+                                                          arguments.interval,
+                                                          arguments.duration,
+                                                          arguments.warmup,
+                                                          arguments.broker_latency,
+                                                          arguments.max_concurrent_connections,
+                                                          arguments.collectors))
+    for benchmark_name, benchmark_result in benchmark_results.items():
+        log.info("{0}: {1}".format(benchmark_name, benchmark_result))
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump({"cpu_count": os.cpu_count(), "simulation_profile": simulation_profile.to_dict(),
+                       "results": benchmark_results}, output_file, indent=2)
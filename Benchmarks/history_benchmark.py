@@ -0,0 +1,90 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from History.history_store import HistoryStore
+
+
+async def run_history_benchmark(devices=5, years=2, interval=300, batch_size=5000, queries=100):
+    with tempfile.TemporaryDirectory() as directory:
+        history_store = HistoryStore(os.path.join(directory, "history.db"), batch_size=batch_size)
+        await history_store.start()
+
+        sensor_measurements = create_sample_measurements()
+        samples_per_device = int(years * 365 * 86400 / interval)
+        start = datetime.now() - timedelta(seconds=samples_per_device * interval)
+
+        insert_start = time.perf_counter()
+        for sample in range(samples_per_device):
+            sensor_measurements.timestamp = start + timedelta(seconds=sample * interval)
+            for device in range(devices):
+                sensor_measurements.device_serial_number = 2930000000 + device
+                sensor_measurements.co2_level = random.uniform(400, 1500)
+                await history_store.add(sensor_measurements)
+        await history_store.flush()
+        insert_seconds = time.perf_counter() - insert_start
+        rows = samples_per_device * devices
+
+        first_timestamp = start.timestamp()
+        last_timestamp = first_timestamp + samples_per_device * interval
+
+        async def measure(query, window):
+            latencies = []
+            for _ in range(queries):
+                serial_number = 2930000000 + random.randrange(devices)
+                query_start = random.uniform(first_timestamp, last_timestamp - window)
+                begin = time.perf_counter()
+                await query(serial_number, query_start, query_start + window)
+                latencies.append((time.perf_counter() - begin) * 1000)
+            latencies.sort()
+            return {"median_ms": latencies[len(latencies) // 2], "max_ms": latencies[-1]}
+
+        results = {
+            "rows": rows,
+            "database_size_mb": sum(os.path.getsize(os.path.join(directory, filename))
+                                    for filename in os.listdir(directory)) / 1000000,
+            "insert_rows_per_second": rows / insert_seconds,
+            "range_query_1_day": await measure(history_store.query_range, 86400),
+            "downsample_1_month_hourly": await measure(
+                lambda serial_number, begin, end: history_store.query_downsampled(
+                    serial_number, begin, end, 3600, 'co2_level'), 30 * 86400)
+        }
+        await history_store.close()
+        return results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level="INFO")
+    log = logging.getLogger("history_benchmark")
+    parser = argparse.ArgumentParser(description="History store insert and query benchmark")
+    parser.add_argument("--devices", type=int, default=5)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--interval", type=int, default=300)
+    arguments = parser.parse_args()
+    for name, result in asyncio.run(run_history_benchmark(arguments.devices,
+                                                          arguments.years,
+                                                          arguments.interval)).items():
+        log.info("{0}: {1}".format(name, result))
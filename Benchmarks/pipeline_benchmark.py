@@ -0,0 +1,242 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+from AirthingsWavePlus.airthings_wave_plus import AirthingsWavePlus
+from AirthingsWavePlus.device_info_cache import DeviceInfoCache
+from AirthingsWavePlus.fleet_poller import FleetPoller
+from Benchmarks.serialization_benchmark import create_sample_measurements, run_serialization_benchmark
+from Benchmarks.simulated_brokers import SimulatedBroker, simulated_brokers
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+from Kafka.kafka_publisher import KafkaPublisher
+from MQTT.mqtt_publisher import MqttPublisher
+from Pipeline.publisher_fanout import PublisherFanout
+from Serialization.serializers import get_serializer, get_batch_serializer
+from Sinks.kafka_sinks import KafkaSink
+from Sinks.mqtt_sinks import MqttSink
+
+# Results compared between runs, other numeric results describe the benchmark setup
+LOWER_IS_BETTER_SUFFIXES = ('_ms', '_us', '_seconds', 'bytes_per_message')
+HIGHER_IS_BETTER_SUFFIXES = ('_per_second', '_per_minute', '_per_adapter')
+
+
+def summarize_latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+async def benchmark_cycle_latency(profile, iterations=20):
+    environment = SimulatedEnvironment(1, profile)
+    device = environment.devices[0]
+    with simulated_bleak(environment):
+        reader = AirthingsWavePlus(device.mac_address, None, DeviceInfoCache())
+        latencies = []
+        for _ in range(iterations):
+            begin = time.perf_counter()
+            await reader.read_sensor_data(environment.get_advertisements()[0])
+            latencies.append(time.perf_counter() - begin)
+    return summarize_latencies(latencies)
+
+
+async def benchmark_fleet_throughput(profile, devices=20, rounds=3, max_concurrent_connections=1,
+                                     persistent_connections=False, adapters=1):
+    environment = SimulatedEnvironment(devices, profile)
+    with simulated_bleak(environment):
+        fleet_poller = FleetPoller([{'mac_address': device.mac_address} for device in environment.devices],
+                                   max_concurrent_connections,
+                                   persistent_connections=persistent_connections,
+                                   adapters=[{'name': "hci{0}".format(index)} for index in range(adapters)]
+                                   if adapters > 1 else None)
+        await fleet_poller.start()
+        read_count = 0
+        begin = time.perf_counter()
+        for _ in range(rounds):
+            read_count += len(await fleet_poller.poll())
+        seconds = time.perf_counter() - begin
+        await fleet_poller.stop()
+    return {
+        "devices": devices,
+        "max_concurrent_connections": max_concurrent_connections,
+        "persistent_connections": persistent_connections,
+        "adapters": adapters,
+        "reads": read_count,
+        "read_failures": devices * rounds - read_count,
+        "round_seconds": seconds / rounds,
+        "devices_per_minute": read_count / seconds * 60,
+        "devices_per_minute_per_adapter": read_count / seconds * 60 / adapters,
+        "scans": environment.scans
+    }
+
+
+async def benchmark_publisher_throughput(messages=5000, broker_latency=0.002, concurrency=100, batch_max_wait=None):
+    with simulated_brokers(SimulatedBroker(broker_latency), SimulatedBroker(broker_latency)) as brokers:
+        kafka = KafkaSink("Kafka", KafkaPublisher("localhost:9092", "PLAINTEXT", None))
+        mqtt = MqttSink("MQTT", MqttPublisher("localhost"), qos=1)
+        publisher_fanout = PublisherFanout()
+        # Batching applies to both sinks, so the message counts show the reduction of broker messages
+        serializer = get_serializer("json") if batch_max_wait is None else get_batch_serializer("json")
+        publisher_fanout.add_sink("Kafka", kafka, serializer, "benchmark", batch_max_wait=batch_max_wait)
+        publisher_fanout.add_sink("MQTT", mqtt, serializer, "benchmark", batch_max_wait=batch_max_wait)
+        await publisher_fanout.start()
+
+        sensor_measurements = create_sample_measurements()
+        semaphore = asyncio.Semaphore(concurrency)
+        failures = 0
+
+        async def publish():
+            nonlocal failures
+            async with semaphore:
+                results = await publisher_fanout.publish(sensor_measurements)
+                failures += len([result for result in results.values() if not result])
+
+        begin = time.perf_counter()
+        await asyncio.gather(*[publish() for _ in range(messages)])
+        seconds = time.perf_counter() - begin
+        await publisher_fanout.close()
+        await kafka.close()
+        await mqtt.close()
+    return {
+        "messages": messages,
+        "broker_latency": broker_latency,
+        "publish_failures": failures,
+        "measurements_per_second": messages / seconds,
+        "kafka_received": brokers[0].received_count,
+        "kafka_received_bytes": brokers[0].received_bytes,
+        "mqtt_received": brokers[1].received_count
+    }
+
+
+async def run_pipeline_benchmark(profile, devices=20, rounds=3, iterations=20, messages=5000):
+    return {
+        "cycle_latency": await benchmark_cycle_latency(profile, iterations),
+        "fleet_throughput": await benchmark_fleet_throughput(profile, devices, rounds),
+        "fleet_throughput_concurrent": await benchmark_fleet_throughput(profile, devices, rounds,
+                                                                        max_concurrent_connections=4),
+        "fleet_throughput_persistent": await benchmark_fleet_throughput(profile, devices, rounds,
+                                                                        persistent_connections=True),
+        "fleet_throughput_adapters": await benchmark_fleet_throughput(profile, devices, rounds, adapters=4),
+        "serialization": run_serialization_benchmark(),
+        "publisher_throughput": await benchmark_publisher_throughput(messages),
+        "publisher_throughput_batched": await benchmark_publisher_throughput(messages, concurrency=1000,
+                                                                     batch_max_wait=0.05)
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def flatten_results(results, prefix=""):
+    flat_results = {}
+    for key, value in results.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat_results.update(flatten_results(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat_results[name] = value
+    return flat_results
+
+
+def compare_results(baseline, results, threshold=0.1):
+    # Returns (name, baseline, current, relative change, regression) for every numeric result present in both runs
+    baseline_values = flatten_results(baseline["results"])
+    comparison = []
+    for name, value in flatten_results(results["results"]).items():
+        baseline_value = baseline_values.get(name)
+        if baseline_value is None or baseline_value == 0:
+            continue
+        change = (value - baseline_value) / abs(baseline_value)
+        if name.endswith(LOWER_IS_BETTER_SUFFIXES):
+            regression = change > threshold
+        elif name.endswith(HIGHER_IS_BETTER_SUFFIXES):
+            regression = change < -threshold
+        else:
+            continue
+        comparison.append((name, baseline_value, value, change, regression))
+    return comparison
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level="WARNING")
+    log = logging.getLogger("pipeline_benchmark")
+    log.setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against simulated Wave Plus devices and brokers")
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Scales simulated BLE latencies, e.g. 0.1 for a quick run")
+    parser.add_argument("--connect-failure-rate", type=float, default=0.0)
+    parser.add_argument("--read-failure-rate", type=float, default=0.0)
+    parser.add_argument("--output", default="./benchmark-results/{0}.json".format(
+        datetime.now().strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as regression")
+    arguments = parser.parse_args()
+
+    simulation_profile = SimulationProfile(connect_failure_rate=arguments.connect_failure_rate,
+                                           read_failure_rate=arguments.read_failure_rate,
+                                           time_scale=arguments.time_scale)
+    benchmark_results = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "simulation_profile": simulation_profile.to_dict(),
+        "results": asyncio.run(run_pipeline_benchmark(simulation_profile,
+                                                      arguments.devices,
+                                                      arguments.rounds,
+                                                      arguments.iterations,
+                                                      arguments.messages))
+    }
+    for benchmark_name, benchmark_result in benchmark_results["results"].items():
+        log.info("{0}: {1}".format(benchmark_name, benchmark_result))
+
+    output_directory = os.path.dirname(arguments.output)
+    if output_directory and not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+    with open(arguments.output, "w") as output_file:
+        json.dump(benchmark_results, output_file, indent=2)
+    log.info("Results written to {0}".format(arguments.output))
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as baseline_file:
+            baseline_results = json.load(baseline_file)
+        for result_name, baseline_value, current_value, relative_change, is_regression in compare_results(
+                baseline_results, benchmark_results, arguments.threshold):
+            log.log(logging.WARNING if is_regression else logging.INFO,
+                    "{0:<60} {1:>12.3f} -> {2:>12.3f} ({3:+.1%}){4}".format(
+                        result_name, baseline_value, current_value, relative_change,
+                        " REGRESSION" if is_regression else ""))
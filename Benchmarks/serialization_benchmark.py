@@ -0,0 +1,76 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import timeit
+from datetime import datetime
+
+from AirthingsWavePlus.sensor_measurement import SensorMeasurement
+from AirthingsWavePlus.sensor_measurements import SensorMeasurements
+from Serialization.serializers import SERIALIZERS
+
+
+def create_sample_measurements():
+    device_data = {
+        'name': "Airthings Wave+",
+        'model': "2930",
+        'bluetooth_mac_addr': "AA:BB:CC:DD:EE:FF",
+        'serial_number': 2930012345,
+        'hardware_revision': "REV A",
+        'firmware_revision': "G-BLE-1.4.5-beta+0",
+        'manufacturer_name': "Airthings AS",
+        'sensor_version': 1
+    }
+    sensor_data = {
+        'timestamp': datetime.now(),
+        'temperature': SensorMeasurement(25.06, "degC"),
+        'humidity': SensorMeasurement(45.5, "%rH"),
+        'pressure': SensorMeasurement(992.68, "hPa"),
+        'radon_short_term_avg': SensorMeasurement(90, "Bq/m3"),
+        'radon_long_term_avg': SensorMeasurement(100, "Bq/m3"),
+        'co2_level': SensorMeasurement(685.0, "ppm"),
+        'voc_level': SensorMeasurement(46.0, "ppb")
+    }
+    control_point_data = {
+        'illuminance': SensorMeasurement(3, "???"),
+        'ambient_light': SensorMeasurement(12, "???"),
+        'measurement_periods': SensorMeasurement(4, "???"),
+        'voltage': SensorMeasurement(2.94, "V"),
+        'battery_level': SensorMeasurement(94, "%")
+    }
+    return SensorMeasurements(device_data, sensor_data, control_point_data)
+
+
+def run_serialization_benchmark(iterations=20000):
+    sensor_measurements = create_sample_measurements()
+    results = {}
+    for name, serializer in SERIALIZERS.items():
+        payload = serializer.serialize(sensor_measurements)
+        seconds = timeit.timeit(lambda: serializer.serialize(sensor_measurements), number=iterations)
+        results[name] = {
+            "bytes_per_message": len(payload),
+            "encode_time_us": seconds / iterations * 1000000
+        }
+    return results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level="INFO")
+    log = logging.getLogger("serialization_benchmark")
+    for format_name, result in run_serialization_benchmark().items():
+        log.info("{0:<14} {1:>5} bytes/message {2:>8.2f} us/encode".format(
+            format_name, result["bytes_per_message"], result["encode_time_us"]))
@@ -0,0 +1,189 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import contextlib
+import itertools
+import random
+import threading
+import time
+from collections import namedtuple
+
+import paho.mqtt.client as mqtt
+
+from Kafka import kafka_publisher
+from MQTT import mqtt_publisher
+
+RecordMetadata = namedtuple('RecordMetadata', ['topic', 'partition', 'offset'])
+
+
+class SimulatedBroker:
+    def __init__(self, latency=0.002, jitter=0.5, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.received_count = 0
+        self.received_bytes = 0
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.pending = []
+        self.worker = None
+        self.closed = False
+
+    def __run(self):
+        # Acknowledgements are delivered from a background thread, like the network threads of real clients
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.pending:
+                    return
+                acknowledge_at, acknowledge = self.pending.pop(0)
+            delay = acknowledge_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            acknowledge(random.random() >= self.failure_rate)
+
+    def receive(self, payload, acknowledge):
+        with self.condition:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.__run, name="SimulatedBroker", daemon=True)
+                self.worker.start()
+            self.received_count += 1
+            self.received_bytes += len(payload)
+            latency = self.latency * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.pending.append((time.monotonic() + latency, acknowledge))
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.worker is not None:
+            self.worker.join()
+
+
+class SimulatedFuture:
+    # Like kafka-python futures, callbacks added after the future is resolved are called right away
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.errbacks = []
+        self.result = None
+
+    def add_callback(self, callback):
+        with self.lock:
+            if self.result is None:
+                self.callbacks.append(callback)
+                return
+        if self.result[0]:
+            callback(self.result[1])
+
+    def add_errback(self, errback):
+        with self.lock:
+            if self.result is None:
+                self.errbacks.append(errback)
+                return
+        if not self.result[0]:
+            errback(self.result[1])
+
+    def resolve(self, success, record_metadata):
+        with self.lock:
+            self.result = (success, record_metadata if success else Exception("Simulated broker failure"))
+            callbacks = self.callbacks if success else self.errbacks
+        for callback in callbacks:
+            callback(self.result[1])
+
+
+class SimulatedKafkaProducer:
+    broker = None
+
+    def __init__(self, **configs):
+        self.offsets = itertools.count()
+
+    def send(self, topic, value=None, **kwargs):
+        future = SimulatedFuture()
+        record_metadata = RecordMetadata(topic, 0, next(self.offsets))
+        self.broker.receive(value, lambda success: future.resolve(success, record_metadata))
+        return future
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+
+class SimulatedMqttClient:
+    broker = None
+
+    def __init__(self, *args, **kwargs):
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_publish = None
+        self.on_log = None
+        self.mids = itertools.count(1)
+
+    def tls_set(self, **kwargs):
+        pass
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def max_inflight_messages_set(self, inflight):
+        pass
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def connect_async(self, host, port=1883, keepalive=60, **kwargs):
+        pass
+
+    def loop_start(self):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def publish(self, topic, payload=None, qos=0, retain=False, **kwargs):
+        message_info = mqtt.MQTTMessageInfo(next(self.mids))
+        message_info.rc = mqtt.MQTT_ERR_SUCCESS
+
+        def acknowledge(success):
+            if success and self.on_publish is not None:
+                self.on_publish(self, None, message_info.mid)
+
+        self.broker.receive(payload, acknowledge)
+        return message_info
+
+
+@contextlib.contextmanager
+def simulated_brokers(kafka_broker, mqtt_broker):
+    original_kafka_producer = kafka_publisher.KafkaProducer
+    original_mqtt_client = mqtt_publisher.mqtt.Client
+    kafka_publisher.KafkaProducer = type("KafkaProducer", (SimulatedKafkaProducer,), {"broker": kafka_broker})
+    mqtt_publisher.mqtt.Client = type("Client", (SimulatedMqttClient,), {"broker": mqtt_broker})
+    try:
+        yield kafka_broker, mqtt_broker
+    finally:
+        kafka_publisher.KafkaProducer = original_kafka_producer
+        mqtt_publisher.mqtt.Client = original_mqtt_client
+        kafka_broker.close()
+        mqtt_broker.close()
@@ -0,0 +1,320 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import contextlib
+import random
+import struct
+import time
+
+from AirthingsWavePlus import advertisement_listener, airthings_wave_plus, discovery_cache, persistent_connection
+from AirthingsWavePlus.airthings_wave_plus import AIRTHINGS_COMPANY_ID, CURRENT_SENSOR_VALUES_STRUCT, \
+    ACCESS_CONTROL_POINT_RESPONSE_STRUCT, GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT, \
+    GATT_CHAR_HANDLE_CURRENT_SENSOR_VALUES, GATT_CHAR_HANDLE_DEVICE_NAME, \
+    GATT_CHAR_HANDLE_DEVICE_MODEL_NUMBER_STRING, GATT_CHAR_HANDLE_DEVICE_FIRMWARE_REVISION_STRING, \
+    GATT_CHAR_HANDLE_DEVICE_HARDWARE_REVISION_STRING, GATT_CHAR_HANDLE_DEVICE_MANUFACTURER_NAME_STRING
+
+# Modules importing BleakScanner/BleakClient, replaced while a simulation is active
+BLEAK_MODULES = (airthings_wave_plus, discovery_cache, advertisement_listener, persistent_connection)
+
+ACCESS_CONTROL_POINT_REQUEST = 0x6d
+
+
+class SimulationProfile:
+    def __init__(self,
+                 scan_latency=1.0,
+                 connect_latency=1.5,
+                 gatt_latency=0.06,
+                 notification_latency=0.1,
+                 jitter=0.2,
+                 connect_failure_rate=0.0,
+                 read_failure_rate=0.0,
+                 notification_loss_rate=0.0,
+                 advertising_interval=1.0,
+                 refresh_period=300,
+                 time_scale=1.0):
+        self.scan_latency = scan_latency
+        self.connect_latency = connect_latency
+        self.gatt_latency = gatt_latency
+        self.notification_latency = notification_latency
+        # Relative jitter: each latency is drawn uniformly from latency * (1 +- jitter)
+        self.jitter = jitter
+        self.connect_failure_rate = connect_failure_rate
+        self.read_failure_rate = read_failure_rate
+        self.notification_loss_rate = notification_loss_rate
+        self.advertising_interval = advertising_interval
+        self.refresh_period = refresh_period
+        # Scales all latencies and intervals, e.g. 0.1 runs the simulation ten times faster
+        self.time_scale = time_scale
+
+    def delay(self, latency):
+        return max(0.0, latency * self.time_scale * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class SimulatedWavePlus:
+    def __init__(self, serial_number, mac_address, profile, rssi=-70):
+        self.serial_number = serial_number
+        self.mac_address = mac_address
+        self.profile = profile
+        self.rssi = rssi
+        # Each device refreshes its values at its own phase within the refresh period
+        self.refresh_phase = random.uniform(0, profile.refresh_period)
+        self.measurement_periods = 0
+        self.refreshed_at = None
+        self.sensor_values = None
+        self.control_point_values = None
+        self.connected = False
+        self.connections = 0
+        self.reads = 0
+
+    def get_manufacturer_data(self):
+        # Airthings advertisement: serial number (uint32 little endian) followed by 2 unknown bytes
+        return struct.pack('<IH', self.serial_number, 0)
+
+    def __refresh(self):
+        period = self.profile.refresh_period * self.profile.time_scale
+        refreshed_at = int((time.monotonic() - self.refresh_phase * self.profile.time_scale) // period)
+        if refreshed_at == self.refreshed_at:
+            return
+        self.refreshed_at = refreshed_at
+        self.measurement_periods = (self.measurement_periods + 1) % 256
+        self.sensor_values = CURRENT_SENSOR_VALUES_STRUCT.pack(
+            1,
+            int(random.uniform(30, 60) * 2),
+            0, 0,
+            int(random.uniform(20, 150)),
+            int(random.uniform(40, 120)),
+            int(random.uniform(19, 26) * 100),
+            int(random.uniform(980, 1030) * 50),
+            int(random.uniform(400, 1500)),
+            int(random.uniform(20, 400)),
+            0, 0)
+        self.control_point_values = bytes(2) + ACCESS_CONTROL_POINT_RESPONSE_STRUCT.pack(
+            0,
+            0, int(random.uniform(0, 255)), int(random.uniform(0, 255)), 0, self.measurement_periods,
+            0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, int(random.uniform(2500, 3000)), 0)
+
+    def read_characteristic(self, char_specifier):
+        self.__refresh()
+        if char_specifier == GATT_CHAR_HANDLE_CURRENT_SENSOR_VALUES:
+            self.reads += 1
+            return bytearray(self.sensor_values)
+        if char_specifier == GATT_CHAR_HANDLE_DEVICE_NAME:
+            return bytearray(b"Airthings Wave+")
+        if char_specifier == GATT_CHAR_HANDLE_DEVICE_MODEL_NUMBER_STRING:
+            return bytearray(b"2930")
+        if char_specifier == GATT_CHAR_HANDLE_DEVICE_FIRMWARE_REVISION_STRING:
+            return bytearray(b"G-BLE-1.5.3-master+0")
+        if char_specifier == GATT_CHAR_HANDLE_DEVICE_HARDWARE_REVISION_STRING:
+            return bytearray(b"REV A")
+        if char_specifier == GATT_CHAR_HANDLE_DEVICE_MANUFACTURER_NAME_STRING:
+            return bytearray(b"Airthings AS")
+        raise Exception("Unknown characteristic: {0}".format(char_specifier))
+
+    def get_control_point_response(self):
+        self.__refresh()
+        return bytearray(self.control_point_values)
+
+
+class SimulatedAdvertisementData:
+    def __init__(self, manufacturer_data, rssi):
+        self.manufacturer_data = manufacturer_data
+        self.rssi = rssi
+
+
+class SimulatedBLEDevice:
+    def __init__(self, simulated_device):
+        self.address = simulated_device.mac_address
+        self.name = "Airthings Wave+"
+        self.rssi = simulated_device.rssi
+        self.metadata = {'manufacturer_data': {AIRTHINGS_COMPANY_ID: simulated_device.get_manufacturer_data()}}
+        self.simulated_device = simulated_device
+
+    def __repr__(self):
+        return "SimulatedBLEDevice({0}, {1})".format(self.address, self.name)
+
+
+class SimulatedEnvironment:
+    def __init__(self, device_count=10, profile=None, first_serial_number=2930000000):
+        self.profile = profile if profile is not None else SimulationProfile()
+        self.devices = [SimulatedWavePlus(first_serial_number + index,
+                                          "AA:BB:CC:{0:02X}:{1:02X}:{2:02X}".format(
+                                              (index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF),
+                                          self.profile,
+                                          rssi=random.randint(-90, -50))
+                        for index in range(device_count)]
+        # Connection establishment is serialized per adapter
+        self.connect_locks = {}
+        self.scans = 0
+
+    def get_connect_lock(self, adapter=None):
+        if adapter not in self.connect_locks:
+            self.connect_locks[adapter] = asyncio.Lock()
+        return self.connect_locks[adapter]
+
+    def get_advertisements(self):
+        return [SimulatedBLEDevice(device) for device in self.devices]
+
+    def find_device(self, address):
+        for device in self.devices:
+            if device.mac_address.upper() == str(address).upper():
+                return device
+        return None
+
+    def create_scanner_class(self):
+        return type("BleakScanner", (SimulatedBleakScanner,), {"environment": self})
+
+    def create_client_class(self):
+        return type("BleakClient", (SimulatedBleakClient,), {"environment": self})
+
+
+class SimulatedBleakScanner:
+    environment = None
+
+    def __init__(self, detection_callback=None, **kwargs):
+        self.detection_callback = detection_callback
+        self.advertising_task = None
+
+    @classmethod
+    async def discover(cls, timeout=5.0, **kwargs):
+        cls.environment.scans += 1
+        await asyncio.sleep(cls.environment.profile.delay(cls.environment.profile.scan_latency))
+        return cls.environment.get_advertisements()
+
+    @classmethod
+    async def find_device_by_address(cls, device_identifier, timeout=10.0, **kwargs):
+        for advertisement in await cls.discover(timeout):
+            if advertisement.address.upper() == device_identifier.upper():
+                return advertisement
+        return None
+
+    async def __advertise(self):
+        profile = self.environment.profile
+        while True:
+            for advertisement in self.environment.get_advertisements():
+                self.detection_callback(advertisement, SimulatedAdvertisementData(
+                    advertisement.metadata['manufacturer_data'], advertisement.rssi))
+            await asyncio.sleep(profile.advertising_interval * profile.time_scale)
+
+    async def start(self):
+        self.advertising_task = asyncio.get_running_loop().create_task(self.__advertise())
+
+    async def stop(self):
+        if self.advertising_task is not None:
+            self.advertising_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.advertising_task
+            self.advertising_task = None
+
+
+class SimulatedBleakClient:
+    environment = None
+
+    def __init__(self, address_or_ble_device, disconnected_callback=None, timeout=10.0, **kwargs):
+        address = getattr(address_or_ble_device, 'address', address_or_ble_device)
+        self.simulated_device = self.environment.find_device(address)
+        self.disconnected_callback = disconnected_callback
+        self.timeout = timeout
+        self.adapter = kwargs.get('adapter')
+        self.connected = False
+        self.notification_callbacks = {}
+
+    @property
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self, **kwargs):
+        profile = self.environment.profile
+        async with self.environment.get_connect_lock(self.adapter):
+            await asyncio.sleep(profile.delay(profile.connect_latency))
+        if self.simulated_device is None or random.random() < profile.connect_failure_rate:
+            raise Exception("Simulated connection failure")
+        self.connected = True
+        self.simulated_device.connections += 1
+        return True
+
+    async def disconnect(self):
+        if not self.connected:
+            return True
+        self.connected = False
+        if self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+        return True
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
+
+    async def __gatt_operation(self):
+        profile = self.environment.profile
+        if not self.connected:
+            raise Exception("Not connected")
+        await asyncio.sleep(profile.delay(profile.gatt_latency))
+        if random.random() < profile.read_failure_rate:
+            # A failed GATT operation usually means the link was lost
+            await self.disconnect()
+            raise Exception("Simulated GATT failure")
+
+    async def read_gatt_char(self, char_specifier, **kwargs):
+        await self.__gatt_operation()
+        return self.simulated_device.read_characteristic(char_specifier)
+
+    async def write_gatt_char(self, char_specifier, data, response=False):
+        await self.__gatt_operation()
+        if char_specifier == GATT_CHAR_HANDLE_ACCESS_CONTROL_POINT and data[0] == ACCESS_CONTROL_POINT_REQUEST:
+            callback = self.notification_callbacks.get(char_specifier)
+            profile = self.environment.profile
+            if callback is not None and random.random() >= profile.notification_loss_rate:
+                response = self.simulated_device.get_control_point_response()
+                asyncio.get_running_loop().call_later(profile.delay(profile.notification_latency),
+                                                      callback, char_specifier, response)
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        await self.__gatt_operation()
+        self.notification_callbacks[char_specifier] = callback
+
+    async def stop_notify(self, char_specifier):
+        await self.__gatt_operation()
+        self.notification_callbacks.pop(char_specifier, None)
+
+
+@contextlib.contextmanager
+def simulated_bleak(environment):
+    originals = [(module, module.BleakScanner if hasattr(module, 'BleakScanner') else None,
+                  module.BleakClient if hasattr(module, 'BleakClient') else None) for module in BLEAK_MODULES]
+    scanner_class = environment.create_scanner_class()
+    client_class = environment.create_client_class()
+    for module, scanner, client in originals:
+        if scanner is not None:
+            module.BleakScanner = scanner_class
+        if client is not None:
+            module.BleakClient = client_class
+    try:
+        yield environment
+    finally:
+        for module, scanner, client in originals:
+            if scanner is not None:
+                module.BleakScanner = scanner
+            if client is not None:
+                module.BleakClient = client
@@ -0,0 +1,61 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import os
+
+from Config.yaml_config import Config
+
+
+class ConfigWatcher:
+    # Polls the modification time of the configuration file. A changed file is loaded and validated into a new Config,
+    # on_change(old_config, new_config) applies it. Invalid files and failed changes keep the current configuration.
+    def __init__(self, config, on_change):
+        self.class_name = "ConfigWatcher"
+        self.config = config
+        self.on_change = on_change
+        self.file_state = self.__get_file_state()
+
+    def __get_file_state(self):
+        file_stat = os.stat(self.config.filename)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    async def check(self):
+        log = logging.getLogger(self.class_name + ".check")
+        try:
+            file_state = self.__get_file_state()
+        except OSError as e:
+            log.error("Error during checking of configuration file {0}: {1}".format(self.config.filename, str(e)))
+            return
+        if file_state == self.file_state:
+            return
+        self.file_state = file_state
+
+        try:
+            config = Config(self.config.filename)
+        except Exception as e:
+            log.error("Changed configuration is not applied: {0}".format(str(e)))
+            return
+        if config.settings == self.config.settings:
+            return
+        log.info("Configuration file {0} changed, applying changes...".format(self.config.filename))
+        try:
+            await self.on_change(self.config, config)
+        except Exception as e:
+            log.error("Error during applying of changed configuration, keeping the current one: {0}".format(str(e)))
+            return
+        self.config = config
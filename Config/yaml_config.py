@@ -15,95 +15,631 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import yaml
+
+import dataclasses
 import logging
+import typing
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import yaml
+
+from Pipeline.window_aggregator import DEFAULT_ROLLUP_WINDOWS
+from TimeSeries.time_series_store import DEFAULT_WINDOWS
 
 log = logging.getLogger("Config")
 
+NUMBER = (int, float)
+
+
+def empty_mapping():
+    return MappingProxyType({})
+
+
+# Settings are frozen dataclasses built from the YAML file. Field types are checked when the file is loaded, empty or
+# missing values get the defaults below and unknown options are rejected, so misspelled options are not ignored.
+
+
+@dataclasses.dataclass(frozen=True)
+class AdapterSettings:
+    name: typing.Optional[str] = None
+    max_concurrent_connections: typing.Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class BluetoothSettings:
+    mac_address: typing.Optional[str] = None
+    max_concurrent_connections: int = 1
+    discovery_cache_ttl: float = 3600
+    passive_mode: bool = False
+    measurement_max_age: float = 0
+    device_info_cache_ttl: float = 86400
+    device_info_cache_file: typing.Optional[str] = None
+    persistent_connections: bool = False
+    reconnect_backoff_initial_delay: float = 1
+    reconnect_backoff_max_delay: float = 300
+    adapters: typing.Optional[typing.Tuple[AdapterSettings, ...]] = None
+    adapter_strategy: str = 'least_loaded'
+    adapter_stall_timeout: float = 60
+    adapter_failover_threshold: int = 3
+    adapter_stall_cooldown: float = 300
+
+
+@dataclasses.dataclass(frozen=True)
+class DeviceSettings:
+    mac_address: typing.Optional[str] = None
+    serial_number: typing.Optional[typing.Union[int, str]] = None
+    interval: typing.Optional[float] = None
+    phase: typing.Optional[float] = None
+    adapter: typing.Optional[str] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class AirthingsWavePlusSettings:
+    bluetooth: BluetoothSettings = BluetoothSettings()
+    serial_number: typing.Optional[typing.Union[int, str]] = None
+    devices: typing.Tuple[DeviceSettings, ...] = ()
+
+
+@dataclasses.dataclass(frozen=True)
+class SchedulerSettings:
+    delay: float = 300
+    adaptive: bool = False
+    refresh_period: float = 300
+    read_margin: float = 10
+    deduplicate: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class MessageBatchSettings:
+    enabled: bool = False
+    max_bytes: int = 262144
+    max_wait: float = 5
+
+
+@dataclasses.dataclass(frozen=True)
+class PublisherSettings:
+    enabled: bool = False
+    type: typing.Optional[str] = None
+    topic: str = "airthings"
+    rollup_topic: typing.Optional[str] = None
+    format: str = "json"
+    publish_timeout: float = 10
+    message_batch: MessageBatchSettings = MessageBatchSettings()
+    # Whole section including options of the sink type, sinks are created from it (see SINK_OPTIONS)
+    options: Mapping = dataclasses.field(default_factory=empty_mapping, metadata={'yaml': False})
+
+
+@dataclasses.dataclass(frozen=True)
+class SpoolSettings:
+    enabled: bool = False
+    file: str = "./spool.db"
+    max_entries: int = 100000
+    synchronous: str = 'NORMAL'
+    replay_batch_size: int = 100
+    replay_interval: float = 5
+
+
+@dataclasses.dataclass(frozen=True)
+class TimeSeriesStoreSettings:
+    enabled: bool = False
+    capacity: int = 2016
+    max_devices: int = 500
+    windows: typing.Tuple[int, ...] = DEFAULT_WINDOWS
+
+
+@dataclasses.dataclass(frozen=True)
+class HistorySettings:
+    enabled: bool = False
+    file: str = "./history.db"
+    batch_size: int = 500
+    flush_interval: float = 30
+    synchronous: str = 'NORMAL'
+    retention: typing.Optional[float] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class DeadbandSettings:
+    absolute: typing.Optional[float] = None
+    relative: typing.Optional[float] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class FilterSettings:
+    enabled: bool = False
+    heartbeat_interval: float = 3600
+    delta_only: bool = False
+    deadbands: typing.Mapping[str, DeadbandSettings] = dataclasses.field(default_factory=empty_mapping)
+
+
+@dataclasses.dataclass(frozen=True)
+class MetricsSettings:
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    port: int = 9188
+
+
+@dataclasses.dataclass(frozen=True)
+class TracingSettings:
+    enabled: bool = False
+    sample_rate: float = 1.0
+    exporter: str = "file"
+    file: str = "./traces.jsonl"
+    endpoint: str = "http://localhost:4318/v1/traces"
+    export_interval: float = 5
+
+
+@dataclasses.dataclass(frozen=True)
+class ProfilingSettings:
+    enabled: bool = False
+    engine: str = "cProfile"
+    every_n_cycles: int = 100
+    directory: str = "./profiles"
+
+
+@dataclasses.dataclass(frozen=True)
+class RollupWindowSettings:
+    size: float
+    hop: typing.Optional[float] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class AggregationSettings:
+    enabled: bool = False
+    windows: typing.Tuple[RollupWindowSettings, ...] = tuple(RollupWindowSettings(**window)
+                                                             for window in DEFAULT_ROLLUP_WINDOWS)
+    allowed_lateness: float = 60
+    message_format: str = "json"
+    publish_measurements: bool = True
+
+
+@dataclasses.dataclass(frozen=True)
+class GatewaySettings:
+    enabled: bool = False
+    # Default: number of adapters or 1
+    collectors: typing.Optional[int] = None
+    queue_size: int = 1000
+    put_timeout: float = 10
+    max_pending_publishes: int = 100
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfigReloadSettings:
+    enabled: bool = False
+    interval: float = 10
+
+
+@dataclasses.dataclass(frozen=True)
+class ConsoleLogSettings:
+    level: typing.Union[str, int] = "INFO"
+
+
+@dataclasses.dataclass(frozen=True)
+class FileLogSettings:
+    enabled: bool = False
+    level: typing.Union[str, int] = "DEBUG"
+
+
+@dataclasses.dataclass(frozen=True)
+class ErrFileLogSettings:
+    enabled: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class FileLoggersSettings:
+    log: FileLogSettings = FileLogSettings()
+    err: ErrFileLogSettings = ErrFileLogSettings()
+
+
+@dataclasses.dataclass(frozen=True)
+class LogSettings:
+    console: ConsoleLogSettings = ConsoleLogSettings()
+    file: FileLoggersSettings = FileLoggersSettings()
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    airthings_wave_plus: AirthingsWavePlusSettings = AirthingsWavePlusSettings()
+    scheduler: SchedulerSettings = SchedulerSettings()
+    # Sections are named freely, the sink type defaults to the name of the section
+    publishers: typing.Mapping[str, PublisherSettings] = dataclasses.field(default_factory=empty_mapping)
+    spool: SpoolSettings = SpoolSettings()
+    time_series_store: TimeSeriesStoreSettings = TimeSeriesStoreSettings()
+    history: HistorySettings = HistorySettings()
+    filter: FilterSettings = FilterSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    tracing: TracingSettings = TracingSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    aggregation: AggregationSettings = AggregationSettings()
+    gateway: GatewaySettings = GatewaySettings()
+    config_reload: ConfigReloadSettings = ConfigReloadSettings()
+    log: LogSettings = LogSettings()
+
+
+KAFKA_OPTIONS = {
+    'bootstrap_servers': str,
+    'security_protocol': str,
+    'sasl_mechanism': str,
+    'ssl_ca_cert_file': str,
+    'sasl_username': str,
+    'sasl_password': (str, int),
+    'linger_ms': int,
+    'batch_size': int,
+    'compression_type': str
+}
+
+MQTT_OPTIONS = {
+    'hostname': str,
+    'port': int,
+    'connection_type': str,
+    'username': str,
+    'password': (str, int),
+    'tls': dict,
+    'qos': int,
+    'retain_msg': bool,
+    'max_inflight_messages': int
+}
+
+# Options of each sink type in addition to the ones of PublisherSettings
+SINK_OPTIONS = {
+    'kafka': KAFKA_OPTIONS,
+    'aiokafka': KAFKA_OPTIONS,
+    'mqtt': MQTT_OPTIONS,
+    'asyncio_mqtt': MQTT_OPTIONS,
+    'http': {
+        'url': str,
+        'headers': dict,
+        'content_type': str,
+        'max_concurrent_requests': int
+    },
+    'file': {
+        'path': str,
+        'framing': str,
+        'fsync': bool
+    }
+}
+
+
+def is_valid_value(value, expected):
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    # bool is a subclass of int, but True is not a valid number
+    if isinstance(value, bool):
+        return bool in expected
+    return isinstance(value, expected)
+
+
+def get_expected_types(field_type):
+    # Types accepted for a plain (non-section) field, an integer is a valid float
+    if typing.get_origin(field_type) is typing.Union:
+        return tuple(expected for argument in typing.get_args(field_type)
+                     for expected in get_expected_types(argument))
+    return NUMBER if field_type is float else (field_type,)
+
+
+def build_value(value, field_type, path, errors):
+    origin = typing.get_origin(field_type)
+    arguments = [argument for argument in typing.get_args(field_type) if argument is not type(None)]
+    if origin is typing.Union and len(arguments) == 1:
+        # Optional field, empty values were replaced with the default already
+        return build_value(value, arguments[0], path, errors)
+    if dataclasses.is_dataclass(field_type):
+        return build_settings(field_type, value, path, errors)
+    if origin is tuple:
+        if not isinstance(value, list):
+            errors.append("{0} must be a list".format(path))
+            return None
+        return tuple(build_value(item, arguments[0], "{0}[{1}]".format(path, index), errors)
+                     for index, item in enumerate(value))
+    if origin is Mapping:
+        if not isinstance(value, dict):
+            errors.append("{0} must be a section".format(path))
+            return None
+        return MappingProxyType({key: build_value(item, arguments[1], "{0}.{1}".format(path, key), errors)
+                                 for key, item in value.items()})
+    if not is_valid_value(value, get_expected_types(field_type)):
+        errors.append("{0} has an invalid value: {1}".format(path, value))
+    return value
+
+
+def build_settings(settings_class, data, path, errors):
+    # Returns settings of the section, errors are collected in errors. Missing sections and empty values get defaults.
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        errors.append("{0} must be a section".format(path or "Configuration"))
+        return settings_class()
+    fields = {field.name: field for field in dataclasses.fields(settings_class) if field.metadata.get('yaml', True)}
+    for key in data:
+        if key not in fields:
+            errors.append("{0} is not a known option".format("{0}.{1}".format(path, key) if path else key))
+    values = {}
+    for name, field in fields.items():
+        field_path = "{0}.{1}".format(path, name) if path else name
+        if data.get(name) is not None:
+            values[name] = build_value(data[name], field.type, field_path, errors)
+        elif field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING:
+            errors.append("{0} is required".format(field_path))
+            values[name] = None
+    return settings_class(**values)
+
+
+def build_publisher(name, data, errors):
+    path = "publishers.{0}".format(name)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        errors.append("{0} must be a section".format(path))
+        return PublisherSettings()
+    sink_type = data.get('type') or name
+    if sink_type not in SINK_OPTIONS:
+        errors.append("{0} has an unsupported sink type: {1}. Use one of: {2}".format(path, sink_type,
+                                                                                       ", ".join(SINK_OPTIONS)))
+        sink_options = {}
+    else:
+        sink_options = SINK_OPTIONS[sink_type]
+    for key, expected in sink_options.items():
+        if data.get(key) is not None and not is_valid_value(data[key], expected):
+            errors.append("{0}.{1} has an invalid value: {2}".format(path, key, data[key]))
+    common_options = {key: value for key, value in data.items() if key not in sink_options}
+    publisher = build_settings(PublisherSettings, common_options, path, errors)
+    return dataclasses.replace(publisher, options=MappingProxyType(data))
+
+
+def build_config(data, errors):
+    publishers = data.get('publishers') if isinstance(data, dict) else None
+    settings = build_settings(Settings, dict(data, publishers=None) if publishers is not None else data, "", errors)
+    if publishers is not None:
+        if isinstance(publishers, dict):
+            settings = dataclasses.replace(settings, publishers=MappingProxyType(
+                {name: build_publisher(name, options, errors) for name, options in publishers.items()}))
+        else:
+            errors.append("publishers must be a section")
+    for index, device in enumerate(settings.airthings_wave_plus.devices or ()):
+        if device.mac_address is None and device.serial_number is None:
+            errors.append("airthings_wave_plus.devices[{0}] needs a mac_address or a serial_number".format(index))
+    return settings
+
 
 class Config:
+    # Loaded and validated once, a changed file is loaded into a new Config instead of updating this one
     def __init__(self, filename):
         self.filename = filename
-        self.__open_config_file()
+        self.settings = self.__load(self.__open_config_file())
 
     def __open_config_file(self):
         try:
             with open(self.filename, "r") as config_file:
-                self.data = yaml.load(config_file, Loader=yaml.FullLoader)
+                return yaml.load(config_file, Loader=yaml.FullLoader)
         except FileNotFoundError:
             raise Exception("File {} does not exist!!!".format(self.filename))
 
+    def __load(self, data):
+        errors = []
+        settings = build_config(data, errors)
+        if errors:
+            raise Exception("Invalid configuration in {0}: {1}".format(self.filename, "; ".join(errors)))
+        return settings
+
+    # Getters return settings with defaults applied. Devices, adapters, deadbands and rollup windows are returned as
+    # new dicts in the format taken by the components using them.
+
     def getSchedulerDelay(self):
-        return self.data.get('scheduler').get('delay')
+        return self.settings.scheduler.delay
+
+    def getSchedulerAdaptive(self):
+        return self.settings.scheduler.adaptive
+
+    def getSchedulerRefreshPeriod(self):
+        return self.settings.scheduler.refresh_period
+
+    def getSchedulerReadMargin(self):
+        return self.settings.scheduler.read_margin
+
+    def getSchedulerDeduplicate(self):
+        return self.settings.scheduler.deduplicate
 
     def getAirthingsWavePlusBluetoothMACAddress(self):
-        return self.data.get('airthings_wave_plus').get('bluetooth').get('mac_address')
+        return self.settings.airthings_wave_plus.bluetooth.mac_address
 
     def getAirthingsWavePlusSerialNumber(self):
-        return self.data.get('airthings_wave_plus').get('serial_number')
+        return self.settings.airthings_wave_plus.serial_number
+
+    def getAirthingsWavePlusDevices(self):
+        devices = self.settings.airthings_wave_plus.devices
+        if devices:
+            return [dataclasses.asdict(device) for device in devices]
+        return [dataclasses.asdict(DeviceSettings(mac_address=self.getAirthingsWavePlusBluetoothMACAddress(),
+                                                  serial_number=self.getAirthingsWavePlusSerialNumber()))]
+
+    def getAirthingsWavePlusMaxConcurrentConnections(self):
+        return self.settings.airthings_wave_plus.bluetooth.max_concurrent_connections
+
+    def getAirthingsWavePlusDiscoveryCacheTTL(self):
+        return self.settings.airthings_wave_plus.bluetooth.discovery_cache_ttl
+
+    def getAirthingsWavePlusPassiveMode(self):
+        return self.settings.airthings_wave_plus.bluetooth.passive_mode
+
+    def getAirthingsWavePlusMeasurementMaxAge(self):
+        return self.settings.airthings_wave_plus.bluetooth.measurement_max_age
+
+    def getAirthingsWavePlusDeviceInfoCacheTTL(self):
+        return self.settings.airthings_wave_plus.bluetooth.device_info_cache_ttl
+
+    def getAirthingsWavePlusDeviceInfoCacheFile(self):
+        return self.settings.airthings_wave_plus.bluetooth.device_info_cache_file
+
+    def getAirthingsWavePlusPersistentConnections(self):
+        return self.settings.airthings_wave_plus.bluetooth.persistent_connections
+
+    def getAirthingsWavePlusReconnectBackoffInitialDelay(self):
+        return self.settings.airthings_wave_plus.bluetooth.reconnect_backoff_initial_delay
+
+    def getAirthingsWavePlusReconnectBackoffMaxDelay(self):
+        return self.settings.airthings_wave_plus.bluetooth.reconnect_backoff_max_delay
+
+    def getAirthingsWavePlusAdapters(self):
+        adapters = self.settings.airthings_wave_plus.bluetooth.adapters
+        return [dataclasses.asdict(adapter) for adapter in adapters] if adapters is not None else None
+
+    def getAirthingsWavePlusAdapterStrategy(self):
+        return self.settings.airthings_wave_plus.bluetooth.adapter_strategy
+
+    def getAirthingsWavePlusAdapterStallTimeout(self):
+        return self.settings.airthings_wave_plus.bluetooth.adapter_stall_timeout
+
+    def getAirthingsWavePlusAdapterFailoverThreshold(self):
+        return self.settings.airthings_wave_plus.bluetooth.adapter_failover_threshold
+
+    def getAirthingsWavePlusAdapterStallCooldown(self):
+        return self.settings.airthings_wave_plus.bluetooth.adapter_stall_cooldown
+
+    def getPublishers(self):
+        return self.settings.publishers
+
+    def getSpoolEnabled(self):
+        return self.settings.spool.enabled
+
+    def getSpoolFile(self):
+        return self.settings.spool.file
+
+    def getSpoolMaxEntries(self):
+        return self.settings.spool.max_entries
+
+    def getSpoolSynchronous(self):
+        return self.settings.spool.synchronous
+
+    def getSpoolReplayBatchSize(self):
+        return self.settings.spool.replay_batch_size
+
+    def getSpoolReplayInterval(self):
+        return self.settings.spool.replay_interval
+
+    def getTimeSeriesStoreEnabled(self):
+        return self.settings.time_series_store.enabled
+
+    def getTimeSeriesStoreCapacity(self):
+        return self.settings.time_series_store.capacity
+
+    def getTimeSeriesStoreMaxDevices(self):
+        return self.settings.time_series_store.max_devices
+
+    def getTimeSeriesStoreWindows(self):
+        return self.settings.time_series_store.windows
+
+    def getHistoryEnabled(self):
+        return self.settings.history.enabled
+
+    def getHistoryFile(self):
+        return self.settings.history.file
+
+    def getHistoryBatchSize(self):
+        return self.settings.history.batch_size
+
+    def getHistoryFlushInterval(self):
+        return self.settings.history.flush_interval
+
+    def getHistorySynchronous(self):
+        return self.settings.history.synchronous
+
+    def getHistoryRetention(self):
+        return self.settings.history.retention
+
+    def getFilterEnabled(self):
+        return self.settings.filter.enabled
+
+    def getFilterHeartbeatInterval(self):
+        return self.settings.filter.heartbeat_interval
+
+    def getFilterDeltaOnly(self):
+        return self.settings.filter.delta_only
+
+    def getFilterDeadbands(self):
+        return {metric: dataclasses.asdict(deadband) for metric, deadband in self.settings.filter.deadbands.items()}
+
+    def getMetricsEnabled(self):
+        return self.settings.metrics.enabled
+
+    def getMetricsHost(self):
+        return self.settings.metrics.host
+
+    def getMetricsPort(self):
+        return self.settings.metrics.port
+
+    def getTracingEnabled(self):
+        return self.settings.tracing.enabled
+
+    def getTracingSampleRate(self):
+        return self.settings.tracing.sample_rate
+
+    def getTracingExporter(self):
+        return self.settings.tracing.exporter
+
+    def getTracingFile(self):
+        return self.settings.tracing.file
 
-    def getPublishToKafka(self):
-        return self.data.get('publishers').get('kafka').get('enabled')
+    def getTracingEndpoint(self):
+        return self.settings.tracing.endpoint
 
-    def getKafkaBootstrapServers(self):
-        return self.data.get('publishers').get('kafka').get('bootstrap_servers')
+    def getTracingExportInterval(self):
+        return self.settings.tracing.export_interval
 
-    def getKafkaTopic(self):
-        return self.data.get('publishers').get('kafka').get('topic')
+    def getProfilingEnabled(self):
+        return self.settings.profiling.enabled
 
-    def getKafkaSecurityProtocol(self):
-        return self.data.get('publishers').get('kafka').get('security_protocol')
+    def getProfilingEngine(self):
+        return self.settings.profiling.engine
 
-    def getKafkaSSLCAFile(self):
-        return self.data.get('publishers').get('kafka').get('ssl_ca_cert_file')
+    def getProfilingEveryNCycles(self):
+        return self.settings.profiling.every_n_cycles
 
-    def getKafkaSASLMechanism(self):
-        return self.data.get('publishers').get('kafka').get('sasl_mechanism')
+    def getProfilingDirectory(self):
+        return self.settings.profiling.directory
 
-    def getKafkaSASLUsername(self):
-        return self.data.get('publishers').get('kafka').get('sasl_username')
+    def getAggregationEnabled(self):
+        return self.settings.aggregation.enabled
 
-    def getKafkaSASLPassword(self):
-        return self.data.get('publishers').get('kafka').get('sasl_password')
+    def getAggregationWindows(self):
+        return [dataclasses.asdict(window) for window in self.settings.aggregation.windows]
 
-    def getPublishToMQTT(self):
-        return self.data.get('publishers').get('mqtt').get('enabled')
+    def getAggregationAllowedLateness(self):
+        return self.settings.aggregation.allowed_lateness
 
-    def getMQTTHostname(self):
-        return self.data.get('publishers').get('mqtt').get('hostname')
+    def getAggregationMessageFormat(self):
+        return self.settings.aggregation.message_format
 
-    def getMQTTPort(self):
-        return self.data.get('publishers').get('mqtt').get('port')
+    def getAggregationPublishMeasurements(self):
+        return self.settings.aggregation.publish_measurements
 
-    def getMQTTConnectionType(self):
-        return self.data.get('publishers').get('mqtt').get('connection_type')
+    def getGatewayEnabled(self):
+        return self.settings.gateway.enabled
 
-    def getMQTTUsername(self):
-        return self.data.get('publishers').get('mqtt').get('username')
+    def getGatewayCollectors(self):
+        return self.settings.gateway.collectors
 
-    def getMQTTPassword(self):
-        return self.data.get('publishers').get('mqtt').get('password')
+    def getGatewayQueueSize(self):
+        return self.settings.gateway.queue_size
 
-    def getMQTTConfigTLS(self):
-        return self.data.get('publishers').get('mqtt').get('tls')
+    def getGatewayPutTimeout(self):
+        return self.settings.gateway.put_timeout
 
-    def getMQTTPublishTopic(self):
-        return self.data.get('publishers').get('mqtt').get('topic')
+    def getGatewayMaxPendingPublishes(self):
+        return self.settings.gateway.max_pending_publishes
 
-    def getMQTTPublishQOS(self):
-        return self.data.get('publishers').get('mqtt').get('qos')
+    def getConfigReloadEnabled(self):
+        return self.settings.config_reload.enabled
 
-    def getMQTTPublishRetainMsg(self):
-        return self.data.get('publishers').get('mqtt').get('retain_msg')
+    def getConfigReloadInterval(self):
+        return self.settings.config_reload.interval
 
     def get_log_console_level(self):
-        return self.data.get('log').get('console').get('level')
+        return self.settings.log.console.level
 
     def get_log_file_log_enabled(self):
-        return self.data.get('log').get('file').get('log').get('enabled')
+        return self.settings.log.file.log.enabled
 
     def get_log_file_log_level(self):
-        return self.data.get('log').get('file').get('log').get('level')
+        return self.settings.log.file.log.level
 
     def get_log_file_err_enabled(self):
-        return self.data.get('log').get('file').get('err').get('enabled')
+        return self.settings.log.file.err.enabled
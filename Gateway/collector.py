@@ -0,0 +1,127 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import contextlib
+import functools
+import logging
+import signal
+
+from AirthingsWavePlus.fleet_poller import FleetPoller
+from Gateway.measurement_queue import MeasurementQueueWriter, ITEM_METRICS, ITEM_SPANS
+from Metrics.metrics_registry import REGISTRY
+from Scheduler.deadline_scheduler import DeadlineScheduler
+from Tracing.tracer import FinishedSpan, Tracer, get_tracer, set_tracer, start_span
+
+
+class SpanForwarder:
+    # Span exporter of collector processes, spans are exported by the publisher process
+    def __init__(self, measurement_writer):
+        self.measurement_writer = measurement_writer
+
+    def export(self, spans):
+        self.measurement_writer.put_telemetry(ITEM_SPANS, [FinishedSpan(span) for span in spans])
+
+    def close(self):
+        pass
+
+
+class Collector:
+    # Reads the devices of one collector process and hands measurements over to the measurement writer
+    def __init__(self, name, fleet_poller, measurement_writer, devices, interval, adaptive=False,
+                 forward_metrics=False, forward_spans=False, telemetry_interval=5):
+        self.class_name = "Collector"
+        self.name = name
+        self.fleet_poller = fleet_poller
+        self.measurement_writer = measurement_writer
+        self.devices = devices
+        self.interval = interval
+        self.adaptive = adaptive
+        # Metrics and spans recorded in this process are sent to the publisher process over the gateway queue
+        self.forward_metrics = forward_metrics
+        self.forward_spans = forward_spans
+        self.telemetry_interval = telemetry_interval
+        self.scheduler = DeadlineScheduler()
+
+    async def __read_device(self, index, job_name):
+        try:
+            with start_span("poll_device", {"device": self.fleet_poller.readers[index].get_device_identifier()}):
+                sensor_measurement = await self.fleet_poller.poll_device(index)
+                if sensor_measurement is not None:
+                    await self.measurement_writer.put(sensor_measurement)
+        finally:
+            if self.adaptive:
+                self.scheduler.reschedule(job_name, self.fleet_poller.get_next_poll_delay(index))
+
+    async def __log_metrics(self):
+        log = logging.getLogger(self.class_name + ".__log_metrics")
+        for name, metrics in self.scheduler.get_metrics().items():
+            log.info("Collector {0} job {1}: {2}".format(self.name, name, metrics))
+        for adapter, health in self.fleet_poller.get_adapter_health().items():
+            log.info("Collector {0} adapter {1}: {2}".format(self.name, adapter, health))
+
+    async def __forward_telemetry(self):
+        if self.forward_spans:
+            get_tracer().flush()
+        if self.forward_metrics:
+            self.measurement_writer.put_telemetry(ITEM_METRICS, REGISTRY.snapshot())
+
+    def __create_jobs(self):
+        for index, device in enumerate(self.devices):
+            job_name = "device-{0}".format(self.fleet_poller.readers[index].get_device_identifier())
+            # Phases are assigned by the gateway, so polls are spread across the whole fleet
+            self.scheduler.add_job(job_name,
+                                   device.get('interval') or self.interval,
+                                   functools.partial(self.__read_device, index, job_name),
+                                   phase=device.get('phase') or 0.0)
+        self.scheduler.add_job("collector-metrics", self.interval, self.__log_metrics, phase=self.interval)
+        if self.forward_metrics or self.forward_spans:
+            self.scheduler.add_job("collector-telemetry", self.telemetry_interval, self.__forward_telemetry,
+                                   phase=self.telemetry_interval)
+
+    async def run(self):
+        log = logging.getLogger(self.class_name + ".run")
+        task = asyncio.current_task()
+        with contextlib.suppress(NotImplementedError):
+            # Gateway stops collectors with SIGTERM, devices are disconnected before the process exits
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        log.info("Collector {0} started with {1} device(s)".format(self.name, len(self.devices)))
+        self.__create_jobs()
+        await self.fleet_poller.start()
+        try:
+            await self.scheduler.run()
+        except asyncio.CancelledError:
+            log.info("Collector {0} stopping...".format(self.name))
+        finally:
+            await self.scheduler.stop()
+            await self.fleet_poller.stop()
+            await self.__forward_telemetry()
+
+
+def run_collector(name, devices, interval, measurement_queue, adaptive=False, poller_options=None, put_timeout=10,
+                  log_level=logging.INFO, log_format=None, forward_metrics=False, tracing_sample_rate=None,
+                  telemetry_interval=5):
+    # Entry point of a collector process, tracing_sample_rate None disables tracing
+    logging.basicConfig(level=log_level, format=log_format)
+    # Ctrl+C reaches the whole process group, shutdown of collectors is left to the gateway
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    fleet_poller = FleetPoller(devices, **(poller_options or {}))
+    measurement_writer = MeasurementQueueWriter(name, measurement_queue, put_timeout)
+    if tracing_sample_rate is not None:
+        set_tracer(Tracer(SpanForwarder(measurement_writer), sample_rate=tracing_sample_rate))
+    asyncio.run(Collector(name, fleet_poller, measurement_writer, devices, interval, adaptive, forward_metrics,
+                          tracing_sample_rate is not None, telemetry_interval).run())
@@ -0,0 +1,142 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import multiprocessing
+
+from Gateway.collector import run_collector
+from Gateway.measurement_queue import MeasurementQueueReader
+from Metrics.metrics_registry import REGISTRY
+
+COLLECTOR_RESTARTS = REGISTRY.counter("gateway_collector_restarts_total", "Collector processes restarted after exiting",
+                                      ("collector",))
+
+
+def assign_devices(devices, interval, collector_count=None, adapters=None):
+    # Returns the devices and adapters of each collector, collectors without devices are left out
+    collector_count = collector_count or (len(adapters) if adapters else 1)
+    if adapters and collector_count > len(adapters):
+        raise Exception("Gateway with {0} collectors needs at least as many Bluetooth adapters, {1} configured".format(
+            collector_count, len(adapters)))
+    collector_adapters = [adapters[index::collector_count] if adapters else None for index in range(collector_count)]
+    collector_devices = [[] for _ in range(collector_count)]
+    next_collector = 0
+    for index, device in enumerate(devices):
+        device = dict(device)
+        device_interval = device.get('interval') or interval
+        # Phases are spread across the whole fleet before devices are split between collectors
+        if device.get('phase') is None:
+            device['phase'] = index * device_interval / len(devices)
+        owners = [collector for collector in range(collector_count) if collector_adapters[collector] and
+                  device.get('adapter') in [adapter.get('name') for adapter in collector_adapters[collector]]]
+        if owners:
+            collector_devices[owners[0]].append(device)
+        else:
+            collector_devices[next_collector].append(device)
+            next_collector = (next_collector + 1) % collector_count
+    return [(collector_devices[index], collector_adapters[index]) for index in range(collector_count)
+            if collector_devices[index]]
+
+
+class Gateway:
+    def __init__(self, collectors, queue_size=1000, max_pending_publishes=100, close_timeout=30,
+                 collector_target=run_collector):
+        # Each collector is a dict of keyword arguments of collector_target, 'name' is required
+        self.class_name = "Gateway"
+        self.collectors = collectors
+        self.max_pending_publishes = max_pending_publishes
+        self.close_timeout = close_timeout
+        self.collector_target = collector_target
+        # Spawned processes do not inherit the event loop and D-Bus connections of this process
+        self.context = multiprocessing.get_context("spawn")
+        self.queue = self.context.Queue(queue_size)
+        self.processes = {}
+        self.restarts = {collector['name']: 0 for collector in collectors}
+        self.reader = None
+
+    def __start_collector(self, collector):
+        log = logging.getLogger(self.class_name + ".__start_collector")
+        process = self.context.Process(target=self.collector_target,
+                                       kwargs=dict(collector, measurement_queue=self.queue),
+                                       name="collector-{0}".format(collector['name']),
+                                       daemon=True)
+        process.start()
+        self.processes[collector['name']] = process
+        log.info("Started collector {0} (pid: {1})".format(collector['name'], process.pid))
+
+    async def start(self, measurement_pipeline):
+        self.reader = MeasurementQueueReader(self.queue, measurement_pipeline, self.max_pending_publishes)
+        await self.reader.start()
+        for collector in self.collectors:
+            self.__start_collector(collector)
+
+    async def supervise(self):
+        log = logging.getLogger(self.class_name + ".supervise")
+        for collector in self.collectors:
+            process = self.processes.get(collector['name'])
+            if process is not None and not process.is_alive():
+                log.error("Collector {0} exited with code {1}, restarting...".format(collector['name'],
+                                                                                   process.exitcode))
+                self.restarts[collector['name']] += 1
+                COLLECTOR_RESTARTS.inc(collector['name'])
+                self.__start_collector(collector)
+
+    async def __stop_collector(self, name, process):
+        log = logging.getLogger(self.class_name + ".__stop_collector")
+        process.terminate()
+        await asyncio.get_running_loop().run_in_executor(None, process.join, self.close_timeout)
+        if process.is_alive():
+            log.warning("Collector {0} did not stop within {1}s, killing it".format(name, self.close_timeout))
+            process.kill()
+            await asyncio.get_running_loop().run_in_executor(None, process.join)
+
+    async def update_collectors(self, collectors):
+        # Only collectors with a changed configuration are restarted, the others keep their BLE connections
+        log = logging.getLogger(self.class_name + ".update_collectors")
+        current_collectors = {collector['name']: collector for collector in self.collectors}
+        names = [collector['name'] for collector in collectors]
+        stopping = [(name, self.processes.pop(name)) for name, collector in current_collectors.items()
+                    if name not in names or collector != collectors[names.index(name)]]
+        await asyncio.gather(*[self.__stop_collector(name, process) for name, process in stopping])
+        for name in current_collectors:
+            if name not in names:
+                REGISTRY.remove_remote(name)
+        self.collectors = collectors
+        for collector in collectors:
+            self.restarts.setdefault(collector['name'], 0)
+            if collector['name'] not in self.processes:
+                self.__start_collector(collector)
+        log.info("Restarted {0} of {1} collector(s) with changed configuration".format(len(stopping),
+                                                                                      len(collectors)))
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        log.info("Stopping {0} collector(s)...".format(len(self.processes)))
+        await asyncio.gather(*[self.__stop_collector(name, process) for name, process in self.processes.items()])
+        self.processes = {}
+        if self.reader is not None:
+            await self.reader.close()
+            self.reader = None
+
+    def get_metrics(self):
+        collectors = {name: {"pid": process.pid, "alive": process.is_alive(), "restarts": self.restarts[name]}
+                      for name, process in self.processes.items()}
+        metrics = {"collectors": collectors}
+        if self.reader is not None:
+            metrics.update(self.reader.get_metrics())
+        return metrics
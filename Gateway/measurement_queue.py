@@ -0,0 +1,156 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from Metrics.metrics_registry import REGISTRY
+from Tracing.tracer import get_tracer
+
+GATEWAY_MEASUREMENTS = REGISTRY.counter("gateway_measurements_total",
+                                        "Measurements handed over by collector processes by result",
+                                        ("collector", "result"))
+GATEWAY_QUEUE_DEPTH = REGISTRY.gauge("gateway_queue_depth", "Measurements waiting in the gateway queue")
+
+# Kinds of queue items: measurements, and metric snapshots and finished spans of collector processes
+ITEM_MEASUREMENT = "measurement"
+ITEM_METRICS = "metrics"
+ITEM_SPANS = "spans"
+
+
+class MeasurementQueueWriter:
+    # Collector side of the gateway queue. Items are (kind, collector name, payload, measurements dropped before it)
+    def __init__(self, collector_name, measurement_queue, put_timeout=10):
+        self.class_name = "MeasurementQueueWriter"
+        self.collector_name = collector_name
+        self.queue = measurement_queue
+        self.put_timeout = put_timeout
+        self.dropped = 0
+
+    async def put(self, sensor_measurement):
+        log = logging.getLogger(self.class_name + ".put")
+        dropped, self.dropped = self.dropped, 0
+        item = (ITEM_MEASUREMENT, self.collector_name, sensor_measurement, dropped)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        # Publisher process is behind: hold back the read job of this device until there is room in the queue
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.queue.put, item, True, self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += dropped + 1
+            log.warning("Gateway queue is full for {0}s, dropping measurement of device {1}".format(
+                self.put_timeout, sensor_measurement.device_serial_number))
+            return False
+
+    def put_telemetry(self, kind, payload):
+        # Telemetry never holds back reads, it is dropped while the queue is full
+        log = logging.getLogger(self.class_name + ".put_telemetry")
+        try:
+            self.queue.put_nowait((kind, self.collector_name, payload, 0))
+            return True
+        except queue.Full:
+            log.debug("Gateway queue is full, dropping {0} of collector {1}".format(kind, self.collector_name))
+            return False
+
+
+class MeasurementQueueReader:
+    # Publisher side of the gateway queue, feeds measurements of all collectors into one measurement pipeline
+    def __init__(self, measurement_queue, measurement_pipeline, max_pending_publishes=100, poll_timeout=1,
+                 registry=REGISTRY):
+        self.class_name = "MeasurementQueueReader"
+        self.queue = measurement_queue
+        self.registry = registry
+        self.measurement_pipeline = measurement_pipeline
+        self.max_pending_publishes = max_pending_publishes
+        self.poll_timeout = poll_timeout
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MeasurementQueueReader")
+        self.task = None
+        self.closing = False
+        self.received = 0
+        self.dropped = 0
+
+    def __update_queue_depth(self):
+        try:
+            GATEWAY_QUEUE_DEPTH.set(self.queue.qsize())
+        except NotImplementedError:
+            # qsize() is not available on macOS
+            pass
+
+    async def __wait_for_pending_publishes(self):
+        pending_tasks = self.measurement_pipeline.publisher_fanout.pending_tasks
+        while len(pending_tasks) >= self.max_pending_publishes:
+            # Measurements stay in the queue, so a slow broker eventually blocks the collectors
+            await asyncio.wait(list(pending_tasks), return_when=asyncio.FIRST_COMPLETED)
+
+    async def __consume(self):
+        log = logging.getLogger(self.class_name + ".__consume")
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.__wait_for_pending_publishes()
+            try:
+                kind, collector_name, payload, dropped = await loop.run_in_executor(
+                    self.executor, self.queue.get, True, self.poll_timeout)
+            except queue.Empty:
+                if self.closing:
+                    return
+                continue
+
+            self.__update_queue_depth()
+            if kind == ITEM_METRICS:
+                # Metrics of collectors are served together with the metrics of this process
+                self.registry.update_remote(collector_name, payload)
+                continue
+            if kind == ITEM_SPANS:
+                tracer = get_tracer()
+                for span in payload:
+                    tracer.on_end(span)
+                continue
+
+            sensor_measurement = payload
+            self.received += 1
+            GATEWAY_MEASUREMENTS.inc(collector_name, "received")
+            if dropped:
+                self.dropped += dropped
+                GATEWAY_MEASUREMENTS.inc(collector_name, "dropped", amount=dropped)
+                log.warning("Collector {0} dropped {1} measurement(s) while the gateway queue was full".format(
+                    collector_name, dropped))
+            try:
+                await self.measurement_pipeline.process(sensor_measurement)
+            except Exception as e:
+                log.error("Error during processing of measurement from collector {0}: {1}".format(
+                    collector_name, str(e)))
+
+    async def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.__consume())
+
+    async def close(self):
+        # Measurements already in the queue are processed before the reader stops
+        self.closing = True
+        if self.task is not None:
+            await self.task
+            self.task = None
+        self.executor.shutdown(wait=True)
+
+    def get_metrics(self):
+        return {"received": self.received, "dropped": self.dropped}
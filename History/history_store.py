@@ -0,0 +1,197 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Pipeline.measurement_spool import SYNCHRONOUS_MODES
+
+COLUMNS = ('temperature', 'humidity', 'pressure', 'radon_short_term_avg', 'radon_long_term_avg', 'co2_level',
+           'voc_level', 'device_battery_level')
+
+
+class HistoryStore:
+    def __init__(self, filename, batch_size=500, flush_interval=30, synchronous='NORMAL', retention=None,
+                 max_pending_rows=100000):
+        self.class_name = "HistoryStore"
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Measurements older than retention seconds are deleted periodically, None keeps all of them
+        self.retention = retention
+        # Rows of failed writes are kept for the next flush up to this limit, the oldest ones are dropped first
+        self.max_pending_rows = max_pending_rows
+        self.synchronous = str(synchronous).upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise Exception("Unknown history synchronous mode: {0}. Use one of: {1}".format(
+                synchronous, ", ".join(SYNCHRONOUS_MODES)))
+        # All database access happens on a single worker thread to keep disk I/O off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="HistoryStore")
+        self.connection = None
+        self.pending_rows = []
+        self.flush_task = None
+        self.written_count = 0
+
+    def __open(self):
+        log = logging.getLogger(self.class_name + ".__open")
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous={0}".format(self.synchronous))
+        # Table is clustered by (serial_number, timestamp), so range queries are a single index range scan
+        self.connection.execute("CREATE TABLE IF NOT EXISTS measurements ("
+                                "serial_number INTEGER NOT NULL, "
+                                "timestamp REAL NOT NULL, " +
+                                ", ".join("{0} REAL".format(column) for column in COLUMNS) +
+                                ", PRIMARY KEY (serial_number, timestamp)) WITHOUT ROWID")
+        self.connection.commit()
+        log.info("History store {0} opened".format(self.filename))
+
+    def __write(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO measurements (serial_number, timestamp, {0}) VALUES ({1})".format(
+                    ", ".join(COLUMNS), ", ".join("?" * (len(COLUMNS) + 2))),
+                rows)
+        self.written_count += len(rows)
+
+    def __delete_older_than(self, cutoff):
+        # Serial numbers are found by skipping through the primary key, so each device is pruned by an index range
+        # instead of a scan of the whole table
+        # The sqlite3 module does not report the row count of statements starting with WITH
+        total_changes = self.connection.total_changes
+        with self.connection:
+            self.connection.execute(
+                "WITH RECURSIVE devices(serial_number) AS ("
+                "SELECT MIN(serial_number) FROM measurements UNION ALL "
+                "SELECT (SELECT MIN(serial_number) FROM measurements WHERE serial_number > devices.serial_number) "
+                "FROM devices WHERE serial_number IS NOT NULL) "
+                "DELETE FROM measurements WHERE serial_number IN "
+                "(SELECT serial_number FROM devices WHERE serial_number IS NOT NULL) AND timestamp < ?",
+                (cutoff,))
+        return self.connection.total_changes - total_changes
+
+    def __query_range(self, serial_number, start, end):
+        return self.connection.execute(
+            "SELECT timestamp, {0} FROM measurements "
+            "WHERE serial_number = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp".format(
+                ", ".join(COLUMNS)),
+            (serial_number, start, end)).fetchall()
+
+    def __query_downsampled(self, serial_number, start, end, bucket_size, column):
+        return self.connection.execute(
+            "SELECT CAST(timestamp / ? AS INTEGER) * ? AS bucket, COUNT({0}), MIN({0}), MAX({0}), AVG({0}) "
+            "FROM measurements WHERE serial_number = ? AND timestamp >= ? AND timestamp < ? "
+            "GROUP BY bucket ORDER BY bucket".format(column),
+            (bucket_size, bucket_size, serial_number, start, end)).fetchall()
+
+    async def __run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    @staticmethod
+    def __to_row(sensor_measurements):
+        # Measurements are keyed by serial number, None for measurements without a numeric one
+        try:
+            serial_number = int(sensor_measurements.device_serial_number)
+        except (TypeError, ValueError):
+            return None
+        row = [serial_number, sensor_measurements.timestamp.timestamp()]
+        for column in COLUMNS:
+            value = getattr(sensor_measurements, column)
+            # Radon is "N/A" while the first measurements are not available yet
+            row.append(None if value == "N/A" else value)
+        return row
+
+    async def __flush_periodically(self):
+        log = logging.getLogger(self.class_name + ".__flush_periodically")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self.retention is not None:
+                    await self.delete_expired()
+            except Exception as e:
+                log.error("Error during writing to history store: {0}".format(str(e)))
+
+    async def start(self):
+        await self.__run(self.__open)
+        self.flush_task = asyncio.get_running_loop().create_task(self.__flush_periodically())
+
+    async def add(self, sensor_measurements):
+        log = logging.getLogger(self.class_name + ".add")
+        row = self.__to_row(sensor_measurements)
+        if row is None:
+            log.warning("Measurement of device {0} without serial number is not stored".format(
+                sensor_measurements.device_bluetooth_mac_address))
+            return
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        log = logging.getLogger(self.class_name + ".flush")
+        if not self.pending_rows:
+            return
+        rows = self.pending_rows
+        self.pending_rows = []
+        try:
+            await self.__run(self.__write, rows)
+        except Exception:
+            # Rows are written with the next flush, ahead of the ones added in the meantime
+            self.pending_rows = rows + self.pending_rows
+            if len(self.pending_rows) > self.max_pending_rows:
+                log.warning("Dropping {0} unwritten measurement(s) from history store".format(
+                    len(self.pending_rows) - self.max_pending_rows))
+                self.pending_rows = self.pending_rows[-self.max_pending_rows:]
+            raise
+        log.debug("Written {0} measurement(s) to history store".format(len(rows)))
+
+    async def delete_expired(self, now=None):
+        log = logging.getLogger(self.class_name + ".delete_expired")
+        cutoff = (now if now is not None else time.time()) - self.retention
+        deleted_count = await self.__run(self.__delete_older_than, cutoff)
+        if deleted_count:
+            log.debug("Deleted {0} expired measurement(s) from history store".format(deleted_count))
+        return deleted_count
+
+    async def query_range(self, serial_number, start, end):
+        rows = await self.__run(self.__query_range, serial_number, start, end)
+        return [dict(zip(('timestamp',) + COLUMNS, row)) for row in rows]
+
+    async def query_downsampled(self, serial_number, start, end, bucket_size, column):
+        if column not in COLUMNS:
+            raise Exception("Unknown column: {0}. Use one of: {1}".format(column, ", ".join(COLUMNS)))
+        rows = await self.__run(self.__query_downsampled, serial_number, start, end, bucket_size, column)
+        return [dict(zip(('timestamp', 'count', 'min', 'max', 'mean'), row)) for row in rows]
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+            self.flush_task = None
+        if self.connection is not None:
+            await self.flush()
+            await self.__run(self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=True)
+        log.info("History store closed [{0} measurement(s) written]".format(self.written_count))
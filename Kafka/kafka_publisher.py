@@ -19,6 +19,8 @@ import logging
 
 from kafka3 import KafkaProducer
 
+from Tracing.tracer import start_span
+
 
 class KafkaPublisher:
     def __init__(self,
@@ -27,7 +29,10 @@ class KafkaPublisher:
                  sasl_mechanism,
                  ssl_ca_cert_file=None,
                  sasl_username=None,
-                 sasl_password=None):
+                 sasl_password=None,
+                 linger_ms=0,
+                 batch_size=16384,
+                 compression_type=None):
         self.class_name = "KafkaPublisher"
         self.bootstrap_servers = bootstrap_servers
         self.security_protocol = security_protocol
@@ -36,6 +41,12 @@ class KafkaPublisher:
         self.sasl_mechanism = sasl_mechanism
         self.sasl_username = sasl_username
         self.sasl_password = sasl_password
+        self.linger_ms = linger_ms
+        self.batch_size = batch_size
+        self.compression_type = compression_type
+        self.producer = None
+        self.delivered_count = 0
+        self.failed_count = 0
 
     def __open_kafka_producer_connection(self):
         return KafkaProducer(bootstrap_servers=self.bootstrap_servers,
@@ -46,15 +57,48 @@ class KafkaPublisher:
                              ssl_cafile=self.ssl_ca_cert_file,
                              sasl_mechanism=self.sasl_mechanism,
                              sasl_plain_username=self.sasl_username,
-                             sasl_plain_password=self.sasl_password)
+                             sasl_plain_password=self.sasl_password,
+                             linger_ms=self.linger_ms,
+                             batch_size=self.batch_size,
+                             compression_type=self.compression_type)
+
+    def __get_producer(self):
+        log = logging.getLogger(self.class_name + ".__get_producer")
+        if self.producer is None:
+            self.producer = self.__open_kafka_producer_connection()
+            log.info('Kafka Producer has been initiated...')
+        return self.producer
+
+    def __on_send_success(self, record_metadata):
+        log = logging.getLogger(self.class_name + ".__on_send_success")
+        self.delivered_count += 1
+        log.info("Message successfully published to Kafka topic: {0} (partition: {1}, offset: {2})".format(
+            record_metadata.topic, record_metadata.partition, record_metadata.offset))
+
+    def __on_send_error(self, exception):
+        log = logging.getLogger(self.class_name + ".__on_send_error")
+        self.failed_count += 1
+        log.error("Error during publishing to Kafka: {0}".format(str(exception)))
 
     def publish(self, topic, json_payload):
         log = logging.getLogger(self.class_name + ".publish")
+        with start_span("kafka.send", {"topic": topic}):
+            future = self.__get_producer().send(topic, json_payload)
+        future.add_callback(self.__on_send_success)
+        future.add_errback(self.__on_send_error)
+        log.debug("Message queued for Kafka topic: {0}".format(topic))
+        return future
 
-        producer = self.__open_kafka_producer_connection()
-        log.info('Kafka Producer has been initiated...')
+    def flush(self, timeout=None):
+        if self.producer is not None:
+            self.producer.flush(timeout=timeout)
 
-        producer.send(topic, json_payload)
-        producer.flush()
-        producer.close()
-        log.info("Message successfully published to Kafka topic: {0}".format(topic))
+    def close(self, timeout=None):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.producer is None:
+            return
+        self.producer.flush(timeout=timeout)
+        self.producer.close(timeout=timeout)
+        self.producer = None
+        log.info("Kafka Producer has been closed [delivered: {0}, failed: {1}].".format(
+            self.delivered_count, self.failed_count))
@@ -15,10 +15,14 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
 import logging
+import threading
 
 import paho.mqtt.client as mqtt
 
+from Tracing.tracer import start_span
+
 
 class MqttPublisher:
     def __init__(self,
@@ -28,7 +32,11 @@ class MqttPublisher:
                  connection_type='MQTT',
                  username=None,
                  password=None,
-                 tls_config=None):
+                 tls_config=None,
+                 max_inflight_messages=20,
+                 reconnect_min_delay=1,
+                 reconnect_max_delay=120,
+                 connect_timeout=10):
         self.class_name = "MqttPublisher"
         self.broker_hostname = broker_hostname
         self.port = port
@@ -37,11 +45,25 @@ class MqttPublisher:
         self.username = username
         self.password = password
         self.tls_config = tls_config
+        self.max_inflight_messages = max_inflight_messages
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.connect_timeout = connect_timeout
         self.client = None
+        # Set by the network loop thread while the client is connected to the broker
+        self.connected = threading.Event()
+        # Never held while calling into paho, the network loop thread holds paho locks when it calls on_publish
+        self.pending_lock = threading.Lock()
+        self.pending_publishes = {}
+        # Messages acknowledged before their future was registered, and messages nobody waits for anymore
+        self.acknowledged_mids = set()
+        self.abandoned_mids = set()
 
     def __connect(self):
         self.client = mqtt.Client()
         self.client.on_connect = self.__on_connect
+        self.client.on_disconnect = self.__on_disconnect
+        self.client.on_publish = self.__on_publish
         self.client.on_log = self.__on_log
         if self.connection_type == 'TLS' and self.tls_config is not None:
             self.client.tls_set(ca_certs=self.tls_config.get('ca_certs'),
@@ -54,30 +76,114 @@ class MqttPublisher:
         if self.username is not None and self.password is not None:
             self.client.username_pw_set(username=self.username,
                                         password=self.password)
-        self.client.connect(host=self.broker_hostname,
-                            port=self.port,
-                            keepalive=self.keepalive)
+        self.client.max_inflight_messages_set(self.max_inflight_messages)
+        self.client.reconnect_delay_set(min_delay=self.reconnect_min_delay, max_delay=self.reconnect_max_delay)
+        # Network loop runs in a background thread and takes care of reconnecting to the broker
+        self.client.connect_async(host=self.broker_hostname,
+                                  port=self.port,
+                                  keepalive=self.keepalive)
+        self.client.loop_start()
 
     def __disconnect(self):
         self.client.disconnect()
+        self.client.loop_stop()
+        self.client = None
+        self.connected.clear()
 
     def __on_connect(self, client, userdata, flags, rc):
-        print(f"Connected with result code {rc}")
+        log = logging.getLogger(self.class_name + ".__on_connect")
+        log.info("Connected to MQTT Broker {0} with result code {1}".format(self.broker_hostname, rc))
+        if rc == mqtt.CONNACK_ACCEPTED:
+            self.connected.set()
+
+    def __on_disconnect(self, client, userdata, rc):
+        log = logging.getLogger(self.class_name + ".__on_disconnect")
+        self.connected.clear()
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            log.warning("Unexpectedly disconnected from MQTT Broker {0} with result code {1}, reconnecting...".format(
+                self.broker_hostname, rc))
+
+    def __on_publish(self, client, userdata, mid):
+        # Called from the network loop thread once the message has been sent (QoS 0) or acknowledged (QoS 1/2)
+        with self.pending_lock:
+            pending_publish = self.pending_publishes.pop(mid, None)
+            if pending_publish is None:
+                if mid in self.abandoned_mids:
+                    self.abandoned_mids.discard(mid)
+                else:
+                    self.acknowledged_mids.add(mid)
+        if pending_publish is not None:
+            loop, future = pending_publish
+            loop.call_soon_threadsafe(self.__resolve_future, future)
+
+    @staticmethod
+    def __resolve_future(future):
+        if not future.done():
+            future.set_result(True)
 
     def __on_log(self, client, userdata, level, buf):
-        print("log: ", buf)
+        log = logging.getLogger(self.class_name + ".__on_log")
+        log.debug(buf)
+
+    def __ensure_client(self):
+        log = logging.getLogger(self.class_name + ".__ensure_client")
+        if self.client is None:
+            log.info("Connecting to MQTT Broker {0}".format(self.broker_hostname))
+            self.__connect()
 
     def publish(self, topic, json_payload, qos, retain_msg):
         log = logging.getLogger(self.class_name + ".publish")
-        log.info("Connecting to MQTT Broker {0}".format(self.broker_hostname))
-        self.__connect()
-        log.info("Connection successful")
+        self.__ensure_client()
         log.info("Publishing to topic {0}".format(topic))
-        self.client.publish(topic=topic,
-                            payload=json_payload,
-                            qos=qos,
-                            retain=retain_msg)
+        return self.client.publish(topic=topic,
+                                   payload=json_payload,
+                                   qos=qos,
+                                   retain=retain_msg)
+
+    async def __wait_until_connected(self):
+        loop = asyncio.get_running_loop()
+        self.__ensure_client()
+        # paho rejects QoS 0 messages while the connection is (re)established, so publishing waits for it
+        if not self.connected.is_set() and \
+                not await loop.run_in_executor(None, self.connected.wait, self.connect_timeout):
+            raise Exception("Not connected to MQTT Broker {0} within {1}s".format(self.broker_hostname,
+                                                                                   self.connect_timeout))
+
+    async def publish_and_wait(self, topic, json_payload, qos, retain_msg, timeout=None):
+        log = logging.getLogger(self.class_name + ".publish_and_wait")
+        loop = asyncio.get_running_loop()
+        await self.__wait_until_connected()
+        future = loop.create_future()
+        with start_span("mqtt.publish", {"topic": topic, "qos": qos}):
+            message_info = self.publish(topic, json_payload, qos, retain_msg)
+            # QoS 1/2 messages published while disconnected are queued and sent after reconnecting
+            failed = message_info.rc != mqtt.MQTT_ERR_SUCCESS and \
+                not (message_info.rc == mqtt.MQTT_ERR_NO_CONN and qos)
+            with self.pending_lock:
+                # Message id is in use again, an earlier message with the same id is not acknowledged anymore
+                self.abandoned_mids.discard(message_info.mid)
+                if failed:
+                    self.acknowledged_mids.discard(message_info.mid)
+                elif message_info.mid in self.acknowledged_mids:
+                    # Acknowledgement arrived before the future was registered
+                    self.acknowledged_mids.discard(message_info.mid)
+                    future.set_result(True)
+                else:
+                    self.pending_publishes[message_info.mid] = (loop, future)
+            if failed:
+                raise Exception("Publishing failed: {0}".format(mqtt.error_string(message_info.rc)))
+            try:
+                await asyncio.wait_for(future, timeout)
+            finally:
+                with self.pending_lock:
+                    if self.pending_publishes.pop(message_info.mid, None) is not None:
+                        # A late acknowledgement must not resolve a later message reusing the id
+                        self.abandoned_mids.add(message_info.mid)
         log.info("Message successfully published")
+
+    def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.client is None:
+            return
         self.__disconnect()
         log.info("Client disconnected")
-
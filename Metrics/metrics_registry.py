@@ -0,0 +1,275 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds, from serialization (microseconds) up to BLE scans and connections (seconds)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(label_names, label_values, extra_labels=()):
+    pairs = list(zip(label_names, label_values)) + list(extra_labels)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                                             .replace('\n', '\\n'))
+                          for name, value in pairs) + "}"
+
+
+class Timer:
+    __slots__ = ('histogram', 'label_values', 'start')
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+        # Blocking publishers report from executor threads
+        self.lock = threading.Lock()
+
+    def _check_labels(self, label_values):
+        if len(label_values) != len(self.label_names):
+            raise Exception("Metric {0} expects labels {1}, got {2}".format(
+                self.name, self.label_names, label_values))
+        return tuple(str(value) for value in label_values)
+
+    def remove(self, *label_values):
+        with self.lock:
+            self.values.pop(self._check_labels(label_values), None)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    @staticmethod
+    def merge(snapshots):
+        # Latest value wins, e.g. a gauge reported by several processes
+        merged = {}
+        for values in snapshots:
+            merged.update(values)
+        return merged
+
+    def _render_samples(self, values):
+        return ["{0}{1} {2}".format(self.name, format_labels(self.label_names, label_values), format_value(value))
+                for label_values, value in values.items()]
+
+    def render(self, remote_snapshots=()):
+        values = self.merge([self.snapshot()] + list(remote_snapshots)) if remote_snapshots else self.snapshot()
+        return ["# HELP {0} {1}".format(self.name, self.documentation),
+                "# TYPE {0} {1}".format(self.name, self.metric_type)] + self._render_samples(values)
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, *label_values, amount=1):
+        key = self._check_labels(label_values)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, *label_values):
+        return self.values.get(self._check_labels(label_values), 0)
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for values in snapshots:
+            for label_values, value in values.items():
+                merged[label_values] = merged.get(label_values, 0) + value
+        return merged
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value, *label_values):
+        key = self._check_labels(label_values)
+        with self.lock:
+            self.values[key] = value
+
+    def get(self, *label_values):
+        return self.values.get(self._check_labels(label_values))
+
+
+class HistogramValue:
+    __slots__ = ('bucket_counts', 'count', 'sum')
+
+    def __init__(self, bucket_count):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+
+    def copy(self):
+        histogram_value = HistogramValue(0)
+        histogram_value.bucket_counts = list(self.bucket_counts)
+        histogram_value.count = self.count
+        histogram_value.sum = self.sum
+        return histogram_value
+
+    def add(self, other):
+        self.bucket_counts = [count + other_count for count, other_count in zip(self.bucket_counts,
+                                                                                 other.bucket_counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._check_labels(label_values)
+        # Only the matching bucket is incremented, cumulative counts are computed when rendering
+        bucket_index = bisect_left(self.buckets, value)
+        with self.lock:
+            histogram_value = self.values.get(key)
+            if histogram_value is None:
+                histogram_value = self.values[key] = HistogramValue(len(self.buckets) + 1)
+            histogram_value.bucket_counts[bucket_index] += 1
+            histogram_value.count += 1
+            histogram_value.sum += value
+
+    def time(self, *label_values):
+        return Timer(self, label_values)
+
+    def get(self, *label_values):
+        return self.values.get(self._check_labels(label_values))
+
+    def snapshot(self):
+        with self.lock:
+            return {label_values: histogram_value.copy() for label_values, histogram_value in self.values.items()}
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for values in snapshots:
+            for label_values, histogram_value in values.items():
+                if label_values in merged:
+                    merged[label_values].add(histogram_value)
+                else:
+                    merged[label_values] = histogram_value.copy()
+        return merged
+
+    def _render_samples(self, values):
+        samples = []
+        for label_values, histogram_value in values.items():
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets + (math.inf,), histogram_value.bucket_counts):
+                cumulative_count += bucket_count
+                samples.append("{0}_bucket{1} {2}".format(
+                    self.name,
+                    format_labels(self.label_names, label_values, (('le', format_value(float(upper_bound))),)),
+                    cumulative_count))
+            labels = format_labels(self.label_names, label_values)
+            samples.append("{0}_count{1} {2}".format(self.name, labels, histogram_value.count))
+            samples.append("{0}_sum{1} {2}".format(self.name, labels, format_value(histogram_value.sum)))
+        return samples
+
+
+class MetricsRegistry:
+    METRIC_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+    def __init__(self):
+        self.metrics = {}
+        # Values reported by other processes (e.g. gateway collectors) by source, merged when rendering
+        self.remote_snapshots = {}
+
+    def __register(self, metric):
+        existing_metric = self.metrics.get(metric.name)
+        if existing_metric is not None:
+            if type(existing_metric) is not type(metric) or existing_metric.label_names != metric.label_names:
+                raise Exception("Metric {0} is already registered with a different type or labels".format(
+                    metric.name))
+            return existing_metric
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self.__register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self.__register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.__register(Histogram(name, documentation, label_names, buckets))
+
+    def snapshot(self):
+        # Picklable copy of all recorded values, to be merged into the registry of another process
+        snapshot = {}
+        for metric in list(self.metrics.values()):
+            values = metric.snapshot()
+            if values:
+                snapshot[metric.name] = (metric.metric_type, metric.documentation, metric.label_names,
+                                         getattr(metric, 'buckets', None), values)
+        return snapshot
+
+    def update_remote(self, source, snapshot):
+        # Replaces all values reported earlier by the source
+        for name, (metric_type, documentation, label_names, buckets, _) in snapshot.items():
+            if name not in self.metrics:
+                if metric_type == "histogram":
+                    self.histogram(name, documentation, label_names, buckets)
+                else:
+                    self.__register(self.METRIC_TYPES[metric_type](name, documentation, label_names))
+        self.remote_snapshots[source] = {name: values for name, (_, _, _, _, values) in snapshot.items()}
+
+    def remove_remote(self, source):
+        self.remote_snapshots.pop(source, None)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render([snapshot[metric.name] for snapshot in self.remote_snapshots.values()
+                                        if metric.name in snapshot]))
+        return "\n".join(lines) + "\n"
+
+
+# Default registry shared by all instrumented modules
+REGISTRY = MetricsRegistry()
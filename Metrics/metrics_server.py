@@ -0,0 +1,73 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+
+from Metrics.metrics_registry import REGISTRY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    def __init__(self, host="0.0.0.0", port=9188, registry=REGISTRY, request_timeout=5):
+        self.class_name = "MetricsServer"
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.request_timeout = request_timeout
+        self.server = None
+
+    @staticmethod
+    def __write_response(writer, status, body, content_type="text/plain; charset=utf-8"):
+        payload = body.encode('utf-8')
+        writer.write("HTTP/1.1 {0}\r\nContent-Type: {1}\r\nContent-Length: {2}\r\nConnection: close\r\n\r\n".format(
+            status, content_type, len(payload)).encode('latin-1') + payload)
+
+    async def __handle_request(self, reader, writer):
+        log = logging.getLogger(self.class_name + ".__handle_request")
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), self.request_timeout)
+            # Headers are not needed, but have to be consumed before responding
+            while True:
+                header_line = await asyncio.wait_for(reader.readline(), self.request_timeout)
+                if header_line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                self.__write_response(writer, "405 Method Not Allowed", "Method not allowed\n")
+            elif parts[1].split('?')[0] != '/metrics':
+                self.__write_response(writer, "404 Not Found", "Not found\n")
+            else:
+                self.__write_response(writer, "200 OK", self.registry.render(), CONTENT_TYPE)
+            await writer.drain()
+        except Exception as e:
+            log.warning("Error during handling of metrics request: {0}".format(str(e)))
+        finally:
+            writer.close()
+
+    async def start(self):
+        log = logging.getLogger(self.class_name + ".start")
+        self.server = await asyncio.start_server(self.__handle_request, self.host, self.port)
+        log.info("Serving metrics on http://{0}:{1}/metrics".format(self.host, self.port))
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
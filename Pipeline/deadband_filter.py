@@ -0,0 +1,95 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+import logging
+
+from TimeSeries.time_series_store import METRICS
+
+
+class PublishedState:
+    __slots__ = ('published_at', 'snapshot_at', 'values')
+
+    def __init__(self, published_at, values):
+        self.published_at = published_at
+        # Time of the last full measurement, deltas do not count for the heartbeat
+        self.snapshot_at = published_at
+        self.values = values
+
+
+class DeadbandFilter:
+    def __init__(self, deadbands=None, heartbeat_interval=3600, delta_only=False):
+        self.class_name = "DeadbandFilter"
+        # Per-metric deadbands: {metric: {'absolute': value, 'relative': percent}}
+        self.deadbands = {metric: ((deadband or {}).get('absolute') or 0.0, (deadband or {}).get('relative') or 0.0)
+                          for metric, deadband in (deadbands or {}).items()}
+        unknown_metrics = [metric for metric in self.deadbands if metric not in METRICS]
+        if unknown_metrics:
+            raise Exception("Unknown metric(s) in deadbands: {0}. Use one of: {1}".format(
+                ", ".join(unknown_metrics), ", ".join(METRICS)))
+        self.heartbeat_interval = heartbeat_interval
+        self.delta_only = delta_only
+        self.published_states = {}
+        self.passed_count = 0
+        self.suppressed_count = 0
+
+    def __is_outside_deadband(self, metric, published_value, value):
+        if isinstance(value, str) or isinstance(published_value, str):
+            # Radon averages are "N/A" until enough data is collected
+            return value != published_value
+        absolute, relative = self.deadbands.get(metric, (0.0, 0.0))
+        # Effective deadband is the larger of the absolute and the relative threshold
+        return abs(value - published_value) > max(absolute, abs(published_value) * relative / 100.0)
+
+    def filter(self, sensor_measurement):
+        log = logging.getLogger(self.class_name + ".filter")
+        serial_number = sensor_measurement.device_serial_number
+        timestamp = sensor_measurement.timestamp.timestamp()
+        state = self.published_states.get(serial_number)
+
+        if state is None or timestamp - state.snapshot_at >= self.heartbeat_interval:
+            # First measurement of the device or heartbeat: publish the full measurement
+            self.published_states[serial_number] = PublishedState(
+                timestamp, {metric: getattr(sensor_measurement, metric) for metric in METRICS})
+            self.passed_count += 1
+            return sensor_measurement
+
+        changed_metrics = [metric for metric in METRICS
+                           if self.__is_outside_deadband(metric, state.values[metric],
+                                                         getattr(sensor_measurement, metric))]
+        if not changed_metrics:
+            self.suppressed_count += 1
+            log.debug("Measurement of device {0} within deadbands, not publishing.".format(serial_number))
+            return None
+
+        # Values are compared against the last published value, so slow drifts still get published eventually
+        for metric in changed_metrics:
+            state.values[metric] = getattr(sensor_measurement, metric)
+        state.published_at = timestamp
+        self.passed_count += 1
+
+        if not self.delta_only:
+            state.snapshot_at = timestamp
+            return sensor_measurement
+        delta_measurement = copy.copy(sensor_measurement)
+        for metric in METRICS:
+            if metric not in changed_metrics:
+                setattr(delta_measurement, metric, None)
+        return delta_measurement
+
+    def get_metrics(self):
+        return {"passed": self.passed_count, "suppressed": self.suppressed_count}
@@ -0,0 +1,88 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+
+
+class MeasurementBatcher:
+    # Collects measurements of one sink into batches, published when max_wait expires or max_bytes is reached
+    def __init__(self, name, serialize_batch, publish_batch, max_bytes=262144, max_wait=5):
+        self.class_name = "MeasurementBatcher"
+        self.name = name
+        self.serialize_batch = serialize_batch
+        self.publish_batch = publish_batch
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self.measurements = []
+        self.published = None
+        self.flush_handle = None
+        self.flush_tasks = set()
+        # Size of a batch is only known once it is encoded, batches are closed on the size of previous batches
+        self.bytes_per_measurement = None
+
+    def __is_full(self):
+        return self.bytes_per_measurement is not None and \
+            (len(self.measurements) + 1) * self.bytes_per_measurement > self.max_bytes
+
+    def __flush_in_background(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def add(self, sensor_measurement):
+        # Returns whether the batch containing the measurement was published
+        loop = asyncio.get_running_loop()
+        if not self.measurements:
+            self.published = loop.create_future()
+            self.flush_handle = loop.call_later(self.max_wait, self.__flush_in_background)
+        self.measurements.append(sensor_measurement)
+        published = self.published
+        if self.__is_full():
+            self.__flush_in_background()
+        return await asyncio.shield(published)
+
+    async def __publish(self, measurements):
+        payload = self.serialize_batch(measurements)
+        self.bytes_per_measurement = len(payload) / len(measurements)
+        if len(payload) > self.max_bytes and len(measurements) > 1:
+            # Estimate was too low: split the batch until every part fits into max_bytes
+            middle = len(measurements) // 2
+            results = await asyncio.gather(self.__publish(measurements[:middle]),
+                                           self.__publish(measurements[middle:]))
+            return all(results)
+        return await self.publish_batch(payload, len(measurements))
+
+    async def flush(self):
+        log = logging.getLogger(self.class_name + ".flush")
+        if not self.measurements:
+            return
+        measurements, published = self.measurements, self.published
+        self.measurements, self.published = [], None
+        self.flush_handle.cancel()
+        try:
+            result = await self.__publish(measurements)
+        except Exception as e:
+            log.error("Error during publishing of batch of {0} measurement(s) to {1}: {2}".format(
+                len(measurements), self.name, str(e)))
+            result = False
+        published.set_result(result)
+
+    async def close(self):
+        await self.flush()
+        if self.flush_tasks:
+            await asyncio.gather(*self.flush_tasks)
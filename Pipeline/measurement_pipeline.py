@@ -0,0 +1,96 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+
+from Metrics.metrics_registry import REGISTRY
+from TimeSeries.time_series_store import DEFAULT_WINDOWS
+
+# Exported over the first window only, each window and statistic would multiply the series of every device
+ROLLING_MEAN = REGISTRY.gauge("airthings_rolling_mean", "Mean of recent sensor values over the first rolling window",
+                              ("device", "metric"))
+ROLLING_P95 = REGISTRY.gauge("airthings_rolling_p95",
+                             "95th percentile of recent sensor values over the first rolling window",
+                             ("device", "metric"))
+AGGREGATED_METRICS = ('radon_short_term_avg', 'co2_level')
+
+
+class MeasurementPipeline:
+    def __init__(self, publisher_fanout, time_series_store=None, history_store=None, windows=DEFAULT_WINDOWS,
+                 measurement_filter=None, window_aggregator=None, publish_measurements=True):
+        self.class_name = "MeasurementPipeline"
+        self.publisher_fanout = publisher_fanout
+        self.measurement_filter = measurement_filter
+        self.window_aggregator = window_aggregator
+        # Without raw measurements only rollups of the window aggregator are published
+        self.publish_measurements = publish_measurements
+        self.time_series_store = time_series_store
+        self.history_store = history_store
+        self.windows = windows
+
+    async def start(self):
+        await self.publisher_fanout.start()
+        if self.window_aggregator is not None:
+            await self.window_aggregator.publisher_fanout.start()
+        if self.history_store is not None:
+            await self.history_store.start()
+
+    async def update_rolling_aggregates(self):
+        # Periodic job, measurements are only added to the store. Further windows are aggregated for debug logs only.
+        log = logging.getLogger(self.class_name + ".update_rolling_aggregates")
+        debug_enabled = log.isEnabledFor(logging.DEBUG)
+        windows = self.windows if debug_enabled else self.windows[:1]
+        for serial_number in self.time_series_store.get_serial_numbers():
+            for position, window in enumerate(windows):
+                for metric in AGGREGATED_METRICS:
+                    aggregate = self.time_series_store.aggregate(serial_number, metric, window)
+                    if aggregate is None:
+                        continue
+                    if position == 0:
+                        ROLLING_MEAN.set(aggregate["mean"], serial_number, metric)
+                        ROLLING_P95.set(aggregate["p95"], serial_number, metric)
+                    if debug_enabled:
+                        log.debug("Device {0} {1} over last {2}s: {3}".format(serial_number, metric, window,
+                                                                              aggregate))
+
+    async def process(self, sensor_measurement):
+        log = logging.getLogger(self.class_name + ".process")
+        # Only publishing is filtered, local stores and rollups always get the full measurement
+        if self.publish_measurements:
+            published_measurement = sensor_measurement if self.measurement_filter is None \
+                else self.measurement_filter.filter(sensor_measurement)
+            if published_measurement is not None:
+                self.publisher_fanout.submit(published_measurement)
+
+        if self.window_aggregator is not None:
+            self.window_aggregator.add(sensor_measurement)
+
+        if self.history_store is not None:
+            try:
+                await self.history_store.add(sensor_measurement)
+            except Exception as e:
+                log.error("Error during writing to history store: {0}".format(str(e)))
+
+        if self.time_series_store is not None:
+            self.time_series_store.add(sensor_measurement)
+
+    async def close(self):
+        await self.publisher_fanout.close()
+        if self.window_aggregator is not None:
+            await self.window_aggregator.publisher_fanout.close()
+        if self.history_store is not None:
+            await self.history_store.close()
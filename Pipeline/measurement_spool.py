@@ -0,0 +1,109 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL')
+
+
+class MeasurementSpool:
+    def __init__(self, filename, max_entries=100000, synchronous='NORMAL'):
+        self.class_name = "MeasurementSpool"
+        self.filename = filename
+        self.max_entries = max_entries
+        self.synchronous = str(synchronous).upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise Exception("Unknown spool synchronous mode: {0}. Use one of: {1}".format(
+                synchronous, ", ".join(SYNCHRONOUS_MODES)))
+        # All database access happens on a single worker thread to keep disk I/O off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MeasurementSpool")
+        self.connection = None
+        self.entry_count = 0
+        self.evicted_count = 0
+
+    def __open(self):
+        log = logging.getLogger(self.class_name + ".__open")
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous={0}".format(self.synchronous))
+        self.connection.execute("CREATE TABLE IF NOT EXISTS spool ("
+                                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                "sink TEXT NOT NULL, "
+                                "created_at REAL NOT NULL, "
+                                "payload BLOB NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS spool_sink_id ON spool (sink, id)")
+        self.connection.commit()
+        self.entry_count = self.connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        log.info("Spool {0} opened with {1} pending entries".format(self.filename, self.entry_count))
+
+    def __append(self, entries):
+        log = logging.getLogger(self.class_name + ".__append")
+        created_at = time.time()
+        ids = []
+        with self.connection:
+            for sink, payload in entries:
+                cursor = self.connection.execute("INSERT INTO spool (sink, created_at, payload) VALUES (?, ?, ?)",
+                                                 (sink, created_at, payload))
+                ids.append(cursor.lastrowid)
+            self.entry_count += len(entries)
+
+            overflow = self.entry_count - self.max_entries
+            if overflow > 0:
+                self.connection.execute("DELETE FROM spool WHERE id IN (SELECT id FROM spool ORDER BY id LIMIT ?)",
+                                        (overflow,))
+                self.entry_count -= overflow
+                self.evicted_count += overflow
+                log.warning("Spool is full, evicted {0} oldest entries".format(overflow))
+        return ids
+
+    def __delete(self, ids):
+        with self.connection:
+            deleted = self.connection.executemany("DELETE FROM spool WHERE id = ?", [(id_,) for id_ in ids]).rowcount
+            self.entry_count -= max(0, deleted)
+
+    def __fetch(self, sink, limit, excluded_ids):
+        rows = self.connection.execute("SELECT id, payload FROM spool WHERE sink = ? ORDER BY id LIMIT ?",
+                                       (sink, limit + len(excluded_ids))).fetchall()
+        return [row for row in rows if row[0] not in excluded_ids][:limit]
+
+    async def __run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def open(self):
+        await self.__run(self.__open)
+
+    async def append(self, entries):
+        return await self.__run(self.__append, entries)
+
+    async def delete(self, ids):
+        if ids:
+            await self.__run(self.__delete, ids)
+
+    async def fetch(self, sink, limit, excluded_ids=frozenset()):
+        return await self.__run(self.__fetch, sink, limit, excluded_ids)
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.connection is not None:
+            await self.__run(self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=True)
+        log.info("Spool closed [pending: {0}, evicted: {1}]".format(self.entry_count, self.evicted_count))
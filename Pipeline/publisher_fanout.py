@@ -0,0 +1,226 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import functools
+import logging
+
+from Metrics.metrics_registry import REGISTRY
+from Pipeline.measurement_batcher import MeasurementBatcher
+from Tracing.tracer import start_span
+
+SERIALIZATION_DURATION = REGISTRY.histogram("serialization_duration_seconds", "Duration of measurement encoding",
+                                            ("format",))
+PUBLISH_DURATION = REGISTRY.histogram("publisher_publish_duration_seconds",
+                                      "Duration of publishing one message until it is acknowledged", ("publisher",))
+PUBLISHED_MESSAGES = REGISTRY.counter("publisher_messages_total", "Published messages by result",
+                                      ("publisher", "result"))
+BATCH_SIZE = REGISTRY.histogram("publisher_batch_measurements", "Measurements per batched message", ("publisher",),
+                                buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+
+
+class FanoutSink:
+    def __init__(self, name, sink, serializer, timeout, topic):
+        self.name = name
+        self.sink = sink
+        self.serializer = serializer
+        self.timeout = timeout
+        self.topic = topic
+        self.batcher = None
+        self.published_count = 0
+        self.failed_count = 0
+
+
+class PublisherFanout:
+    def __init__(self, spool=None, replay_batch_size=100, replay_interval=5):
+        self.class_name = "PublisherFanout"
+        self.sinks = []
+        self.pending_tasks = set()
+        self.spool = spool
+        self.replay_batch_size = replay_batch_size
+        self.replay_interval = replay_interval
+        self.in_flight_spool_ids = set()
+        self.drain_task = None
+
+    def add_sink(self, name, sink, serializer, topic, timeout=10, batch_max_bytes=None, batch_max_wait=None):
+        # Sinks are started and closed by their owner, one sink can be shared by several fanouts with own topics.
+        # With batch_max_wait, measurements are published in batches encoded by a batch serializer
+        sink = FanoutSink(name, sink, serializer, timeout, topic)
+        if batch_max_wait is not None:
+            sink.batcher = MeasurementBatcher(name,
+                                              functools.partial(self.__serialize_batch, sink),
+                                              functools.partial(self.__publish_batch, sink),
+                                              batch_max_bytes or 262144,
+                                              batch_max_wait)
+        self.sinks.append(sink)
+
+    async def remove_sink(self, name):
+        # Publishes already started keep using the sink, the owner closes it once pending_tasks have completed
+        for sink in [sink for sink in self.sinks if sink.name == name]:
+            self.sinks.remove(sink)
+            if sink.batcher is not None:
+                await sink.batcher.close()
+
+    def __serialize(self, sensor_measurement, sinks):
+        # Each format is encoded only once and the payload is shared by all sinks using it
+        payloads = {}
+        for sink in sinks:
+            if sink.serializer.name not in payloads:
+                with start_span("serialize", {"format": sink.serializer.name}), \
+                        SERIALIZATION_DURATION.time(sink.serializer.name):
+                    payloads[sink.serializer.name] = sink.serializer.serialize(sensor_measurement)
+        return [payloads[sink.serializer.name] for sink in sinks]
+
+    @staticmethod
+    def __serialize_batch(sink, sensor_measurements):
+        with start_span("serialize", {"format": sink.serializer.name, "measurements": len(sensor_measurements)}), \
+                SERIALIZATION_DURATION.time(sink.serializer.name):
+            return sink.serializer.serialize(sensor_measurements)
+
+    async def __publish_to_sink(self, sink, payload):
+        log = logging.getLogger(self.class_name + ".__publish_to_sink")
+        try:
+            with start_span("publish", {"publisher": sink.name}), PUBLISH_DURATION.time(sink.name):
+                await asyncio.wait_for(sink.sink.publish(payload, sink.topic), sink.timeout)
+            sink.published_count += 1
+            PUBLISHED_MESSAGES.inc(sink.name, "success")
+            return True
+        except asyncio.TimeoutError:
+            sink.failed_count += 1
+            PUBLISHED_MESSAGES.inc(sink.name, "timeout")
+            log.error("Timeout during publishing to {0} after {1}s".format(sink.name, sink.timeout))
+        except Exception as e:
+            sink.failed_count += 1
+            PUBLISHED_MESSAGES.inc(sink.name, "failure")
+            log.error("Error during publishing to {0}: {1}".format(sink.name, str(e)))
+        return False
+
+    async def __publish_many_to_sink(self, sink, payloads):
+        log = logging.getLogger(self.class_name + ".__publish_many_to_sink")
+        try:
+            with start_span("publish", {"publisher": sink.name, "messages": len(payloads)}):
+                await asyncio.wait_for(sink.sink.publish_batch(payloads, sink.topic), sink.timeout)
+            sink.published_count += len(payloads)
+            PUBLISHED_MESSAGES.inc(sink.name, "success", amount=len(payloads))
+            return True
+        except asyncio.TimeoutError:
+            sink.failed_count += len(payloads)
+            PUBLISHED_MESSAGES.inc(sink.name, "timeout", amount=len(payloads))
+            log.error("Timeout during publishing to {0} after {1}s".format(sink.name, sink.timeout))
+        except Exception as e:
+            sink.failed_count += len(payloads)
+            PUBLISHED_MESSAGES.inc(sink.name, "failure", amount=len(payloads))
+            log.error("Error during publishing to {0}: {1}".format(sink.name, str(e)))
+        return False
+
+    async def __publish_batch(self, sink, payload, measurement_count):
+        # Measurements of the batch are already spooled one by one and removed by publish() once it is delivered
+        BATCH_SIZE.observe(measurement_count, sink.name)
+        return await self.__publish_to_sink(sink, payload)
+
+    async def publish(self, sensor_measurement):
+        log = logging.getLogger(self.class_name + ".publish")
+        sinks = [sink for sink in self.sinks if sink.batcher is None]
+        batched_sinks = [sink for sink in self.sinks if sink.batcher is not None]
+        payloads = self.__serialize(sensor_measurement, sinks)
+
+        spool_ids = [None] * len(self.sinks)
+        if self.spool is not None and self.sinks:
+            try:
+                # Measurement is stored before publishing so it survives sink outages and restarts. For batched sinks
+                # it is stored as a batch of its own, replayed when the batch holding it could not be published.
+                spool_ids = await self.spool.append([(sink.name, payload)
+                                                     for sink, payload in zip(sinks, payloads)] +
+                                                    [(sink.name, self.__serialize_batch(sink, [sensor_measurement]))
+                                                     for sink in batched_sinks])
+                self.in_flight_spool_ids.update(spool_ids)
+            except Exception as e:
+                log.error("Error during spooling of measurement: {0}".format(str(e)))
+
+        results = await asyncio.gather(*[self.__publish_to_sink(sink, payload)
+                                         for sink, payload in zip(sinks, payloads)],
+                                       *[sink.batcher.add(sensor_measurement) for sink in batched_sinks])
+
+        if self.spool is not None:
+            delivered_ids = [spool_id for spool_id, result in zip(spool_ids, results)
+                             if result and spool_id is not None]
+            try:
+                await self.spool.delete(delivered_ids)
+            except Exception as e:
+                log.error("Error during removal of delivered measurements from spool: {0}".format(str(e)))
+            self.in_flight_spool_ids.difference_update(spool_ids)
+
+        return {sink.name: result for sink, result in zip(sinks + batched_sinks, results)}
+
+    def submit(self, sensor_measurement):
+        # Publishing runs in the background, so slow sinks never delay the next BLE read
+        task = asyncio.get_running_loop().create_task(self.publish(sensor_measurement))
+        self.pending_tasks.add(task)
+        task.add_done_callback(self.pending_tasks.discard)
+        return task
+
+    async def __replay_spooled_batch(self, sink):
+        log = logging.getLogger(self.class_name + ".__replay_spooled_batch")
+        rows = await self.spool.fetch(sink.name, self.replay_batch_size, frozenset(self.in_flight_spool_ids))
+        if not rows:
+            return 0, False
+
+        # Spooled messages are sent as one batch, all of them stay spooled if any of them fails
+        result = await self.__publish_many_to_sink(sink, [payload for _, payload in rows])
+        delivered_ids = [spool_id for spool_id, _ in rows] if result else []
+        await self.spool.delete(delivered_ids)
+        if delivered_ids:
+            log.info("Replayed {0} spooled measurement(s) to {1}".format(len(delivered_ids), sink.name))
+        return len(delivered_ids), len(delivered_ids) == self.replay_batch_size
+
+    async def __drain_spool_periodically(self):
+        log = logging.getLogger(self.class_name + ".__drain_spool_periodically")
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            for sink in self.sinks:
+                try:
+                    more_pending = True
+                    while more_pending:
+                        _, more_pending = await self.__replay_spooled_batch(sink)
+                except Exception as e:
+                    log.error("Error during replay of spooled measurements to {0}: {1}".format(sink.name, str(e)))
+
+    async def start(self):
+        if self.spool is not None:
+            await self.spool.open()
+            self.drain_task = asyncio.get_running_loop().create_task(self.__drain_spool_periodically())
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.drain_task is not None:
+            self.drain_task.cancel()
+            try:
+                await self.drain_task
+            except asyncio.CancelledError:
+                pass
+            self.drain_task = None
+        for sink in self.sinks:
+            if sink.batcher is not None:
+                # Open batches are published right away instead of waiting for max_wait
+                await sink.batcher.close()
+        if self.pending_tasks:
+            log.info("Waiting for {0} pending publish task(s)...".format(len(self.pending_tasks)))
+            await asyncio.gather(*self.pending_tasks)
+        for sink in self.sinks:
+            log.info("Sink {0}: published: {1}, failed: {2}".format(sink.name, sink.published_count, sink.failed_count))
+        if self.spool is not None:
+            await self.spool.close()
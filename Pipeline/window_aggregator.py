@@ -0,0 +1,196 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import math
+import time
+
+from Metrics.metrics_registry import REGISTRY
+from TimeSeries.time_series_store import METRICS
+
+# Default rollup windows: 15 minutes and 1 hour, both tumbling
+DEFAULT_ROLLUP_WINDOWS = ({'size': 900}, {'size': 3600})
+
+ROLLUPS = REGISTRY.counter("aggregation_rollups_total", "Rollups emitted on window close", ("window",))
+LATE_MEASUREMENTS = REGISTRY.counter("aggregation_late_measurements_total",
+                                     "Measurements arriving after their windows were closed")
+
+
+class RunningAggregate:
+    __slots__ = ('count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        if self.count == 0:
+            return None
+        return {"mean": self.sum / self.count, "min": self.min, "max": self.max, "count": self.count}
+
+
+class WindowSpec:
+    def __init__(self, size, hop=None):
+        self.size = size
+        # Tumbling windows hop by their size, sliding windows by a divisor of their size
+        self.hop = hop or size
+        if self.size <= 0 or self.hop <= 0 or self.size % self.hop != 0:
+            raise Exception("Window size {0}s has to be a positive multiple of its hop {1}s".format(size, hop))
+        self.name = "{0}s".format(self.size) if self.hop == self.size else "{0}s/{1}s".format(self.size, self.hop)
+
+
+class Rollup:
+    __slots__ = ('device_serial_number', 'device_bluetooth_mac_address', 'window', 'window_start', 'window_end',
+                 'aggregates')
+
+    def __init__(self, device_serial_number, device_bluetooth_mac_address, window, window_start, window_end,
+                 aggregates):
+        self.device_serial_number = device_serial_number
+        self.device_bluetooth_mac_address = device_bluetooth_mac_address
+        self.window = window
+        self.window_start = window_start
+        self.window_end = window_end
+        self.aggregates = aggregates
+
+
+class DeviceWindows:
+    # Windows of one device and window spec, split into panes of one hop: a measurement updates a single pane,
+    # a closing window merges its size / hop panes
+    __slots__ = ('spec', 'panes', 'next_window_end')
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.panes = {}
+        self.next_window_end = None
+
+    def add(self, timestamp, values):
+        pane_start = math.floor(timestamp / self.spec.hop) * self.spec.hop
+        if self.next_window_end is not None and pane_start < self.next_window_end - self.spec.size:
+            # Every window containing this pane is closed already
+            return False
+        if self.next_window_end is None:
+            self.next_window_end = pane_start + self.spec.hop
+        aggregates = self.panes.get(pane_start)
+        if aggregates is None:
+            aggregates = [RunningAggregate() for _ in METRICS]
+            self.panes[pane_start] = aggregates
+        for aggregate, value in zip(aggregates, values):
+            if value is not None:
+                aggregate.add(value)
+        return True
+
+    def close(self, watermark):
+        # Returns (start, end, aggregates) of all windows ending at or before the watermark
+        closed_windows = []
+        while self.panes and self.next_window_end <= watermark:
+            window_end = self.next_window_end
+            window_start = window_end - self.spec.size
+            aggregates = [RunningAggregate() for _ in METRICS]
+            for pane_start, pane_aggregates in self.panes.items():
+                if window_start <= pane_start < window_end:
+                    for aggregate, pane_aggregate in zip(aggregates, pane_aggregates):
+                        aggregate.merge(pane_aggregate)
+            if any(aggregate.count for aggregate in aggregates):
+                closed_windows.append((window_start, window_end, aggregates))
+            self.next_window_end += self.spec.hop
+            # Panes are kept until the last window containing them is closed
+            for pane_start in [pane_start for pane_start in self.panes
+                               if pane_start < self.next_window_end - self.spec.size]:
+                del self.panes[pane_start]
+            if self.panes:
+                # Skip windows without panes after a device was silent for a while
+                self.next_window_end = max(self.next_window_end, min(self.panes) + self.spec.hop)
+        return closed_windows
+
+
+class WindowAggregator:
+    def __init__(self, publisher_fanout, windows=DEFAULT_ROLLUP_WINDOWS, allowed_lateness=60, max_devices=500):
+        self.class_name = "WindowAggregator"
+        self.publisher_fanout = publisher_fanout
+        self.specs = [WindowSpec(window.get('size'), window.get('hop')) for window in windows]
+        # Windows close this many seconds after their end, so slightly delayed measurements are still included
+        self.allowed_lateness = allowed_lateness
+        self.max_devices = max_devices
+        self.devices = {}
+        self.mac_addresses = {}
+        self.rollup_count = 0
+        self.late_count = 0
+
+    def __emit(self, serial_number, spec, closed_windows):
+        log = logging.getLogger(self.class_name + ".__emit")
+        for window_start, window_end, aggregates in closed_windows:
+            rollup = Rollup(serial_number, self.mac_addresses.get(serial_number), spec.name, window_start, window_end,
+                            {metric: aggregate.to_dict() for metric, aggregate in zip(METRICS, aggregates)})
+            log.debug("Rollup of device {0} for window {1}: {2}".format(serial_number, spec.name, rollup.aggregates))
+            self.rollup_count += 1
+            ROLLUPS.inc(spec.name)
+            self.publisher_fanout.submit(rollup)
+
+    def add(self, sensor_measurement):
+        log = logging.getLogger(self.class_name + ".add")
+        serial_number = sensor_measurement.device_serial_number
+        device_windows = self.devices.get(serial_number)
+        if device_windows is None:
+            if len(self.devices) >= self.max_devices:
+                log.warning("Maximum number of devices ({0}) reached, ignoring device {1}".format(
+                    self.max_devices, serial_number))
+                return
+            device_windows = [DeviceWindows(spec) for spec in self.specs]
+            self.devices[serial_number] = device_windows
+        self.mac_addresses[serial_number] = sensor_measurement.device_bluetooth_mac_address
+
+        timestamp = sensor_measurement.timestamp.timestamp()
+        values = []
+        for metric in METRICS:
+            value = getattr(sensor_measurement, metric)
+            # Radon is "N/A" while the first measurements are not available yet, it is left out of the aggregates
+            values.append(None if value == "N/A" else value)
+        late_windows = []
+        for windows in device_windows:
+            if not windows.add(timestamp, values):
+                late_windows.append(windows.spec.name)
+            # Measurements of a device arrive in order, so its latest timestamp is the watermark of its windows
+            self.__emit(serial_number, windows.spec, windows.close(timestamp - self.allowed_lateness))
+        if late_windows:
+            self.late_count += 1
+            LATE_MEASUREMENTS.inc()
+            log.warning("Measurement of device {0} at {1} arrived after window(s) {2} were closed".format(
+                serial_number, sensor_measurement.timestamp.isoformat(), ", ".join(late_windows)))
+
+    async def close_expired(self, now=None):
+        # Closes windows of devices that stopped reporting
+        watermark = (now if now is not None else time.time()) - self.allowed_lateness
+        for serial_number, device_windows in self.devices.items():
+            for windows in device_windows:
+                self.__emit(serial_number, windows.spec, windows.close(watermark))
+
+    def get_metrics(self):
+        return {"devices": len(self.devices), "rollups": self.rollup_count, "late_measurements": self.late_count}
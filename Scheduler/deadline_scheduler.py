@@ -0,0 +1,204 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import time
+
+# Job whose callback is running in the current task
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class MonotonicClock:
+    def time(self):
+        return time.monotonic()
+
+    async def wait(self, event, timeout):
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    async def wait(self, event, timeout):
+        if math.isinf(timeout):
+            await event.wait()
+            return
+        # Time advances instantly, running tasks still get a chance to run
+        await asyncio.sleep(0)
+        if not event.is_set():
+            self.now += max(0.0, timeout)
+
+
+class ScheduledJob:
+    def __init__(self, name, interval, phase, callback):
+        self.name = name
+        self.interval = interval
+        self.phase = phase
+        self.callback = callback
+        self.next_deadline = None
+        self.task = None
+        self.removed = False
+        self.runs = 0
+        self.skipped_ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def get_metrics(self):
+        return {
+            "interval": self.interval,
+            "phase": self.phase,
+            "runs": self.runs,
+            "skipped_ticks": self.skipped_ticks,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "mean_lag": self.total_lag / self.runs if self.runs else 0.0
+        }
+
+
+class DeadlineScheduler:
+    def __init__(self, clock=None):
+        self.class_name = "DeadlineScheduler"
+        self.clock = clock if clock is not None else MonotonicClock()
+        self.jobs = {}
+        self.deadlines = []
+        self.sequence = itertools.count()
+        self.changed = asyncio.Event()
+        self.running = False
+        # Runs of removed jobs, still awaited by stop()
+        self.removed_tasks = set()
+
+    def __push(self, job):
+        heapq.heappush(self.deadlines, (job.next_deadline, next(self.sequence), job))
+
+    def add_job(self, name, interval, callback, phase=0.0):
+        previous_job = self.jobs.get(name)
+        if previous_job is not None:
+            self.remove_job(name)
+        job = ScheduledJob(name, interval, phase % interval if interval > 0 else 0.0, callback)
+        if previous_job is not None and previous_job.task is not None and not previous_job.task.done():
+            # Replacement skips its ticks until the run of the replaced job finishes
+            job.task = previous_job.task
+        self.jobs[name] = job
+        if self.running:
+            job.next_deadline = self.clock.time() + job.phase
+            self.__push(job)
+            self.changed.set()
+        return job
+
+    def remove_job(self, name):
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            # Entry stays in the heap and is dropped when it is popped
+            job.removed = True
+            if job.task is not None and not job.task.done():
+                self.removed_tasks.add(job.task)
+                job.task.add_done_callback(self.removed_tasks.discard)
+
+    def reschedule(self, name, delay):
+        job = self.jobs.get(name)
+        if job is None or not self.running:
+            return
+        running_job = current_job.get()
+        if running_job is not None and running_job.name == name and running_job is not job:
+            # Run of a replaced job must not move the deadline of its replacement
+            return
+        # Entry with the previous deadline stays in the heap and is dropped when it is popped
+        job.next_deadline = self.clock.time() + max(0.0, delay)
+        self.__push(job)
+        self.changed.set()
+
+    async def __run_job(self, job):
+        log = logging.getLogger(self.class_name + ".__run_job")
+        current_job.set(job)
+        try:
+            await job.callback()
+        except Exception as e:
+            log.error("Error during execution of job {0}: {1}".format(job.name, str(e)))
+
+    def __dispatch(self, job, now):
+        log = logging.getLogger(self.class_name + ".__dispatch")
+        lag = now - job.next_deadline
+        if job.task is not None and not job.task.done():
+            # Previous run overran its interval: skip this tick instead of piling up runs
+            job.skipped_ticks += 1
+            log.warning("Job {0} is still running, skipping tick (lag: {1:.3f}s)".format(job.name, lag))
+        else:
+            job.runs += 1
+            job.last_lag = lag
+            job.max_lag = max(job.max_lag, lag)
+            job.total_lag += lag
+            job.task = asyncio.get_running_loop().create_task(self.__run_job(job))
+
+        # Next deadline stays on the original grid, ticks missed while the loop was blocked are skipped
+        missed_ticks = int(math.floor(lag / job.interval)) if job.interval > 0 else 0
+        if missed_ticks > 0:
+            job.skipped_ticks += missed_ticks
+            log.warning("Job {0} missed {1} tick(s)".format(job.name, missed_ticks))
+        job.next_deadline += (missed_ticks + 1) * job.interval
+
+    async def run(self):
+        self.running = True
+        start = self.clock.time()
+        for job in self.jobs.values():
+            job.next_deadline = start + job.phase
+            self.__push(job)
+
+        try:
+            while True:
+                self.changed.clear()
+                if not self.deadlines:
+                    await self.clock.wait(self.changed, math.inf)
+                    continue
+
+                deadline, _, job = self.deadlines[0]
+                if job.removed or deadline != job.next_deadline:
+                    heapq.heappop(self.deadlines)
+                    continue
+
+                delay = deadline - self.clock.time()
+                if delay > 0:
+                    await self.clock.wait(self.changed, delay)
+                    continue
+
+                heapq.heappop(self.deadlines)
+                self.__dispatch(job, self.clock.time())
+                if job.interval > 0:
+                    self.__push(job)
+        finally:
+            self.running = False
+
+    async def stop(self):
+        tasks = {job.task for job in self.jobs.values() if job.task is not None and not job.task.done()}
+        tasks.update(self.removed_tasks)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def get_metrics(self):
+        return {name: job.get_metrics() for name, job in self.jobs.items()}
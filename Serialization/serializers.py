@@ -0,0 +1,240 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import struct
+from datetime import datetime
+
+import msgpack
+
+# Fixed binary layout: schema id, serial number, timestamp (ms since epoch), temperature (centi-degC),
+# humidity (0.5 %rH), pressure (0.02 hPa), radon short/long term average (Bq/m3), CO2 (ppm), VOC (ppb),
+# sensor version, voltage (mV), battery level (%), illuminance, ambient light, measurement periods
+STRUCT_SCHEMA_ID = 1
+STRUCT_FORMAT = struct.Struct('<BIqhHHHHHHBHBBBB')
+STRUCT_RADON_NOT_AVAILABLE = 0xFFFF
+
+
+def measurement_to_compact_dict(sensor_measurements):
+    compact_dict = {
+        "serial_num": sensor_measurements.device_serial_number,
+        "bluetooth_MAC_addr": sensor_measurements.device_bluetooth_mac_address,
+        "timestamp": sensor_measurements.timestamp.isoformat(),
+        "temperature": sensor_measurements.temperature,
+        "humidity": sensor_measurements.humidity,
+        "pressure": sensor_measurements.pressure,
+        "radon_short_term_avg": sensor_measurements.radon_short_term_avg,
+        "radon_long_term_avg": sensor_measurements.radon_long_term_avg,
+        "co2_level": sensor_measurements.co2_level,
+        "voc_level": sensor_measurements.voc_level,
+        "battery_level": sensor_measurements.device_battery_level
+    }
+    # Delta-only measurements leave unchanged metrics empty
+    return {key: value for key, value in compact_dict.items() if value is not None}
+
+
+# Columns of batched messages, one value per measurement in each column
+BATCH_COLUMNS = (("serial_num", "device_serial_number"), ("timestamp", "timestamp"), ("temperature", "temperature"),
+                 ("humidity", "humidity"), ("pressure", "pressure"), ("radon_short_term_avg", "radon_short_term_avg"),
+                 ("radon_long_term_avg", "radon_long_term_avg"), ("co2_level", "co2_level"),
+                 ("voc_level", "voc_level"), ("illuminance", "illuminance"), ("ambient_light", "ambient_light"),
+                 ("voltage", "device_voltage"), ("battery_level", "device_battery_level"))
+
+
+def batch_to_dict(sensor_measurements_list):
+    devices = {}
+    columns = {column: [] for column, _ in BATCH_COLUMNS}
+    for sensor_measurements in sensor_measurements_list:
+        serial_number = str(sensor_measurements.device_serial_number)
+        # Device metadata is sent once per batch instead of with every measurement
+        if serial_number not in devices:
+            devices[serial_number] = {
+                "name": sensor_measurements.device_name,
+                "model": sensor_measurements.device_model,
+                "manufacturer": sensor_measurements.device_manufacturer_name,
+                "bluetooth_MAC_addr": sensor_measurements.device_bluetooth_mac_address,
+                "sensor_version": sensor_measurements.device_sensor_version,
+                "hardware_revision": sensor_measurements.device_hardware_revision,
+                "firmware_revision": sensor_measurements.device_firmware_revision
+            }
+        for column, attribute in BATCH_COLUMNS:
+            columns[column].append(getattr(sensor_measurements, attribute))
+    columns["timestamp"] = [timestamp.isoformat() for timestamp in columns["timestamp"]]
+    return {"devices": devices, "measurements": columns}
+
+
+def rollup_to_dict(rollup):
+    return {
+        "serial_num": rollup.device_serial_number,
+        "bluetooth_MAC_addr": rollup.device_bluetooth_mac_address,
+        "window": rollup.window,
+        "window_start": datetime.fromtimestamp(rollup.window_start).isoformat(),
+        "window_end": datetime.fromtimestamp(rollup.window_end).isoformat(),
+        # Metrics without values in the window (e.g. radon while "N/A") are left out
+        "metrics": {metric: aggregate for metric, aggregate in rollup.aggregates.items() if aggregate is not None}
+    }
+
+
+class JsonSerializer:
+    name = "json"
+
+    def serialize(self, sensor_measurements):
+        return sensor_measurements.to_json()
+
+
+class JsonLinesSerializer:
+    # Messages of the json format on a single line, e.g. for newline-delimited files
+    name = "json_lines"
+
+    def serialize(self, sensor_measurements):
+        return sensor_measurements.to_json(indent=None)
+
+
+class CompactJsonSerializer:
+    name = "compact_json"
+
+    def serialize(self, sensor_measurements):
+        return json.dumps(measurement_to_compact_dict(sensor_measurements), separators=(',', ':')).encode('utf-8')
+
+
+class MessagePackSerializer:
+    name = "msgpack"
+
+    def serialize(self, sensor_measurements):
+        return msgpack.packb(measurement_to_compact_dict(sensor_measurements))
+
+
+class StructSerializer:
+    name = "struct"
+
+    @staticmethod
+    def __encode_radon(radon):
+        return STRUCT_RADON_NOT_AVAILABLE if radon == "N/A" else radon
+
+    @staticmethod
+    def __decode_radon(radon):
+        return "N/A" if radon == STRUCT_RADON_NOT_AVAILABLE else radon
+
+    def serialize(self, sensor_measurements):
+        return STRUCT_FORMAT.pack(
+            STRUCT_SCHEMA_ID,
+            int(sensor_measurements.device_serial_number),
+            round(sensor_measurements.timestamp.timestamp() * 1000),
+            round(sensor_measurements.temperature * 100),
+            round(sensor_measurements.humidity * 2),
+            round(sensor_measurements.pressure * 50),
+            self.__encode_radon(sensor_measurements.radon_short_term_avg),
+            self.__encode_radon(sensor_measurements.radon_long_term_avg),
+            round(sensor_measurements.co2_level),
+            round(sensor_measurements.voc_level),
+            sensor_measurements.device_sensor_version,
+            round(sensor_measurements.device_voltage * 1000),
+            sensor_measurements.device_battery_level,
+            sensor_measurements.illuminance,
+            sensor_measurements.ambient_light,
+            sensor_measurements.measurement_periods)
+
+    def deserialize(self, payload):
+        values = STRUCT_FORMAT.unpack(payload)
+        if values[0] != STRUCT_SCHEMA_ID:
+            raise Exception("Unknown schema id: {0}".format(values[0]))
+        return {
+            "serial_num": values[1],
+            "timestamp": datetime.fromtimestamp(values[2] / 1000.0).isoformat(),
+            "temperature": values[3] / 100.0,
+            "humidity": values[4] / 2.0,
+            "pressure": values[5] / 50.0,
+            "radon_short_term_avg": self.__decode_radon(values[6]),
+            "radon_long_term_avg": self.__decode_radon(values[7]),
+            "co2_level": values[8] * 1.0,
+            "voc_level": values[9] * 1.0,
+            "sensor_version": values[10],
+            "voltage": values[11] / 1000.0,
+            "battery_level": values[12],
+            "illuminance": values[13],
+            "ambient_light": values[14],
+            "measurement_periods": values[15]
+        }
+
+
+SERIALIZERS = {serializer.name: serializer for serializer in (JsonSerializer(),
+                                                               JsonLinesSerializer(),
+                                                               CompactJsonSerializer(),
+                                                               MessagePackSerializer(),
+                                                               StructSerializer())}
+
+
+def get_serializer(name):
+    serializer = SERIALIZERS.get(name if name is not None else JsonSerializer.name)
+    if serializer is None:
+        raise Exception("Unknown message format: {0}. Use one of: {1}".format(name, ", ".join(SERIALIZERS)))
+    return serializer
+
+
+class BatchJsonSerializer:
+    name = "batch_json"
+
+    def serialize(self, sensor_measurements_list):
+        return json.dumps(batch_to_dict(sensor_measurements_list), separators=(',', ':')).encode('utf-8')
+
+
+class BatchMessagePackSerializer:
+    name = "batch_msgpack"
+
+    def serialize(self, sensor_measurements_list):
+        return msgpack.packb(batch_to_dict(sensor_measurements_list))
+
+
+# Batched messages are always columnar, message formats map to the encoding of the batch
+BATCH_SERIALIZERS = {"json": BatchJsonSerializer(),
+                     "json_lines": BatchJsonSerializer(),
+                     "compact_json": BatchJsonSerializer(),
+                     "msgpack": BatchMessagePackSerializer()}
+
+
+def get_batch_serializer(name):
+    serializer = BATCH_SERIALIZERS.get(name if name is not None else JsonSerializer.name)
+    if serializer is None:
+        raise Exception("Message format {0} does not support batching. Use one of: {1}".format(
+            name, ", ".join(BATCH_SERIALIZERS)))
+    return serializer
+
+
+class RollupJsonSerializer:
+    name = "json"
+
+    def serialize(self, rollup):
+        return json.dumps(rollup_to_dict(rollup), separators=(',', ':')).encode('utf-8')
+
+
+class RollupMessagePackSerializer:
+    name = "msgpack"
+
+    def serialize(self, rollup):
+        return msgpack.packb(rollup_to_dict(rollup))
+
+
+ROLLUP_SERIALIZERS = {serializer.name: serializer for serializer in (RollupJsonSerializer(),
+                                                                      RollupMessagePackSerializer())}
+
+
+def get_rollup_serializer(name):
+    serializer = ROLLUP_SERIALIZERS.get(name if name is not None else RollupJsonSerializer.name)
+    if serializer is None:
+        raise Exception("Unknown rollup message format: {0}. Use one of: {1}".format(
+            name, ", ".join(ROLLUP_SERIALIZERS)))
+    return serializer
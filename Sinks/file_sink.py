@@ -0,0 +1,92 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import os
+import struct
+
+from Sinks.sink import BlockingSink
+
+FRAMINGS = ("newline", "length_prefix")
+# Formats whose payloads can contain newlines in any byte
+BINARY_FORMATS = ("msgpack", "struct")
+
+
+class FileSink(BlockingSink):
+    # Payloads are appended to the file at path, a {topic} placeholder in the path is replaced with the topic
+    def __init__(self, name, path, framing="newline", fsync=False):
+        super().__init__(name)
+        if framing not in FRAMINGS:
+            raise Exception("Unsupported file sink framing: {0}".format(framing))
+        self.class_name = "FileSink"
+        self.path = path
+        # newline suits text formats, length_prefix (4 byte big-endian length) is needed for binary formats
+        self.framing = framing
+        # Indented JSON spans several lines, every newline-framed message has to be a single line
+        self.message_formats = {"json": "json_lines"} if framing == "newline" else {}
+        self.fsync = fsync
+        self.files = {}
+
+    @classmethod
+    def from_config(cls, name, options):
+        framing = options.get('framing') or "newline"
+        if framing == "newline" and options.get('format') in BINARY_FORMATS:
+            raise Exception("Message format {0} needs length_prefix framing of file sink {1}".format(
+                options.get('format'), name))
+        return cls(name,
+                   options.get('path') or "./published/{topic}.log",
+                   framing=framing,
+                   fsync=bool(options.get('fsync')))
+
+    def __get_file(self, topic):
+        log = logging.getLogger(self.class_name + ".__get_file")
+        path = self.path.format(topic=topic)
+        if path not in self.files:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self.files[path] = open(path, "ab")
+            log.info("Appending {0} messages to {1}".format(self.name, path))
+        return self.files[path]
+
+    def __write(self, payloads, topic):
+        file = self.__get_file(topic)
+        for payload in payloads:
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+            if self.framing == "length_prefix":
+                file.write(struct.pack(">I", len(payload)) + payload)
+            else:
+                file.write(payload + b"\n")
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    async def publish(self, payload, topic):
+        await self.run_blocking(self.__write, [payload], topic)
+
+    async def publish_batch(self, payloads, topic):
+        await self.run_blocking(self.__write, payloads, topic)
+
+    def __close_files(self):
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+    async def close(self):
+        await self.run_blocking(self.__close_files)
+        await super().close()
@@ -0,0 +1,57 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import urllib.request
+
+from Sinks.sink import BlockingSink
+from Tracing.tracer import start_span
+
+
+class HttpSink(BlockingSink):
+    # Payloads are POSTed to the url, a {topic} placeholder in the url is replaced with the topic
+    def __init__(self, name, url, headers=None, content_type="application/octet-stream", timeout=10,
+                 max_concurrent_requests=4):
+        super().__init__(name, max_workers=max_concurrent_requests)
+        self.class_name = "HttpSink"
+        self.url = url
+        self.headers = dict(headers or {})
+        self.headers.setdefault("Content-Type", content_type)
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, name, options):
+        return cls(name,
+                   options.get('url') or "http://localhost:8080/{topic}",
+                   headers=options.get('headers'),
+                   content_type=options.get('content_type') or "application/octet-stream",
+                   timeout=options.get('publish_timeout') or 10,
+                   max_concurrent_requests=options.get('max_concurrent_requests') or 4)
+
+    def __post(self, payload, topic):
+        log = logging.getLogger(self.class_name + ".__post")
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        url = self.url.format(topic=topic)
+        request = urllib.request.Request(url, data=payload, headers=self.headers, method="POST")
+        with start_span("http.post", {"url": url}):
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        log.debug("Message posted to {0}".format(url))
+
+    async def publish(self, payload, topic):
+        await self.run_blocking(self.__post, payload, topic)
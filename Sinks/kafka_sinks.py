@@ -0,0 +1,138 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+
+from Kafka.kafka_publisher import KafkaPublisher
+from Sinks.sink import Sink, BlockingSink
+from Tracing.tracer import start_span
+
+try:
+    import aiokafka
+    import aiokafka.helpers
+except ImportError:
+    aiokafka = None
+
+
+class KafkaSink(BlockingSink):
+    # kafka-python3 producer: payloads are handed over to the producer, which sends them in the background
+    def __init__(self, name, kafka_publisher):
+        super().__init__(name)
+        self.kafka_publisher = kafka_publisher
+
+    @classmethod
+    def from_config(cls, name, options):
+        return cls(name, KafkaPublisher(options.get('bootstrap_servers'),
+                                        options.get('security_protocol'),
+                                        options.get('sasl_mechanism'),
+                                        options.get('ssl_ca_cert_file'),
+                                        options.get('sasl_username'),
+                                        options.get('sasl_password'),
+                                        linger_ms=options.get('linger_ms') or 0,
+                                        batch_size=options.get('batch_size') or 16384,
+                                        compression_type=options.get('compression_type')))
+
+    @staticmethod
+    def __resolve_delivery(delivery, exception):
+        if delivery.done():
+            return
+        if exception is None:
+            delivery.set_result(True)
+        else:
+            delivery.set_exception(exception)
+
+    async def publish(self, payload, topic):
+        loop = asyncio.get_running_loop()
+        delivery = loop.create_future()
+        record_future = await self.run_blocking(self.kafka_publisher.publish, topic, payload)
+        # send() only queues the message, it is delivered (and can leave the spool) once the broker acknowledged it
+        record_future.add_callback(lambda record_metadata: loop.call_soon_threadsafe(
+            self.__resolve_delivery, delivery, None))
+        record_future.add_errback(lambda exception: loop.call_soon_threadsafe(
+            self.__resolve_delivery, delivery, exception))
+        await delivery
+
+    async def flush(self):
+        await self.run_blocking(self.kafka_publisher.flush)
+
+    async def close(self):
+        await self.run_blocking(self.kafka_publisher.close)
+        await super().close()
+
+
+class AioKafkaSink(Sink):
+    # aiokafka producer: sends run on the event loop and complete once acknowledged by the broker
+    def __init__(self, name, bootstrap_servers, security_protocol=None, sasl_mechanism=None, ssl_ca_cert_file=None,
+                 sasl_username=None, sasl_password=None, linger_ms=0, batch_size=16384, compression_type=None):
+        super().__init__(name)
+        if aiokafka is None:
+            raise Exception("Kafka sink type aiokafka is not installed (pip install aiokafka)")
+        self.class_name = "AioKafkaSink"
+        self.producer_options = {
+            "bootstrap_servers": bootstrap_servers,
+            "security_protocol": security_protocol or "PLAINTEXT",
+            "sasl_mechanism": sasl_mechanism or "PLAIN",
+            "sasl_plain_username": sasl_username,
+            "sasl_plain_password": sasl_password,
+            "linger_ms": linger_ms,
+            "max_batch_size": batch_size,
+            "compression_type": compression_type
+        }
+        if ssl_ca_cert_file is not None:
+            self.producer_options["ssl_context"] = aiokafka.helpers.create_ssl_context(cafile=ssl_ca_cert_file)
+        self.producer = None
+
+    @classmethod
+    def from_config(cls, name, options):
+        return cls(name,
+                   options.get('bootstrap_servers'),
+                   options.get('security_protocol'),
+                   options.get('sasl_mechanism'),
+                   options.get('ssl_ca_cert_file'),
+                   options.get('sasl_username'),
+                   options.get('sasl_password'),
+                   linger_ms=options.get('linger_ms') or 0,
+                   batch_size=options.get('batch_size') or 16384,
+                   compression_type=options.get('compression_type'))
+
+    async def start(self):
+        log = logging.getLogger(self.class_name + ".start")
+        self.producer = aiokafka.AIOKafkaProducer(**self.producer_options)
+        await self.producer.start()
+        log.info("Kafka producer {0} has been started".format(self.name))
+
+    async def publish(self, payload, topic):
+        with start_span("kafka.send", {"topic": topic}):
+            await self.producer.send_and_wait(topic, payload)
+
+    async def publish_batch(self, payloads, topic):
+        with start_span("kafka.send", {"topic": topic, "messages": len(payloads)}):
+            # All messages are queued before waiting, so they share producer batches
+            deliveries = [await self.producer.send(topic, payload) for payload in payloads]
+            await asyncio.gather(*deliveries)
+
+    async def flush(self):
+        await self.producer.flush()
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.producer is None:
+            return
+        await self.producer.stop()
+        self.producer = None
+        log.info("Kafka producer {0} has been closed".format(self.name))
@@ -0,0 +1,152 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+import ssl
+
+from MQTT.mqtt_publisher import MqttPublisher
+from Sinks.sink import Sink
+from Tracing.tracer import start_span
+
+try:
+    import asyncio_mqtt
+except ImportError:
+    asyncio_mqtt = None
+
+
+class MqttSink(Sink):
+    # paho-mqtt client: the network loop runs in a background thread, publishing completes on acknowledgement
+    rollup_topic_format = "{0}/rollups"
+
+    def __init__(self, name, mqtt_publisher, qos=0, retain_msg=False):
+        super().__init__(name)
+        self.mqtt_publisher = mqtt_publisher
+        self.qos = qos
+        self.retain_msg = retain_msg
+
+    @classmethod
+    def from_config(cls, name, options):
+        return cls(name,
+                   MqttPublisher(broker_hostname=options.get('hostname'),
+                                 port=options.get('port') or 1883,
+                                 connection_type=options.get('connection_type') or 'MQTT',
+                                 username=options.get('username'),
+                                 password=options.get('password'),
+                                 tls_config=options.get('tls'),
+                                 max_inflight_messages=options.get('max_inflight_messages') or 20),
+                   qos=options.get('qos') or 0,
+                   retain_msg=options.get('retain_msg') or False)
+
+    async def publish(self, payload, topic):
+        await self.mqtt_publisher.publish_and_wait(topic, payload, self.qos, self.retain_msg)
+
+    async def close(self):
+        self.mqtt_publisher.close()
+
+
+class AsyncioMqttSink(Sink):
+    # asyncio-mqtt client: no network loop thread, publishing runs on the event loop
+    rollup_topic_format = "{0}/rollups"
+
+    def __init__(self, name, hostname, port=1883, connection_type='MQTT', username=None, password=None,
+                 tls_config=None, max_inflight_messages=20, qos=0, retain_msg=False):
+        super().__init__(name)
+        if asyncio_mqtt is None:
+            raise Exception("MQTT sink type asyncio_mqtt is not installed (pip install asyncio-mqtt)")
+        self.class_name = "AsyncioMqttSink"
+        self.hostname = hostname
+        self.port = port
+        self.connection_type = connection_type
+        self.username = username
+        self.password = password
+        self.tls_config = tls_config
+        self.max_inflight_messages = max_inflight_messages
+        self.qos = qos
+        self.retain_msg = retain_msg
+        self.client = None
+        self.connect_lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, name, options):
+        return cls(name,
+                   options.get('hostname'),
+                   port=options.get('port') or 1883,
+                   connection_type=options.get('connection_type') or 'MQTT',
+                   username=options.get('username'),
+                   password=options.get('password'),
+                   tls_config=options.get('tls'),
+                   max_inflight_messages=options.get('max_inflight_messages') or 20,
+                   qos=options.get('qos') or 0,
+                   retain_msg=options.get('retain_msg') or False)
+
+    def __create_tls_context(self):
+        if self.connection_type != 'TLS' or self.tls_config is None:
+            return None
+        tls_context = ssl.create_default_context(cafile=self.tls_config.get('ca_certs'))
+        if self.tls_config.get('certfile') is not None:
+            tls_context.load_cert_chain(self.tls_config.get('certfile'), self.tls_config.get('keyfile'),
+                                        self.tls_config.get('keyfile_password'))
+        if self.tls_config.get('cert_reqs') is not None:
+            tls_context.verify_mode = self.tls_config.get('cert_reqs')
+        if self.tls_config.get('ciphers') is not None:
+            tls_context.set_ciphers(self.tls_config.get('ciphers'))
+        return tls_context
+
+    async def __get_client(self):
+        log = logging.getLogger(self.class_name + ".__get_client")
+        async with self.connect_lock:
+            if self.client is None:
+                client = asyncio_mqtt.Client(self.hostname,
+                                             port=self.port,
+                                             username=self.username,
+                                             password=self.password,
+                                             tls_context=self.__create_tls_context(),
+                                             # Bounds publishes waiting for their acknowledgement, like the
+                                             # in-flight window of paho
+                                             max_concurrent_outgoing_calls=self.max_inflight_messages)
+                await client.connect()
+                self.client = client
+                log.info("Connected to MQTT Broker {0}".format(self.hostname))
+            return self.client
+
+    async def start(self):
+        await self.__get_client()
+
+    async def publish(self, payload, topic):
+        log = logging.getLogger(self.class_name + ".publish")
+        client = await self.__get_client()
+        with start_span("mqtt.publish", {"topic": topic, "qos": self.qos}):
+            try:
+                await client.publish(topic, payload, qos=self.qos, retain=self.retain_msg)
+            except asyncio_mqtt.MqttError:
+                # Connection is re-established by the next publish, the failed one is spooled or dropped
+                if self.client is client:
+                    self.client = None
+                    log.warning("Disconnected from MQTT Broker {0}, reconnecting...".format(self.hostname))
+                raise
+
+    async def close(self):
+        log = logging.getLogger(self.class_name + ".close")
+        if self.client is None:
+            return
+        try:
+            await self.client.disconnect()
+        except asyncio_mqtt.MqttError as e:
+            log.warning("Error during disconnecting from MQTT Broker {0}: {1}".format(self.hostname, str(e)))
+        self.client = None
+        log.info("Client disconnected")
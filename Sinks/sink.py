@@ -0,0 +1,63 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Sink:
+    # Publisher backend. Payloads are serialized by the publisher fanout, topics are set per fanout sink
+    rollup_topic_format = "{0}-rollups"
+    # Message formats replaced by another format for payloads published through this sink
+    message_formats = {}
+
+    def __init__(self, name):
+        self.name = name
+
+    async def start(self):
+        pass
+
+    async def publish(self, payload, topic):
+        # Returns once the payload is handed over (or acknowledged, depending on the backend), raises on failure
+        raise NotImplementedError
+
+    async def publish_batch(self, payloads, topic):
+        # Sends of a batch overlap, the batch fails if any of its payloads fails
+        await asyncio.gather(*[self.publish(payload, topic) for payload in payloads])
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class BlockingSink(Sink):
+    # Base of sinks with blocking clients, each sink gets its own worker threads so a slow sink cannot starve others
+    def __init__(self, name, max_workers=1):
+        super().__init__(name)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run_blocking(self, function, *args):
+        # Executor threads do not inherit the context, copy it so spans keep their parent
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(
+            contextvars.copy_context().run, function, *args))
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,48 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from Sinks.file_sink import FileSink
+from Sinks.http_sink import HttpSink
+from Sinks.kafka_sinks import KafkaSink, AioKafkaSink
+from Sinks.mqtt_sinks import MqttSink, AsyncioMqttSink
+
+SINK_TYPES = {
+    "kafka": KafkaSink,
+    "aiokafka": AioKafkaSink,
+    "mqtt": MqttSink,
+    "asyncio_mqtt": AsyncioMqttSink,
+    "http": HttpSink,
+    "file": FileSink
+}
+
+# Sinks of the default sections keep the names of earlier versions, which label their metrics and spooled messages
+SINK_NAMES = {
+    "kafka": "Kafka",
+    "mqtt": "MQTT"
+}
+
+
+def get_sink_name(section_name):
+    return SINK_NAMES.get(section_name, section_name)
+
+
+def create_sink(section_name, options):
+    # The sink type defaults to the name of the publishers section, e.g. publishers.kafka
+    sink_type = options.get('type') or section_name
+    if sink_type not in SINK_TYPES:
+        raise Exception("Unsupported sink type: {0}".format(sink_type))
+    return SINK_TYPES[sink_type].from_config(get_sink_name(section_name), options)
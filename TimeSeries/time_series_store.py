@@ -0,0 +1,122 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import time
+
+import numpy
+
+METRICS = ('temperature', 'humidity', 'pressure', 'radon_short_term_avg', 'radon_long_term_avg', 'co2_level',
+           'voc_level')
+
+# Default windows used for rolling aggregates: 1 hour, 24 hours and 7 days
+DEFAULT_WINDOWS = (3600, 86400, 604800)
+
+
+class RingBuffer:
+    __slots__ = ('capacity', 'timestamps', 'values', 'start', 'count')
+
+    def __init__(self, capacity, metric_count):
+        self.capacity = capacity
+        # Fixed-size arrays: 8 bytes per timestamp and 4 bytes per metric value and sample
+        self.timestamps = numpy.zeros(capacity, dtype=numpy.float64)
+        self.values = numpy.full((metric_count, capacity), numpy.nan, dtype=numpy.float32)
+        self.start = 0
+        self.count = 0
+
+    def append(self, timestamp, values):
+        if self.count < self.capacity:
+            position = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            # Buffer is full: overwrite the oldest sample
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[position] = timestamp
+        self.values[:, position] = values
+
+    def __segments(self):
+        # Samples in insertion order, the second segment holds the samples wrapped around the end of the arrays
+        end = self.start + self.count
+        if end <= self.capacity:
+            return [slice(self.start, end)]
+        return [slice(self.start, self.capacity), slice(0, end - self.capacity)]
+
+    def window(self, metric_index, since):
+        # Timestamps are expected to be increasing, so each segment is sorted and searched with a binary search
+        window_values = numpy.concatenate(
+            [self.values[metric_index, segment.start + int(numpy.searchsorted(self.timestamps[segment], since)):
+                         segment.stop]
+             for segment in self.__segments()], dtype=numpy.float64)
+        return window_values[~numpy.isnan(window_values)]
+
+    def memory_size(self):
+        return self.timestamps.nbytes + self.values.nbytes
+
+
+class TimeSeriesStore:
+    def __init__(self, capacity=2016, max_devices=500):
+        self.class_name = "TimeSeriesStore"
+        self.capacity = capacity
+        self.max_devices = max_devices
+        self.buffers = {}
+
+    def add(self, sensor_measurements):
+        log = logging.getLogger(self.class_name + ".add")
+        serial_number = sensor_measurements.device_serial_number
+        buffer = self.buffers.get(serial_number)
+        if buffer is None:
+            if len(self.buffers) >= self.max_devices:
+                log.warning("Maximum number of devices ({0}) reached, ignoring device {1}".format(
+                    self.max_devices, serial_number))
+                return
+            buffer = RingBuffer(self.capacity, len(METRICS))
+            self.buffers[serial_number] = buffer
+
+        values = []
+        for metric in METRICS:
+            value = getattr(sensor_measurements, metric)
+            # Radon is "N/A" while the first measurements are not available yet
+            values.append(float('nan') if value == "N/A" else value)
+        buffer.append(sensor_measurements.timestamp.timestamp(), values)
+
+    def aggregate(self, serial_number, metric, window, percentiles=(50, 95), now=None):
+        buffer = self.buffers.get(serial_number)
+        if buffer is None:
+            return None
+        since = (now if now is not None else time.time()) - window
+        values = buffer.window(METRICS.index(metric), since)
+        if values.size == 0:
+            return None
+
+        result = {
+            "count": int(values.size),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean())
+        }
+        if percentiles:
+            # Linear interpolation between the closest ranks
+            for percent, value in zip(percentiles, numpy.percentile(values, percentiles)):
+                result["p{0}".format(percent)] = float(value)
+        return result
+
+    def get_serial_numbers(self):
+        return list(self.buffers)
+
+    def memory_size(self):
+        return sum(buffer.memory_size() for buffer in self.buffers.values())
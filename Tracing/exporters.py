@@ -0,0 +1,113 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import logging
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from Tracing.tracer import STATUS_ERROR
+
+SERVICE_NAME = "airthings-wave-plus-reader"
+
+# OTLP span kind: internal
+SPAN_KIND_INTERNAL = 1
+
+
+def to_otlp_attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_span(span):
+    otlp_span = {
+        "traceId": "{0:032x}".format(span.trace_id),
+        "spanId": "{0:016x}".format(span.span_id),
+        "name": span.name,
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": [{"key": key, "value": to_otlp_attribute_value(value)}
+                       for key, value in span.attributes.items()],
+        "status": {"code": span.status}
+    }
+    if span.parent_span_id is not None:
+        otlp_span["parentSpanId"] = "{0:016x}".format(span.parent_span_id)
+    if span.status == STATUS_ERROR:
+        otlp_span["status"]["message"] = span.status_message
+    return otlp_span
+
+
+def to_otlp_traces(spans):
+    # OTLP/JSON encoding of an ExportTraceServiceRequest
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": [to_otlp_span(span) for span in spans]
+            }]
+        }]
+    }
+
+
+class OtlpJsonFileExporter:
+    def __init__(self, filename):
+        self.filename = filename
+
+    def export(self, spans):
+        # One ExportTraceServiceRequest per line, as written by the OpenTelemetry collector file exporter
+        with open(self.filename, "a") as traces_file:
+            traces_file.write(json.dumps(to_otlp_traces(spans), separators=(',', ':')) + "\n")
+
+    def close(self):
+        pass
+
+
+class OtlpHttpExporter:
+    def __init__(self, endpoint="http://localhost:4318/v1/traces", timeout=10):
+        self.class_name = "OtlpHttpExporter"
+        self.endpoint = endpoint
+        self.timeout = timeout
+        # Exports run in the background so a slow collector never blocks the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="OtlpHttpExporter")
+
+    def __post(self, payload):
+        log = logging.getLogger(self.class_name + ".__post")
+        request = urllib.request.Request(self.endpoint, data=payload, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            log.warning("Error during export of spans to {0}: {1}".format(self.endpoint, str(e)))
+
+    def export(self, spans):
+        self.executor.submit(self.__post, json.dumps(to_otlp_traces(spans), separators=(',', ':')).encode('utf-8'))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+EXPORTERS = {
+    "file": OtlpJsonFileExporter,
+    "otlp_http": OtlpHttpExporter
+}
@@ -0,0 +1,81 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import cProfile
+import logging
+import os
+import time
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+PROFILER_ENGINES = ('cProfile', 'yappi')
+
+
+class CycleProfiler:
+    def __init__(self, every_n_cycles=100, directory="./profiles", engine='cProfile'):
+        self.class_name = "CycleProfiler"
+        if engine not in PROFILER_ENGINES:
+            raise Exception("Unknown profiler engine: {0}. Use one of: {1}".format(engine, ", ".join(PROFILER_ENGINES)))
+        if engine == 'yappi' and yappi is None:
+            raise Exception("Profiler engine yappi is not installed (pip install yappi)")
+        self.every_n_cycles = max(1, every_n_cycles)
+        self.directory = directory
+        self.engine = engine
+        self.cycle_count = 0
+        self.active_profile = None
+
+    def __start(self):
+        if self.engine == 'yappi':
+            # Wall clock, so time spent waiting on BLE and brokers shows up as well
+            yappi.set_clock_type("wall")
+            yappi.start()
+            return True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def __stop(self, profile):
+        log = logging.getLogger(self.class_name + ".__stop")
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        filename = os.path.join(self.directory, "cycle-{0}-{1}.prof".format(self.cycle_count,
+                                                                          time.strftime("%Y%m%d-%H%M%S")))
+        if self.engine == 'yappi':
+            yappi.stop()
+            yappi.get_func_stats().save(filename, type="pstat")
+            yappi.clear_stats()
+        else:
+            profile.disable()
+            profile.dump_stats(filename)
+        log.info("Profile of cycle {0} written to {1}".format(self.cycle_count, filename))
+
+    def begin_cycle(self):
+        self.cycle_count += 1
+        # Only one cycle is profiled at a time, concurrent cycles are not sampled
+        if self.cycle_count % self.every_n_cycles != 0 or self.active_profile is not None:
+            return None
+        self.active_profile = self.__start()
+        return self.cycle_count
+
+    def end_cycle(self, cycle):
+        if cycle is None or self.active_profile is None:
+            return
+        profile, self.active_profile = self.active_profile, None
+        self.__stop(profile)
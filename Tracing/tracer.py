@@ -0,0 +1,179 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import contextvars
+import random
+import threading
+import time
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class UnsampledSpan(NoopSpan):
+    __slots__ = ('token',)
+
+    def __init__(self):
+        self.token = None
+
+    def __enter__(self):
+        # Children of an unsampled root are not recorded either
+        self.token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        current_span.reset(self.token)
+        return False
+
+
+class Span:
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_span_id', 'name', 'attributes', 'start_time',
+                 'end_time', 'status', 'status_message', 'token')
+
+    def __init__(self, tracer, trace_id, parent_span_id, name, attributes):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.attributes = attributes if attributes is not None else {}
+        self.start_time = None
+        self.end_time = None
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time = time.time_ns()
+        self.token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_time = time.time_ns()
+        current_span.reset(self.token)
+        if exc_type is not None:
+            self.status = STATUS_ERROR
+            self.status_message = "{0}: {1}".format(exc_type.__name__, str(exc_value))
+        self.tracer.on_end(self)
+        return False
+
+
+class FinishedSpan:
+    # Picklable copy of an ended span, e.g. handed over from a gateway collector to the publisher process
+    __slots__ = ('trace_id', 'span_id', 'parent_span_id', 'name', 'attributes', 'start_time', 'end_time', 'status',
+                 'status_message')
+
+    def __init__(self, span):
+        for name in self.__slots__:
+            setattr(self, name, getattr(span, name))
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class NoopTracer:
+    def start_span(self, name, attributes=None):
+        return NOOP_SPAN
+
+    def on_end(self, span):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate=1.0, max_queue_size=10000):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.max_queue_size = max_queue_size
+        self.finished_spans = []
+        self.dropped_count = 0
+        # Blocking publishers end their spans in executor threads
+        self.lock = threading.Lock()
+
+    def start_span(self, name, attributes=None):
+        parent = current_span.get()
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                return UnsampledSpan()
+            return Span(self, random.getrandbits(128), None, name, attributes)
+        if isinstance(parent, NoopSpan):
+            return NOOP_SPAN
+        return Span(self, parent.trace_id, parent.span_id, name, attributes)
+
+    def on_end(self, span):
+        with self.lock:
+            if len(self.finished_spans) < self.max_queue_size:
+                self.finished_spans.append(span)
+            else:
+                self.dropped_count += 1
+
+    def flush(self):
+        with self.lock:
+            spans, self.finished_spans = self.finished_spans, []
+        if spans:
+            self.exporter.export(spans)
+
+    def close(self):
+        self.flush()
+        self.exporter.close()
+
+
+tracer = NoopTracer()
+
+
+def set_tracer(new_tracer):
+    global tracer
+    tracer = new_tracer
+
+
+def get_tracer():
+    return tracer
+
+
+def start_span(name, attributes=None):
+    return tracer.start_span(name, attributes)
@@ -15,75 +15,516 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import asyncio
+import dataclasses
+import functools
 import os.path
-import time
 
 import logging
 from logging.handlers import TimedRotatingFileHandler
 
-from AirthingsWavePlus.airthings_wave_plus import AirthingsWavePlus
+from AirthingsWavePlus.fleet_poller import FleetPoller
+from Config.config_watcher import ConfigWatcher
 from Config.yaml_config import Config
-from Kafka.kafka_publisher import KafkaPublisher
-from MQTT.mqtt_publisher import MqttPublisher
+from Gateway.gateway import Gateway, assign_devices
+from History.history_store import HistoryStore
+from Metrics.metrics_server import MetricsServer
+from Pipeline.deadband_filter import DeadbandFilter
+from Pipeline.measurement_pipeline import MeasurementPipeline
+from Pipeline.measurement_spool import MeasurementSpool
+from Pipeline.publisher_fanout import PublisherFanout
+from Pipeline.window_aggregator import WindowAggregator
+from Scheduler.deadline_scheduler import DeadlineScheduler
+from Serialization.serializers import get_serializer, get_batch_serializer, get_rollup_serializer, \
+    StructSerializer
+from Sinks.sink_factory import create_sink, get_sink_name
+from TimeSeries.time_series_store import TimeSeriesStore
+from Tracing.exporters import EXPORTERS
+from Tracing.profiler import CycleProfiler
+from Tracing.tracer import Tracer, set_tracer, get_tracer, start_span
 
-start_time = time.time()
+cycle_profiler = None
 
+# Options applied to the running application when the configuration file changes (None: the whole section), changes
+# of all other options are applied after a restart
+RELOADABLE_OPTIONS = {
+    'airthings_wave_plus': ('devices', 'serial_number'),
+    'scheduler': ('delay',),
+    'publishers': None
+}
 
-async def __read_and_process_sensor_data(config):
-    log.debug("Airthings Wave Plus Bluetooth MAC Address: {0}".format(config.getAirthingsWavePlusBluetoothMACAddress()))
-    log.debug("Airthings Wave Plus Serial Number: {0}".format(config.getAirthingsWavePlusSerialNumber()))
 
+async def __read_and_process_device_data(fleet_poller, measurement_pipeline, index, scheduler=None, job_name=None):
+    profiled_cycle = cycle_profiler.begin_cycle() if cycle_profiler is not None else None
     try:
-        airthings_wave_sensor = AirthingsWavePlus(
-            config.getAirthingsWavePlusBluetoothMACAddress(),
-            config.getAirthingsWavePlusSerialNumber())
-        sensor_measurement = await airthings_wave_sensor.read_sensor_data()
-    except Exception as e:
-        log.error("Error during retrieval of sensor data: {0}".format(str(e)))
-        return
-
-    log.info("Publish to Kafka: {}".format(config.getPublishToKafka()))
-    if config.getPublishToKafka():
-        try:
-            kafka_publisher = KafkaPublisher(
-                config.getKafkaBootstrapServers(),
-                config.getKafkaSecurityProtocol(),
-                config.getKafkaSASLMechanism(),
-                config.getKafkaSSLCAFile(),
-                config.getKafkaSASLUsername(),
-                config.getKafkaSASLPassword())
-            kafka_publisher.publish(config.getKafkaTopic(), sensor_measurement.to_json())
-        except Exception as e:
-            log.error("Error during publishing to Kafka: {0}".format(str(e)))
+        with start_span("poll_device", {"device": fleet_poller.readers[index].get_device_identifier()}):
+            sensor_measurement = await fleet_poller.poll_device(index)
+            if sensor_measurement is not None:
+                await measurement_pipeline.process(sensor_measurement)
+    finally:
+        if profiled_cycle is not None:
+            cycle_profiler.end_cycle(profiled_cycle)
+        # Adaptive polling: next read is scheduled just after the expected refresh of the device
+        if scheduler is not None:
+            scheduler.reschedule(job_name, fleet_poller.get_next_poll_delay(index))
+
+
+async def __log_scheduler_metrics(scheduler, fleet_poller, measurement_pipeline):
+    for name, metrics in scheduler.get_metrics().items():
+        log.info("Scheduler job {0}: {1}".format(name, metrics))
+    for device, metrics in fleet_poller.get_refresh_metrics().items():
+        log.info("Device {0} refresh tracking: {1}".format(device, metrics))
+    for adapter, health in fleet_poller.get_adapter_health().items():
+        log.info("Adapter {0}: {1}".format(adapter, health))
+    if measurement_pipeline.measurement_filter is not None:
+        log.info("Measurement filter: {0}".format(measurement_pipeline.measurement_filter.get_metrics()))
+    if measurement_pipeline.window_aggregator is not None:
+        log.info("Window aggregator: {0}".format(measurement_pipeline.window_aggregator.get_metrics()))
+
+
+def __validate_config(config):
+    # Checks across sections, done for the whole configuration before any part of it is applied (also on reload)
+    publishers = [publisher for publisher in config.getPublishers().values() if publisher.enabled]
+    for publisher in publishers:
+        if publisher.message_batch.enabled:
+            get_batch_serializer(publisher.format)
+        else:
+            get_serializer(publisher.format)
+    if config.getFilterEnabled() and config.getFilterDeltaOnly() and \
+            StructSerializer.name in [publisher.format for publisher in publishers]:
+        raise Exception("Delta-only publishing is not supported by the {0} message format".format(
+            StructSerializer.name))
+    if config.getAggregationEnabled():
+        get_rollup_serializer(config.getAggregationMessageFormat())
+    if config.getTracingEnabled() and config.getTracingExporter() not in EXPORTERS:
+        raise Exception("Unknown tracing exporter: {0}. Use one of: {1}".format(config.getTracingExporter(),
+                                                                               ", ".join(EXPORTERS)))
+
+
+def __create_sinks(config):
+    sinks = {}
+    for name, publisher in config.getPublishers().items():
+        log.info("Publish to {0}: {1}".format(name, publisher.enabled))
+        if publisher.enabled:
+            sinks[name] = create_sink(name, publisher.options)
+    return sinks
+
+
+async def __start_sinks(sinks):
+    for sink in sinks.values():
+        await sink.start()
 
-    log.info("Publish to MQTT: {0}".format(config.getPublishToMQTT()))
-    if config.getPublishToMQTT():
+
+async def __close_sinks(sinks):
+    for name, sink in sinks.items():
         try:
-            mqtt_publisher = MqttPublisher(
-                broker_hostname=config.getMQTTHostname(),
-                port=config.getMQTTPort(),
-                connection_type=config.getMQTTConnectionType(),
-                username=config.getMQTTUsername(),
-                password=config.getMQTTPassword(),
-                tls_config=config.getMQTTConfigTLS()
-            )
-            mqtt_publisher.publish(config.getMQTTPublishTopic(),
-                                   sensor_measurement.to_json(),
-                                   config.getMQTTPublishQOS(),
-                                   config.getMQTTPublishRetainMsg())
+            await sink.close()
         except Exception as e:
-            log.error("Error during publishing to Kafka: {0}".format(str(e)))
+            log.error("Error during closing of {0} sink: {1}".format(name, str(e)))
+
+
+def __create_publisher_fanout(config, sinks):
+    spool = None
+    log.info("Spool measurements: {0}".format(config.getSpoolEnabled()))
+    if config.getSpoolEnabled():
+        spool = MeasurementSpool(config.getSpoolFile(),
+                                 max_entries=config.getSpoolMaxEntries(),
+                                 synchronous=config.getSpoolSynchronous())
+    publisher_fanout = PublisherFanout(spool,
+                                       replay_batch_size=config.getSpoolReplayBatchSize(),
+                                       replay_interval=config.getSpoolReplayInterval())
+
+    for name, sink in sinks.items():
+        __add_publisher_sink(config, publisher_fanout, name, sink)
+
+    return publisher_fanout
+
+
+def __add_publisher_sink(config, publisher_fanout, name, sink):
+    publisher = config.getPublishers()[name]
+    batched = publisher.message_batch.enabled
+    log.info("Batch {0} messages: {1}".format(sink.name, batched))
+    message_format = sink.message_formats.get(publisher.format, publisher.format)
+    publisher_fanout.add_sink(
+        sink.name,
+        sink,
+        get_batch_serializer(message_format) if batched else get_serializer(message_format),
+        publisher.topic,
+        timeout=publisher.publish_timeout,
+        batch_max_bytes=publisher.message_batch.max_bytes,
+        batch_max_wait=publisher.message_batch.max_wait if batched else None)
+
+
+def __add_rollup_sink(config, rollup_fanout, name, sink):
+    publisher = config.getPublishers()[name]
+    rollup_fanout.add_sink(
+        "{0} rollups".format(sink.name),
+        sink,
+        get_rollup_serializer(config.getAggregationMessageFormat()),
+        publisher.rollup_topic or sink.rollup_topic_format.format(publisher.topic),
+        timeout=publisher.publish_timeout)
+
+
+def __create_time_series_store(config):
+    log.info("Time series store: {0}".format(config.getTimeSeriesStoreEnabled()))
+    if not config.getTimeSeriesStoreEnabled():
+        return None
+    return TimeSeriesStore(capacity=config.getTimeSeriesStoreCapacity(),
+                           max_devices=config.getTimeSeriesStoreMaxDevices())
+
+
+def __create_history_store(config):
+    log.info("History store: {0}".format(config.getHistoryEnabled()))
+    if not config.getHistoryEnabled():
+        return None
+    return HistoryStore(config.getHistoryFile(),
+                        batch_size=config.getHistoryBatchSize(),
+                        flush_interval=config.getHistoryFlushInterval(),
+                        synchronous=config.getHistorySynchronous(),
+                        retention=config.getHistoryRetention())
+
+
+def __create_measurement_filter(config):
+    log.info("Filter measurements: {0}".format(config.getFilterEnabled()))
+    if not config.getFilterEnabled():
+        return None
+    return DeadbandFilter(config.getFilterDeadbands(),
+                          heartbeat_interval=config.getFilterHeartbeatInterval(),
+                          delta_only=config.getFilterDeltaOnly())
+
+
+def __create_window_aggregator(config, sinks):
+    log.info("Aggregation: {0}".format(config.getAggregationEnabled()))
+    if not config.getAggregationEnabled():
+        return None
+    # Rollups are published to their own topics through the same sinks
+    rollup_fanout = PublisherFanout()
+    for name, sink in sinks.items():
+        __add_rollup_sink(config, rollup_fanout, name, sink)
+    return WindowAggregator(rollup_fanout,
+                            windows=config.getAggregationWindows(),
+                            allowed_lateness=config.getAggregationAllowedLateness())
+
+
+def __create_measurement_pipeline(config, sinks):
+    return MeasurementPipeline(__create_publisher_fanout(config, sinks),
+                               __create_time_series_store(config),
+                               __create_history_store(config),
+                               config.getTimeSeriesStoreWindows(),
+                               __create_measurement_filter(config),
+                               __create_window_aggregator(config, sinks),
+                               config.getAggregationPublishMeasurements())
+
+
+def __create_metrics_server(config):
+    log.info("Metrics endpoint: {0}".format(config.getMetricsEnabled()))
+    if not config.getMetricsEnabled():
+        return None
+    return MetricsServer(config.getMetricsHost(), config.getMetricsPort())
+
+
+def __create_tracer(config):
+    log.info("Tracing: {0}".format(config.getTracingEnabled()))
+    if not config.getTracingEnabled():
+        return None
+    exporter_name = config.getTracingExporter()
+    if exporter_name == "otlp_http":
+        exporter = EXPORTERS[exporter_name](config.getTracingEndpoint())
+    else:
+        exporter = EXPORTERS[exporter_name](config.getTracingFile())
+    return Tracer(exporter, sample_rate=config.getTracingSampleRate())
+
+
+async def __export_spans():
+    get_tracer().flush()
+
+
+def __create_scheduler(interval, devices, fleet_poller, measurement_pipeline, adaptive, tracer=None,
+                       tracing_export_interval=5):
+    scheduler = DeadlineScheduler()
+    for position in range(len(devices)):
+        __schedule_device(scheduler, devices, position, interval, fleet_poller, measurement_pipeline, adaptive)
+    scheduler.add_job("scheduler-metrics", interval,
+                      functools.partial(__log_scheduler_metrics, scheduler, fleet_poller, measurement_pipeline),
+                      phase=interval)
+    if measurement_pipeline.window_aggregator is not None:
+        scheduler.add_job("aggregation-close", 60, measurement_pipeline.window_aggregator.close_expired, phase=60)
+    if measurement_pipeline.time_series_store is not None:
+        scheduler.add_job("rolling-aggregates", 60, measurement_pipeline.update_rolling_aggregates, phase=60)
+    if tracer is not None:
+        scheduler.add_job("span-export", tracing_export_interval, __export_spans)
+    return scheduler
 
 
-async def __process_function_periodically(interval, periodic_function, config):
-    while True:
-        time_elapsed = round(time.time() - start_time)
-        counter = int((time_elapsed / interval) + 1)
-        log.info("Execution counter: {0}".format(counter))
-        await asyncio.gather(
-            asyncio.sleep(interval),
-            periodic_function(config),
-        )
+def __schedule_device(scheduler, devices, position, interval, fleet_poller, measurement_pipeline, adaptive):
+    device = devices[position]
+    index = fleet_poller.get_device_index(device)
+    device_interval = device.get('interval') or interval
+    # Spread connections evenly across the polling period unless phase is configured explicitly
+    device_phase = device.get('phase') if device.get('phase') is not None \
+        else position * device_interval / len(devices)
+    job_name = "device-{0}".format(fleet_poller.readers[index].get_device_identifier())
+    scheduler.add_job(job_name,
+                      device_interval,
+                      functools.partial(__read_and_process_device_data, fleet_poller, measurement_pipeline, index,
+                                        scheduler if adaptive else None, job_name),
+                      phase=device_phase)
+
+
+def __without_reloadable_options(settings, section):
+    section_settings = dataclasses.replace(getattr(settings, section),
+                                           **{option: None for option in RELOADABLE_OPTIONS.get(section, ())})
+    if section == 'airthings_wave_plus':
+        # A single device can also be configured by its address
+        section_settings = dataclasses.replace(section_settings,
+                                               bluetooth=dataclasses.replace(section_settings.bluetooth,
+                                                                             mac_address=None))
+    return section_settings
+
+
+def __log_restart_required_changes(old_config, new_config):
+    sections = []
+    for field in dataclasses.fields(new_config.settings):
+        if field.name in RELOADABLE_OPTIONS and RELOADABLE_OPTIONS[field.name] is None:
+            continue
+        if __without_reloadable_options(old_config.settings, field.name) != \
+                __without_reloadable_options(new_config.settings, field.name):
+            sections.append(field.name)
+    if sections:
+        log.warning("Changes of sections {0} are applied after a restart".format(", ".join(sections)))
+
+
+async def __start_changed_sinks(old_config, new_config):
+    # Returns the names of changed publishers sections and the started sinks of the enabled ones. Running sinks are not
+    # touched, a sink failing to start closes the ones started before it.
+    old_publishers = old_config.getPublishers()
+    new_publishers = new_config.getPublishers()
+    changed_names = [name for name in dict.fromkeys(list(old_publishers) + list(new_publishers))
+                     if old_publishers.get(name) != new_publishers.get(name)]
+    started_sinks = {}
+    try:
+        for name in changed_names:
+            if name in new_publishers and new_publishers[name].enabled:
+                started_sinks[name] = create_sink(name, new_publishers[name].options)
+                await started_sinks[name].start()
+    except Exception:
+        await __close_sinks(started_sinks)
+        raise
+    return changed_names, started_sinks
+
+
+async def __replace_sinks(config, changed_names, started_sinks, sinks, measurement_pipeline):
+    publisher_fanout = measurement_pipeline.publisher_fanout
+    rollup_fanout = measurement_pipeline.window_aggregator.publisher_fanout \
+        if measurement_pipeline.window_aggregator is not None else None
+    replaced_sinks = {}
+    for name in changed_names:
+        await publisher_fanout.remove_sink(get_sink_name(name))
+        if rollup_fanout is not None:
+            await rollup_fanout.remove_sink("{0} rollups".format(get_sink_name(name)))
+        if name in sinks:
+            replaced_sinks[name] = sinks.pop(name)
+        if name in started_sinks:
+            sinks[name] = started_sinks[name]
+            __add_publisher_sink(config, publisher_fanout, name, sinks[name])
+            if rollup_fanout is not None:
+                __add_rollup_sink(config, rollup_fanout, name, sinks[name])
+        log.info("Publishers section {0} reloaded (enabled: {1})".format(name, name in started_sinks))
+
+    # Unchanged sinks keep their connections, replaced ones are closed after publishes started on them completed
+    pending_tasks = list(publisher_fanout.pending_tasks)
+    if rollup_fanout is not None:
+        pending_tasks += list(rollup_fanout.pending_tasks)
+    await asyncio.gather(*pending_tasks)
+    await __close_sinks(replaced_sinks)
+
+
+async def __reload_devices(old_config, new_config, scheduler, fleet_poller, measurement_pipeline, adaptive):
+    old_interval = old_config.getSchedulerDelay()
+    interval = new_config.getSchedulerDelay()
+    old_devices = {fleet_poller.get_device_key(device): device for device in old_config.getAirthingsWavePlusDevices()}
+    devices = new_config.getAirthingsWavePlusDevices()
+    device_keys = [fleet_poller.get_device_key(device) for device in devices]
+
+    for device_key, device in old_devices.items():
+        index = fleet_poller.get_device_index(device)
+        # A device is not polled yet when a failed reload is rolled back before the device was added
+        if device_key not in device_keys and index is not None:
+            scheduler.remove_job("device-{0}".format(fleet_poller.readers[index].get_device_identifier()))
+            await fleet_poller.remove_device(index)
+    for position, device in enumerate(devices):
+        old_device = old_devices.get(device_keys[position])
+        # Devices keep their place in the schedule unless their configuration or interval changed
+        if old_device == device and \
+                (old_device.get('interval') or old_interval) == (device.get('interval') or interval):
+            continue
+        fleet_poller.add_device(device)
+        __schedule_device(scheduler, devices, position, interval, fleet_poller, measurement_pipeline, adaptive)
+
+    if interval != old_interval:
+        scheduler.add_job("scheduler-metrics", interval,
+                          functools.partial(__log_scheduler_metrics, scheduler, fleet_poller, measurement_pipeline),
+                          phase=interval)
+    log.info("Configured devices: {0}, interval: {1}s".format(len(devices), interval))
+
+
+async def __apply_config_changes(scheduler, fleet_poller, measurement_pipeline, sinks, adaptive, old_config,
+                                 new_config):
+    # Applied as a whole or not at all: the whole configuration is validated and its sinks are started before anything
+    # running is changed. When reloading the devices fails, they are reloaded back and the running sinks are kept.
+    __validate_config(new_config)
+    __log_restart_required_changes(old_config, new_config)
+    changed_names, started_sinks = await __start_changed_sinks(old_config, new_config)
+    try:
+        await __reload_devices(old_config, new_config, scheduler, fleet_poller, measurement_pipeline, adaptive)
+    except Exception:
+        await __close_sinks(started_sinks)
+        await __reload_devices(new_config, old_config, scheduler, fleet_poller, measurement_pipeline, adaptive)
+        raise
+    await __replace_sinks(new_config, changed_names, started_sinks, sinks, measurement_pipeline)
+
+
+def __add_config_reload_job(scheduler, config, on_change):
+    log.info("Reload configuration: {0}".format(config.getConfigReloadEnabled()))
+    if config.getConfigReloadEnabled():
+        config_reload_interval = config.getConfigReloadInterval()
+        scheduler.add_job("config-reload", config_reload_interval, ConfigWatcher(config, on_change).check,
+                          phase=config_reload_interval)
+
+
+async def __run(interval, devices, config, fleet_poller):
+    sinks = __create_sinks(config)
+    measurement_pipeline = __create_measurement_pipeline(config, sinks)
+    log.info("Adaptive polling: {0}".format(config.getSchedulerAdaptive()))
+    tracer = __create_tracer(config)
+    if tracer is not None:
+        set_tracer(tracer)
+    scheduler = __create_scheduler(interval, devices, fleet_poller, measurement_pipeline,
+                                   config.getSchedulerAdaptive(), tracer, config.getTracingExportInterval())
+    __add_config_reload_job(scheduler, config, functools.partial(__apply_config_changes, scheduler, fleet_poller,
+                                                                 measurement_pipeline, sinks,
+                                                                 config.getSchedulerAdaptive()))
+    metrics_server = __create_metrics_server(config)
+    await __start_sinks(sinks)
+    await measurement_pipeline.start()
+    await fleet_poller.start()
+    if metrics_server is not None:
+        await metrics_server.start()
+    try:
+        await scheduler.run()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.close()
+        await scheduler.stop()
+        await fleet_poller.stop()
+        await measurement_pipeline.close()
+        await __close_sinks(sinks)
+        if tracer is not None:
+            tracer.close()
+
+
+def __create_collectors(config, interval, devices, poller_options, log_level, log_format):
+    collectors = []
+    assignments = assign_devices(devices, interval, config.getGatewayCollectors(), poller_options['adapters'])
+    for index, (collector_devices, collector_adapters) in enumerate(assignments):
+        name = "collector-{0}".format(index)
+        collector_poller_options = dict(poller_options, adapters=collector_adapters)
+        if poller_options['device_info_cache_file']:
+            # Collectors must not overwrite each other's device info cache
+            root, extension = os.path.splitext(poller_options['device_info_cache_file'])
+            collector_poller_options['device_info_cache_file'] = "{0}.{1}{2}".format(root, name, extension)
+        log.info("Collector {0}: {1} device(s), adapters: {2}".format(name, len(collector_devices),
+                                                                     collector_adapters))
+        collectors.append({
+            "name": name,
+            "devices": collector_devices,
+            "interval": interval,
+            "adaptive": config.getSchedulerAdaptive(),
+            "poller_options": collector_poller_options,
+            "put_timeout": config.getGatewayPutTimeout(),
+            "log_level": log_level,
+            "log_format": log_format,
+            "forward_metrics": config.getMetricsEnabled(),
+            "tracing_sample_rate": config.getTracingSampleRate() if config.getTracingEnabled() else None,
+            "telemetry_interval": config.getTracingExportInterval()
+        })
+    return collectors
+
+
+def __create_gateway(config, interval, devices, poller_options, log_level, log_format):
+    return Gateway(__create_collectors(config, interval, devices, poller_options, log_level, log_format),
+                   queue_size=config.getGatewayQueueSize(),
+                   max_pending_publishes=config.getGatewayMaxPendingPublishes())
+
+
+async def __log_gateway_metrics(gateway, measurement_pipeline):
+    log.info("Gateway: {0}".format(gateway.get_metrics()))
+    if measurement_pipeline.measurement_filter is not None:
+        log.info("Measurement filter: {0}".format(measurement_pipeline.measurement_filter.get_metrics()))
+    if measurement_pipeline.window_aggregator is not None:
+        log.info("Window aggregator: {0}".format(measurement_pipeline.window_aggregator.get_metrics()))
+
+
+async def __apply_gateway_config_changes(scheduler, gateway, measurement_pipeline, sinks, poller_options, log_level,
+                                         log_format, old_config, new_config):
+    # Same as __apply_config_changes, collectors are restarted with the old configuration when restarting them fails
+    __validate_config(new_config)
+    __log_restart_required_changes(old_config, new_config)
+    # Devices are assigned to collectors again, collectors with changed devices or interval are restarted
+    interval = new_config.getSchedulerDelay()
+    collectors = __create_collectors(new_config, interval, new_config.getAirthingsWavePlusDevices(), poller_options,
+                                     log_level, log_format)
+    changed_names, started_sinks = await __start_changed_sinks(old_config, new_config)
+    try:
+        await gateway.update_collectors(collectors)
+    except Exception:
+        await __close_sinks(started_sinks)
+        await gateway.update_collectors(__create_collectors(old_config, old_config.getSchedulerDelay(),
+                                                            old_config.getAirthingsWavePlusDevices(), poller_options,
+                                                            log_level, log_format))
+        raise
+    await __replace_sinks(new_config, changed_names, started_sinks, sinks, measurement_pipeline)
+    if interval != old_config.getSchedulerDelay():
+        scheduler.add_job("gateway-metrics", interval, functools.partial(__log_gateway_metrics, gateway,
+                                                                          measurement_pipeline), phase=interval)
+
+
+async def __run_gateway(interval, config, gateway, poller_options, log_level, log_format):
+    # Publisher process: measurements of all collectors are published through one set of sinks
+    sinks = __create_sinks(config)
+    measurement_pipeline = __create_measurement_pipeline(config, sinks)
+    tracer = __create_tracer(config)
+    if tracer is not None:
+        set_tracer(tracer)
+    scheduler = DeadlineScheduler()
+    scheduler.add_job("gateway-supervision", 10, gateway.supervise, phase=10)
+    scheduler.add_job("gateway-metrics", interval, functools.partial(__log_gateway_metrics, gateway,
+                                                                      measurement_pipeline), phase=interval)
+    if measurement_pipeline.window_aggregator is not None:
+        scheduler.add_job("aggregation-close", 60, measurement_pipeline.window_aggregator.close_expired, phase=60)
+    if measurement_pipeline.time_series_store is not None:
+        scheduler.add_job("rolling-aggregates", 60, measurement_pipeline.update_rolling_aggregates, phase=60)
+    if tracer is not None:
+        scheduler.add_job("span-export", config.getTracingExportInterval(), __export_spans)
+    __add_config_reload_job(scheduler, config, functools.partial(__apply_gateway_config_changes, scheduler, gateway,
+                                                                 measurement_pipeline, sinks, poller_options,
+                                                                 log_level, log_format))
+    metrics_server = __create_metrics_server(config)
+    await __start_sinks(sinks)
+    await measurement_pipeline.start()
+    await gateway.start(measurement_pipeline)
+    if metrics_server is not None:
+        await metrics_server.start()
+    try:
+        await scheduler.run()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.close()
+        await scheduler.stop()
+        await gateway.close()
+        await measurement_pipeline.close()
+        await __close_sinks(sinks)
+        if tracer is not None:
+            tracer.close()
 
 
 def __create_log_directory_if_it_does_not_exist():
@@ -100,6 +541,7 @@ if __name__ == "__main__":
 
     # Load configuration provided in config.yml or config.yaml file
     app_config = Config("config.yml" if os.path.exists("./config.yml") else "config.yaml")
+    __validate_config(app_config)
 
     # Generic logging format
     logging_format = '%(asctime)s %(levelname)s (%(name)s): %(message)s'
@@ -137,7 +579,50 @@ if __name__ == "__main__":
     # Configure scheduler
     log = logging.getLogger(__name__)
     log.info("Scheduler delay: {0}s".format(app_config.getSchedulerDelay()))
-    scheduler_delay = app_config.getSchedulerDelay() if app_config.getSchedulerDelay() is not None else 300
+    scheduler_delay = app_config.getSchedulerDelay()
+
+    # Configure profiling of read-publish cycles
+    log.info("Profiling: {0}".format(app_config.getProfilingEnabled()))
+    if app_config.getProfilingEnabled():
+        cycle_profiler = CycleProfiler(app_config.getProfilingEveryNCycles(),
+                                       app_config.getProfilingDirectory(),
+                                       app_config.getProfilingEngine())
+
+    # Configure polling of all configured devices
+    devices = app_config.getAirthingsWavePlusDevices()
+    log.info("Configured devices: {0}".format(devices))
+    log.info("Max concurrent BLE connections: {0}".format(app_config.getAirthingsWavePlusMaxConcurrentConnections()))
+    log.info("Passive mode: {0}".format(app_config.getAirthingsWavePlusPassiveMode()))
+    log.info("Persistent connections: {0}".format(app_config.getAirthingsWavePlusPersistentConnections()))
+    log.info("Bluetooth adapters: {0} (strategy: {1})".format(app_config.getAirthingsWavePlusAdapters(),
+                                                              app_config.getAirthingsWavePlusAdapterStrategy()))
+    log.info("Deduplicate measurements: {0}".format(app_config.getSchedulerDeduplicate()))
+    poller_options = {
+        "max_concurrent_connections": app_config.getAirthingsWavePlusMaxConcurrentConnections(),
+        "discovery_cache_ttl": app_config.getAirthingsWavePlusDiscoveryCacheTTL(),
+        "passive_mode": app_config.getAirthingsWavePlusPassiveMode(),
+        "measurement_max_age": app_config.getAirthingsWavePlusMeasurementMaxAge(),
+        "device_info_cache_ttl": app_config.getAirthingsWavePlusDeviceInfoCacheTTL(),
+        "device_info_cache_file": app_config.getAirthingsWavePlusDeviceInfoCacheFile(),
+        "persistent_connections": app_config.getAirthingsWavePlusPersistentConnections(),
+        "reconnect_backoff_initial_delay": app_config.getAirthingsWavePlusReconnectBackoffInitialDelay(),
+        "reconnect_backoff_max_delay": app_config.getAirthingsWavePlusReconnectBackoffMaxDelay(),
+        "deduplicate_measurements": app_config.getSchedulerDeduplicate(),
+        "refresh_period": app_config.getSchedulerRefreshPeriod(),
+        "read_margin": app_config.getSchedulerReadMargin(),
+        "adapters": app_config.getAirthingsWavePlusAdapters(),
+        "adapter_strategy": app_config.getAirthingsWavePlusAdapterStrategy(),
+        "adapter_stall_timeout": app_config.getAirthingsWavePlusAdapterStallTimeout(),
+        "adapter_failover_threshold": app_config.getAirthingsWavePlusAdapterFailoverThreshold(),
+        "adapter_stall_cooldown": app_config.getAirthingsWavePlusAdapterStallCooldown()
+    }
 
     # Run periodical function
-    asyncio.run(__process_function_periodically(scheduler_delay, __read_and_process_sensor_data, app_config))
+    log.info("Gateway mode: {0}".format(app_config.getGatewayEnabled()))
+    if app_config.getGatewayEnabled():
+        gateway = __create_gateway(app_config, scheduler_delay, devices, poller_options,
+                                   app_config.get_log_console_level(), logging_format)
+        asyncio.run(__run_gateway(scheduler_delay, app_config, gateway, poller_options,
+                                  app_config.get_log_console_level(), logging_format))
+    else:
+        asyncio.run(__run(scheduler_delay, devices, app_config, FleetPoller(devices, **poller_options)))
@@ -0,0 +1,82 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from AirthingsWavePlus.airthings_wave_plus import AirthingsWavePlus
+from AirthingsWavePlus.device_info_cache import DeviceInfoCache
+from AirthingsWavePlus.fleet_poller import FleetPoller
+from Benchmarks.pipeline_benchmark import benchmark_publisher_throughput
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+from Serialization.serializers import SERIALIZERS
+
+pytest.importorskip("pytest_benchmark")
+
+# BLE latencies scaled down a hundred times, so a benchmark round takes milliseconds
+PROFILE = SimulationProfile(time_scale=0.01)
+
+
+@pytest.fixture
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_cycle_latency(benchmark, event_loop):
+    environment = SimulatedEnvironment(1, PROFILE)
+    device = environment.get_advertisements()[0]
+    reader = AirthingsWavePlus(device.address, None, DeviceInfoCache())
+    with simulated_bleak(environment):
+        measurements = benchmark.pedantic(lambda: event_loop.run_until_complete(reader.read_sensor_data(device)),
+                                          rounds=20, warmup_rounds=1)
+    assert measurements is not None
+
+
+@pytest.mark.parametrize("max_concurrent_connections", [1, 4])
+def test_fleet_throughput(benchmark, event_loop, max_concurrent_connections):
+    environment = SimulatedEnvironment(20, PROFILE)
+    with simulated_bleak(environment):
+        fleet_poller = FleetPoller([{'mac_address': device.mac_address} for device in environment.devices],
+                                   max_concurrent_connections)
+        event_loop.run_until_complete(fleet_poller.start())
+        try:
+            measurements = benchmark.pedantic(lambda: event_loop.run_until_complete(fleet_poller.poll()), rounds=3)
+        finally:
+            event_loop.run_until_complete(fleet_poller.stop())
+    benchmark.extra_info['devices'] = len(environment.devices)
+    assert len(measurements) == len(environment.devices)
+
+
+@pytest.mark.parametrize("format_name", sorted(SERIALIZERS))
+def test_serialization(benchmark, format_name):
+    serializer = SERIALIZERS[format_name]
+    sensor_measurements = create_sample_measurements()
+    payload = benchmark(serializer.serialize, sensor_measurements)
+    benchmark.extra_info['bytes_per_message'] = len(payload)
+
+
+@pytest.mark.parametrize("batch_max_wait", [None, 0.05], ids=["unbatched", "batched"])
+def test_publisher_throughput(benchmark, event_loop, batch_max_wait):
+    messages = 500
+    results = benchmark.pedantic(lambda: event_loop.run_until_complete(benchmark_publisher_throughput(
+        messages, concurrency=100 if batch_max_wait is None else messages, batch_max_wait=batch_max_wait)), rounds=3)
+    benchmark.extra_info['messages'] = messages
+    assert results['publish_failures'] == 0
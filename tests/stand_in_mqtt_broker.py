@@ -0,0 +1,77 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import struct
+
+
+class StandInMqttBroker:
+    # Minimal MQTT 3.1.1 broker: accepts connections (optionally after a delay), acknowledges QoS 1 publishes
+    def __init__(self, connack_delay=0.0):
+        self.connack_delay = connack_delay
+        self.connections = 0
+        self.messages = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.__handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    async def __read_packet(reader):
+        header = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7f) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, await reader.readexactly(length)
+
+    async def __handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                header, body = await self.__read_packet(reader)
+                packet_type = header >> 4
+                if packet_type == 1:
+                    await asyncio.sleep(self.connack_delay)
+                    writer.write(b"\x20\x02\x00\x00")
+                elif packet_type == 3:
+                    qos = (header >> 1) & 3
+                    topic_length = struct.unpack(">H", body[:2])[0]
+                    topic = body[2:2 + topic_length].decode()
+                    offset = 2 + topic_length
+                    if qos:
+                        writer.write(b"\x40\x02" + body[offset:offset + 2])
+                        offset += 2
+                    self.messages.append((topic, body[offset:], qos))
+                elif packet_type == 12:
+                    writer.write(b"\xd0\x00")
+                elif packet_type == 14:
+                    break
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
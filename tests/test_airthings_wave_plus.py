@@ -0,0 +1,47 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+import pytest
+
+from AirthingsWavePlus.airthings_wave_plus import AirthingsWavePlus
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+
+
+def read_twice(environment, break_second_read):
+    async def read():
+        reader = AirthingsWavePlus(environment.devices[0].mac_address, None)
+        first = await reader.read_sensor_data()
+        break_second_read(environment.devices[0])
+        with pytest.raises(Exception, match="Missing control point data"):
+            await reader.read_sensor_data()
+        return first
+
+    with simulated_bleak(environment):
+        return asyncio.run(read())
+
+
+def test_lost_notification_does_not_reuse_previous_control_point_data():
+    environment = SimulatedEnvironment(1, SimulationProfile(time_scale=0.01))
+    assert read_twice(environment, lambda device: setattr(environment.profile, 'notification_loss_rate', 1.0))
+
+
+def test_wrong_length_notification_does_not_reuse_previous_control_point_data(monkeypatch):
+    environment = SimulatedEnvironment(1, SimulationProfile(time_scale=0.01))
+    assert read_twice(environment, lambda device: monkeypatch.setattr(
+        device, 'get_control_point_response', lambda: bytearray(4)))
@@ -0,0 +1,185 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import dataclasses
+import functools
+import logging
+
+import pytest
+
+import app
+from Config.config_watcher import ConfigWatcher
+from Config.yaml_config import Config
+from Pipeline.measurement_pipeline import MeasurementPipeline
+from Pipeline.publisher_fanout import PublisherFanout
+from Scheduler.deadline_scheduler import DeadlineScheduler
+
+CONFIG = """
+airthings_wave_plus:
+  devices:
+    - serial_number: {serial_number}
+scheduler:
+  delay: 300
+publishers:
+  file:
+    enabled: True
+    path: {path}
+    format: {format}
+filter:
+  enabled: True
+  delta_only: {delta_only}
+"""
+
+
+def write_config(path, serial_number=1, sink_path="./published.log", message_format="json", delta_only=False):
+    path.write_text(CONFIG.format(serial_number=serial_number, path=sink_path, format=message_format,
+                                  delta_only=delta_only))
+    return str(path)
+
+
+class StandInFleetPoller:
+    # Tracks devices like FleetPoller, adding a device with a serial number in failing_serial_numbers raises
+    def __init__(self, devices, failing_serial_numbers=()):
+        self.devices = []
+        self.active_devices = []
+        self.failing_serial_numbers = failing_serial_numbers
+        for device in devices:
+            self.add_device(device)
+        self.readers = self
+
+    def __getitem__(self, index):
+        return self
+
+    def get_device_identifier(self):
+        return "device"
+
+    @staticmethod
+    def get_device_key(device):
+        return device.get('mac_address'), device.get('serial_number')
+
+    def get_device_index(self, device):
+        keys = [self.get_device_key(known_device) for known_device in self.devices]
+        return keys.index(self.get_device_key(device)) if self.get_device_key(device) in keys else None
+
+    def add_device(self, device):
+        if device.get('serial_number') in self.failing_serial_numbers:
+            raise Exception("Device cannot be added")
+        index = self.get_device_index(device)
+        if index is None:
+            self.devices.append(device)
+            self.active_devices.append(True)
+            return len(self.devices) - 1
+        self.active_devices[index] = True
+        return index
+
+    async def remove_device(self, index):
+        self.active_devices[index] = False
+
+    def get_active_serial_numbers(self):
+        return [device['serial_number'] for device, active in zip(self.devices, self.active_devices) if active]
+
+
+def test_missing_options_get_defaults(tmp_path):
+    path = tmp_path / "config.yml"
+    path.write_text("scheduler:\n  delay:\n")
+    config = Config(str(path))
+
+    assert config.getSchedulerDelay() == 300
+    assert config.getSpoolFile() == "./spool.db"
+    assert config.getAggregationPublishMeasurements() is True
+    assert config.getAggregationWindows() == [{'size': 900, 'hop': None}, {'size': 3600, 'hop': None}]
+    assert config.getAirthingsWavePlusDevices() == [{'mac_address': None, 'serial_number': None, 'interval': None,
+                                                     'phase': None, 'adapter': None}]
+    assert config.get_log_console_level() == "INFO"
+
+
+def test_template_is_valid():
+    config = Config("config-template.yml")
+
+    assert config.getPublishers()['mqtt'].options['tls']['ca_certs'] is None
+    assert config.getFilterDeadbands()['co2_level'] == {'absolute': 25, 'relative': 5}
+
+
+def test_unknown_options_and_invalid_values_are_reported(tmp_path):
+    path = tmp_path / "config.yml"
+    path.write_text("scheduler:\n  dealy: 60\nspool:\n  max_entries: many\npublishers:\n  file:\n    pth: ./x.log\n"
+                    "  archive:\n    type: ftp\n")
+
+    with pytest.raises(Exception) as error:
+        Config(str(path))
+
+    assert "scheduler.dealy is not a known option" in str(error.value)
+    assert "spool.max_entries has an invalid value: many" in str(error.value)
+    assert "publishers.file.pth is not a known option" in str(error.value)
+    assert "publishers.archive has an unsupported sink type: ftp" in str(error.value)
+
+
+def test_settings_are_immutable(tmp_path):
+    config = Config(write_config(tmp_path / "config.yml"))
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.settings.scheduler.delay = 60
+    with pytest.raises(TypeError):
+        config.getPublishers()['file'].options['path'] = "./other.log"
+
+
+async def __reload(tmp_path, monkeypatch, new_config_options, failing_serial_numbers=()):
+    monkeypatch.setattr(app, "log", logging.getLogger("app"), raising=False)
+    path = tmp_path / "config.yml"
+    config = Config(write_config(path, sink_path=str(tmp_path / "old.log")))
+    sinks = {'file': app.__create_sinks(config)['file']}
+    pipeline = MeasurementPipeline(PublisherFanout())
+    app.__add_publisher_sink(config, pipeline.publisher_fanout, 'file', sinks['file'])
+    fleet_poller = StandInFleetPoller(config.getAirthingsWavePlusDevices(), failing_serial_numbers)
+    watcher = ConfigWatcher(config, functools.partial(app.__apply_config_changes, DeadlineScheduler(), fleet_poller,
+                                                      pipeline, sinks, False))
+    old_sink = sinks['file']
+
+    write_config(path, **new_config_options)
+    await watcher.check()
+    return config, watcher, sinks, old_sink, pipeline, fleet_poller
+
+
+def test_failed_reload_of_devices_keeps_sinks_and_devices(tmp_path, monkeypatch):
+    config, watcher, sinks, old_sink, pipeline, fleet_poller = asyncio.run(__reload(
+        tmp_path, monkeypatch, {'serial_number': 3, 'sink_path': str(tmp_path / "new.log")}, failing_serial_numbers=(3,)))
+
+    assert watcher.config is config
+    assert sinks == {'file': old_sink}
+    assert [fanout_sink.sink for fanout_sink in pipeline.publisher_fanout.sinks] == [old_sink]
+    assert fleet_poller.get_active_serial_numbers() == [1]
+
+
+def test_reload_is_validated_as_a_whole(tmp_path, monkeypatch):
+    # Delta-only publishing leaves out metrics, which the struct format cannot encode
+    config, watcher, sinks, old_sink, pipeline, fleet_poller = asyncio.run(__reload(
+        tmp_path, monkeypatch, {'serial_number': 2, 'message_format': "struct", 'delta_only': True}))
+
+    assert watcher.config is config
+    assert sinks == {'file': old_sink}
+    assert fleet_poller.get_active_serial_numbers() == [1]
+
+
+def test_reload_applies_sinks_and_devices(tmp_path, monkeypatch):
+    config, watcher, sinks, old_sink, pipeline, fleet_poller = asyncio.run(__reload(
+        tmp_path, monkeypatch, {'serial_number': 2, 'sink_path': str(tmp_path / "new.log")}))
+
+    assert watcher.config is not config
+    assert sinks['file'] is not old_sink
+    assert [fanout_sink.sink for fanout_sink in pipeline.publisher_fanout.sinks] == [sinks['file']]
+    assert fleet_poller.get_active_serial_numbers() == [2]
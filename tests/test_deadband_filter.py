@@ -0,0 +1,55 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy
+from datetime import datetime, timedelta
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from Pipeline.deadband_filter import DeadbandFilter
+
+
+def create_ticks(count, interval=300):
+    sample = create_sample_measurements()
+    start = datetime(2024, 1, 1)
+    ticks = []
+    for index in range(count):
+        sensor_measurement = copy.copy(sample)
+        sensor_measurement.timestamp = start + timedelta(seconds=index * interval)
+        # One metric keeps changing, all others stay the same
+        sensor_measurement.co2_level = sample.co2_level + index * 50
+        ticks.append(sensor_measurement)
+    return ticks
+
+
+def test_heartbeat_resends_unchanged_metrics_while_another_metric_keeps_changing():
+    deadband_filter = DeadbandFilter({'co2_level': {'absolute': 10}}, heartbeat_interval=3600, delta_only=True)
+    published = [deadband_filter.filter(sensor_measurement) for sensor_measurement in create_ticks(25)]
+    full_ticks = [index for index, sensor_measurement in enumerate(published)
+                  if sensor_measurement is not None and sensor_measurement.temperature is not None]
+    assert full_ticks == [0, 12, 24]
+    assert all(sensor_measurement is not None and sensor_measurement.co2_level is not None
+               for sensor_measurement in published)
+
+
+def test_unchanged_measurements_are_suppressed_until_heartbeat():
+    deadband_filter = DeadbandFilter(heartbeat_interval=3600)
+    ticks = create_ticks(13)
+    for sensor_measurement in ticks:
+        sensor_measurement.co2_level = ticks[0].co2_level
+    published = [deadband_filter.filter(sensor_measurement) for sensor_measurement in ticks]
+    assert [index for index, sensor_measurement in enumerate(published) if sensor_measurement is not None] == [0, 12]
+    assert deadband_filter.get_metrics() == {"passed": 2, "suppressed": 11}
@@ -0,0 +1,199 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+from Scheduler.deadline_scheduler import DeadlineScheduler, VirtualClock
+
+
+async def advance_until(clock, until):
+    while clock.time() < until:
+        await asyncio.sleep(0)
+
+
+async def cancel(task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def run_for(scheduler, clock, until):
+    run_task = asyncio.get_running_loop().create_task(scheduler.run())
+    await advance_until(clock, until)
+    await cancel(run_task)
+    await scheduler.stop()
+
+
+def test_ticks_stay_on_grid_without_drift():
+    clock = VirtualClock(1000.0)
+    scheduler = DeadlineScheduler(clock)
+    runs = []
+
+    async def tick():
+        runs.append(clock.time())
+
+    job = scheduler.add_job("tick", 10, tick, phase=3)
+    asyncio.run(run_for(scheduler, clock, 1000.0 + 10 * 1000))
+    assert runs[:1000] == [1003.0 + 10 * index for index in range(1000)]
+    assert job.max_lag == 0.0 and job.skipped_ticks == 0
+
+
+def test_running_job_skips_ticks_instead_of_queuing():
+    async def scenario():
+        clock = VirtualClock()
+        scheduler = DeadlineScheduler(clock)
+        release = asyncio.Event()
+        runs = []
+
+        async def read():
+            runs.append(clock.time())
+            if len(runs) == 1:
+                await release.wait()
+
+        job = scheduler.add_job("device", 10, read)
+        run_task = asyncio.get_running_loop().create_task(scheduler.run())
+        await advance_until(clock, 35)
+        blocked_runs = list(runs)
+        release.set()
+        await advance_until(clock, clock.time() + 30)
+        await cancel(run_task)
+        await scheduler.stop()
+        return job, blocked_runs, runs
+
+    job, blocked_runs, runs = asyncio.run(scenario())
+    assert blocked_runs == [0.0]
+    assert job.skipped_ticks >= 3
+    # Runs resume on the original grid, skipped ticks are not replayed
+    assert len(runs) > 1 and all(run % 10 == 0 for run in runs)
+    assert len(runs) == len(set(runs))
+
+
+def test_ticks_missed_while_loop_was_blocked_are_skipped():
+    clock = VirtualClock()
+    scheduler = DeadlineScheduler(clock)
+    runs = []
+
+    async def tick():
+        runs.append(clock.time())
+        if len(runs) == 1:
+            # Blocking call inside the event loop
+            clock.now += 35
+
+    job = scheduler.add_job("tick", 10, tick)
+    asyncio.run(run_for(scheduler, clock, 60))
+    # Scheduler was already waiting for the tick at 10 when the loop blocked, so it wakes up at 45
+    assert runs[:3] == [0.0, 45.0, 50.0]
+    assert job.skipped_ticks == 3
+    assert job.max_lag == 35.0
+
+
+def test_phases_stagger_jobs_across_interval():
+    clock = VirtualClock()
+    scheduler = DeadlineScheduler(clock)
+    runs = {}
+
+    def create_callback(name):
+        async def tick():
+            runs.setdefault(name, []).append(clock.time())
+        return tick
+
+    for position in range(4):
+        scheduler.add_job("device-{0}".format(position), 20, create_callback(position), phase=position * 5 + 20)
+    asyncio.run(run_for(scheduler, clock, 50))
+    # Phase is taken modulo the interval
+    assert {name: times[:2] for name, times in runs.items()} == {
+        position: [position * 5.0, position * 5.0 + 20] for position in range(4)}
+
+
+def test_reschedule_moves_next_deadline():
+    clock = VirtualClock()
+    scheduler = DeadlineScheduler(clock)
+    runs = []
+
+    async def read():
+        runs.append(clock.time())
+        if len(runs) == 1:
+            scheduler.reschedule("device", 5)
+
+    scheduler.add_job("device", 100, read)
+    scheduler.reschedule("unknown", 1)
+    asyncio.run(run_for(scheduler, clock, 250))
+    assert runs[:3] == [0.0, 5.0, 105.0]
+
+
+def test_replaced_job_waits_for_running_task_and_keeps_its_deadline():
+    async def scenario():
+        clock = VirtualClock()
+        scheduler = DeadlineScheduler(clock)
+        release = asyncio.Event()
+        new_runs = []
+
+        async def old_read():
+            await release.wait()
+            scheduler.reschedule("device", 1000)
+
+        async def new_read():
+            new_runs.append(clock.time())
+
+        scheduler.add_job("device", 10, old_read)
+        run_task = asyncio.get_running_loop().create_task(scheduler.run())
+        await advance_until(clock, 1)
+        job = scheduler.add_job("device", 10, new_read)
+        await advance_until(clock, 25)
+        # Replacement must not race the read that is still running
+        assert new_runs == []
+        release.set()
+        await job.task
+        released_at = clock.time()
+        while not new_runs:
+            await asyncio.sleep(0)
+        await cancel(run_task)
+        await scheduler.stop()
+        return job, new_runs, released_at
+
+    job, new_runs, released_at = asyncio.run(scenario())
+    # Reschedule from the replaced run is ignored, the replacement runs on its next tick
+    assert released_at <= new_runs[0] <= released_at + 10
+    assert job.skipped_ticks >= 2
+
+
+def test_stop_waits_for_running_task_of_removed_job():
+    async def scenario():
+        clock = VirtualClock()
+        scheduler = DeadlineScheduler(clock)
+        release = asyncio.Event()
+        finished = []
+
+        async def read():
+            await release.wait()
+            finished.append(True)
+
+        scheduler.add_job("device", 10, read)
+        run_task = asyncio.get_running_loop().create_task(scheduler.run())
+        await advance_until(clock, 1)
+        scheduler.remove_job("device")
+        await cancel(run_task)
+        stop_task = asyncio.get_running_loop().create_task(scheduler.stop())
+        await asyncio.sleep(0)
+        assert not stop_task.done()
+        release.set()
+        await stop_task
+        return finished
+
+    assert asyncio.run(scenario()) == [True]
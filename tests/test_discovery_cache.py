@@ -0,0 +1,41 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import types
+
+from AirthingsWavePlus.discovery_cache import DiscoveryCache
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+
+
+def test_scan_caches_airthings_devices_only():
+    environment = SimulatedEnvironment(2, SimulationProfile(scan_latency=0.0, jitter=0.0))
+    airthings_advertisements = environment.get_advertisements()
+    other_devices = [types.SimpleNamespace(address="11:22:33:44:55:66", rssi=-50,
+                                           metadata={'manufacturer_data': {76: b"\x02\x15"}}),
+                     types.SimpleNamespace(address="11:22:33:44:55:67", rssi=-60, metadata={})]
+    environment.get_advertisements = lambda: airthings_advertisements + other_devices
+    discovery_cache = DiscoveryCache()
+
+    with simulated_bleak(environment):
+        asyncio.run(discovery_cache.scan())
+
+    assert sorted(discovery_cache.devices_by_mac_address) == sorted(device.mac_address.upper()
+                                                                    for device in environment.devices)
+    assert discovery_cache.get(serial_number=environment.devices[1].serial_number).mac_address == \
+           environment.devices[1].mac_address.upper()
+    assert discovery_cache.get("11:22:33:44:55:66") is None
@@ -0,0 +1,155 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import time
+
+from AirthingsWavePlus.fleet_poller import FleetPoller, LAST_ADVERTISEMENT, RSSI
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile, simulated_bleak
+
+CONNECT_LATENCY = 0.01
+
+
+def create_environment(device_count):
+    # Connection setup is serialized per adapter, the GATT traffic of connected devices overlaps
+    return SimulatedEnvironment(device_count, SimulationProfile(scan_latency=0.0,
+                                                                connect_latency=CONNECT_LATENCY,
+                                                                gatt_latency=0.02,
+                                                                notification_latency=0.01,
+                                                                jitter=0.0))
+
+
+def poll_fleet(environment, max_concurrent_connections, devices=None):
+    async def poll():
+        fleet_poller = FleetPoller(devices or [{'mac_address': device.mac_address} for device in environment.devices],
+                                   max_concurrent_connections=max_concurrent_connections)
+        await fleet_poller.start()
+        try:
+            begin = time.perf_counter()
+            measurements = await fleet_poller.poll()
+            return measurements, time.perf_counter() - begin
+        finally:
+            await fleet_poller.stop()
+
+    with simulated_bleak(environment):
+        return asyncio.run(poll())
+
+
+def test_concurrent_connections_divide_polling_time():
+    measurements, connection_time = poll_fleet(create_environment(1), 1)
+    assert len(measurements) == 1
+
+    environment = create_environment(8)
+    sequential_measurements, sequential_time = poll_fleet(environment, 1)
+    concurrent_measurements, concurrent_time = poll_fleet(environment, 4)
+    assert len(sequential_measurements) == len(concurrent_measurements) == 8
+    assert 0.8 * 8 * connection_time < sequential_time < 1.5 * 8 * connection_time
+    # Two rounds of four connections, plus connection setup serialized on the adapter
+    assert concurrent_time < 1.5 * (2 * connection_time + 8 * CONNECT_LATENCY)
+    assert concurrent_time < sequential_time / 2.5
+
+
+def test_failing_devices_do_not_affect_other_devices(monkeypatch):
+    environment = create_environment(6)
+
+    def read_characteristic(char_specifier):
+        raise Exception("Simulated broken device")
+
+    monkeypatch.setattr(environment.devices[1], 'read_characteristic', read_characteristic)
+    devices = [{'mac_address': device.mac_address} for device in environment.devices] + \
+        [{'mac_address': "AA:BB:CC:FF:FF:FF"}]
+    measurements, _ = poll_fleet(environment, 3, devices)
+    expected_addresses = [device.mac_address for index, device in enumerate(environment.devices) if index != 1]
+    assert sorted(measurement.get_device_bluetooth_mac_address() for measurement in measurements) == expected_addresses
+
+
+def test_advertisements_update_presence_metrics_in_passive_mode():
+    environment = SimulatedEnvironment(3, SimulationProfile(advertising_interval=0.01, jitter=0.0))
+    devices = [{'mac_address': environment.devices[0].mac_address.lower()},
+               {'serial_number': environment.devices[1].serial_number}]
+
+    async def listen():
+        fleet_poller = FleetPoller(devices, passive_mode=True)
+        await fleet_poller.start()
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            await fleet_poller.stop()
+        return fleet_poller
+
+    with simulated_bleak(environment):
+        fleet_poller = asyncio.run(listen())
+    for index, device in enumerate(environment.devices[:2]):
+        device_identifier = fleet_poller.readers[index].get_device_identifier()
+        assert RSSI.get(device_identifier) == device.rssi
+        assert LAST_ADVERTISEMENT.get(device_identifier) is not None
+    assert fleet_poller.advertised_device_indexes[(environment.devices[2].mac_address,
+                                                   environment.devices[2].serial_number)] is None
+
+
+def test_device_connect_timeout_is_not_an_adapter_stall(monkeypatch):
+    environment = create_environment(4)
+    unreachable_address = environment.devices[0].mac_address
+    create_client_class = environment.create_client_class
+
+    def create_timing_out_client_class():
+        client_class = create_client_class()
+
+        class TimingOutBleakClient(client_class):
+            async def connect(self, **kwargs):
+                if self.simulated_device.mac_address == unreachable_address:
+                    # Like bleak, which raises asyncio.TimeoutError when a connection is not established in time
+                    raise asyncio.TimeoutError()
+                return await super().connect(**kwargs)
+
+        return TimingOutBleakClient
+
+    monkeypatch.setattr(environment, 'create_client_class', create_timing_out_client_class)
+
+    async def poll():
+        fleet_poller = FleetPoller([{'mac_address': device.mac_address} for device in environment.devices],
+                                   adapters=[{'name': "hci0"}, {'name': "hci1"}],
+                                   adapter_strategy='static')
+        for index in range(len(environment.devices)):
+            fleet_poller.static_adapters[index] = "hci0"
+        await fleet_poller.start()
+        try:
+            return fleet_poller, await fleet_poller.poll()
+        finally:
+            await fleet_poller.stop()
+
+    with simulated_bleak(environment):
+        fleet_poller, measurements = asyncio.run(poll())
+    assert len(measurements) == 3
+    adapters = {adapter.get_label(): adapter for adapter in fleet_poller.adapter_pool.adapters}
+    assert adapters["hci0"].stalls == 0
+    assert adapters["hci0"].failures == 1
+    assert not adapters["hci0"].is_stalled()
+
+
+def test_read_exceeding_stall_timeout_stalls_adapter(monkeypatch):
+    environment = create_environment(1)
+    monkeypatch.setattr(environment.profile, 'connect_latency', 10.0)
+
+    async def poll():
+        fleet_poller = FleetPoller([{'mac_address': environment.devices[0].mac_address}], adapter_stall_timeout=0.1)
+        return fleet_poller, await fleet_poller.poll()
+
+    with simulated_bleak(environment):
+        fleet_poller, measurements = asyncio.run(poll())
+    assert measurements == []
+    assert fleet_poller.adapter_pool.adapters[0].stalls == 1
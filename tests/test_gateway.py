@@ -0,0 +1,91 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import logging
+
+from Benchmarks.gateway_benchmark import run_simulated_collector
+from Benchmarks.simulated_device import SimulatedEnvironment, SimulationProfile
+from Gateway.gateway import Gateway, assign_devices
+from Metrics.metrics_registry import REGISTRY
+from Pipeline.measurement_pipeline import MeasurementPipeline
+from Pipeline.publisher_fanout import PublisherFanout
+from Tracing.tracer import NoopTracer, Tracer, set_tracer
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def close(self):
+        pass
+
+
+def test_collectors_forward_metrics_and_spans_to_publisher_process():
+    profile = SimulationProfile(time_scale=0.01)
+    environment = SimulatedEnvironment(4, profile)
+    device_configs = [{'mac_address': device.mac_address} for device in environment.devices]
+    gateway = Gateway([{
+        "name": "forwarding-collector-{0}".format(index),
+        "devices": collector_devices,
+        "interval": 1,
+        "device_count": len(environment.devices),
+        "profile_options": profile.to_dict(),
+        "log_level": logging.WARNING,
+        "forward_metrics": True,
+        "tracing_sample_rate": 1.0,
+        "telemetry_interval": 0.2
+    } for index, (collector_devices, _) in enumerate(assign_devices(device_configs, 1, 2))],
+        collector_target=run_simulated_collector)
+    exporter = RecordingExporter()
+    tracer = Tracer(exporter)
+
+    async def run():
+        measurement_pipeline = MeasurementPipeline(PublisherFanout())
+        await measurement_pipeline.start()
+        await gateway.start(measurement_pipeline)
+        try:
+            for _ in range(200):
+                await asyncio.sleep(0.1)
+                tracer.flush()
+                if all(name in REGISTRY.remote_snapshots for name in gateway.processes) and \
+                        gateway.reader.received >= 4 and exporter.spans:
+                    break
+        finally:
+            await gateway.close()
+            await measurement_pipeline.close()
+        tracer.flush()
+
+    set_tracer(tracer)
+    try:
+        asyncio.run(run())
+    finally:
+        set_tracer(NoopTracer())
+
+    try:
+        for index in range(2):
+            snapshot = REGISTRY.remote_snapshots["forwarding-collector-{0}".format(index)]
+            assert sum(snapshot["airthings_reads_total"].values()) > 0
+        assert 'airthings_reads_total{device="AA:BB:CC:00:00:00",result="success"}' in REGISTRY.render()
+    finally:
+        for index in range(2):
+            REGISTRY.remove_remote("forwarding-collector-{0}".format(index))
+    span_names = {span.name for span in exporter.spans}
+    assert {"poll_device", "connect"} <= span_names
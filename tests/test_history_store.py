@@ -0,0 +1,108 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import datetime
+
+import pytest
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from History.history_store import HistoryStore
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def create_measurements(serial_number, minutes):
+    sensor_measurements = create_sample_measurements()
+    sensor_measurements.device_serial_number = serial_number
+    sensor_measurements.timestamp = START + datetime.timedelta(minutes=minutes)
+    sensor_measurements.co2_level = 400 + minutes
+    return sensor_measurements
+
+
+def run_with_store(tmp_path, test, **options):
+    async def run():
+        store = HistoryStore(str(tmp_path / "history.db"), **options)
+        await store.start()
+        try:
+            await test(store)
+        finally:
+            await store.close()
+
+    asyncio.run(run())
+
+
+def test_measurements_are_written_in_batches_and_queried_by_range(tmp_path):
+    async def test(store):
+        for minutes in range(0, 60, 5):
+            await store.add(create_measurements(1234567890, minutes))
+        await store.add(create_measurements(1234567891, 0))
+        # A full batch is written right away, the rest waits for the next flush
+        assert store.written_count == 10
+        assert len(store.pending_rows) == 3
+        await store.flush()
+
+        rows = await store.query_range(1234567890, START.timestamp(), START.timestamp() + 1800)
+        assert [row['co2_level'] for row in rows] == [400, 405, 410, 415, 420, 425]
+        buckets = await store.query_downsampled(1234567890, START.timestamp(), START.timestamp() + 3600, 1800,
+                                                'co2_level')
+        assert [(bucket['count'], bucket['min'], bucket['max'], bucket['mean']) for bucket in buckets] == \
+               [(6, 400, 425, 412.5), (6, 430, 455, 442.5)]
+        with pytest.raises(Exception):
+            await store.query_downsampled(1234567890, 0, 1, 60, 'serial_number')
+
+    run_with_store(tmp_path, test, batch_size=10)
+
+
+def test_failed_write_keeps_rows_for_the_next_flush(tmp_path):
+    async def test(store):
+        await store.add(create_measurements(1234567890, 0))
+        store.connection.execute("PRAGMA query_only=ON")
+        with pytest.raises(Exception):
+            await store.flush()
+        await store.add(create_measurements(1234567890, 5))
+        assert len(store.pending_rows) == 2
+
+        store.connection.execute("PRAGMA query_only=OFF")
+        await store.flush()
+        rows = await store.query_range(1234567890, START.timestamp(), START.timestamp() + 3600)
+        assert [row['co2_level'] for row in rows] == [400, 405]
+
+    run_with_store(tmp_path, test)
+
+
+def test_measurements_without_serial_number_are_not_stored(tmp_path):
+    async def test(store):
+        await store.add(create_measurements(None, 0))
+        assert store.pending_rows == []
+
+    run_with_store(tmp_path, test)
+
+
+def test_expired_measurements_of_all_devices_are_deleted(tmp_path):
+    async def test(store):
+        for serial_number in (1234567890, 1234567891, 1234567892):
+            for minutes in range(0, 60, 5):
+                await store.add(create_measurements(serial_number, minutes))
+        await store.flush()
+
+        assert await store.delete_expired(now=START.timestamp() + 3600) == 3 * 6
+        for serial_number in (1234567890, 1234567891, 1234567892):
+            rows = await store.query_range(serial_number, 0, START.timestamp() + 3600)
+            assert [row['co2_level'] for row in rows] == [430, 435, 440, 445, 450, 455]
+
+    run_with_store(tmp_path, test, retention=1800)
@@ -0,0 +1,78 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import time
+
+import Kafka.kafka_publisher
+from Benchmarks.simulated_brokers import SimulatedBroker, SimulatedKafkaProducer
+from Kafka.kafka_publisher import KafkaPublisher
+from Sinks.kafka_sinks import KafkaSink
+
+
+def create_counting_producer_class(broker):
+    class CountingKafkaProducer(SimulatedKafkaProducer):
+        instances = 0
+
+        def __init__(self, **configs):
+            super().__init__(**configs)
+            CountingKafkaProducer.instances += 1
+
+    CountingKafkaProducer.broker = broker
+    return CountingKafkaProducer
+
+
+def wait_for_deliveries(kafka_publisher, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while kafka_publisher.delivered_count + kafka_publisher.failed_count < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_publishes_reuse_one_producer(monkeypatch):
+    broker = SimulatedBroker(0.001)
+    producer_class = create_counting_producer_class(broker)
+    monkeypatch.setattr(Kafka.kafka_publisher, "KafkaProducer", producer_class)
+    kafka_publisher = KafkaPublisher("localhost:9092", "PLAINTEXT", None)
+    try:
+        for index in range(1000):
+            kafka_publisher.publish("airthings", "message-{0}".format(index).encode())
+        wait_for_deliveries(kafka_publisher, 1000)
+    finally:
+        kafka_publisher.close()
+        broker.close()
+    assert producer_class.instances == 1
+    assert broker.received_count == 1000
+    assert kafka_publisher.delivered_count == 1000
+
+
+def test_concurrent_sink_publishes_reuse_one_producer(monkeypatch):
+    broker = SimulatedBroker(0.001)
+    producer_class = create_counting_producer_class(broker)
+    monkeypatch.setattr(Kafka.kafka_publisher, "KafkaProducer", producer_class)
+
+    async def publish():
+        sink = KafkaSink("Kafka", KafkaPublisher("localhost:9092", "PLAINTEXT", None))
+        try:
+            await asyncio.gather(*[sink.publish("message-{0}".format(index).encode(), "airthings")
+                                   for index in range(1000)])
+        finally:
+            await sink.close()
+
+    asyncio.run(publish())
+    broker.close()
+    assert producer_class.instances == 1
+    assert broker.received_count == 1000
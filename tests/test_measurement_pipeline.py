@@ -0,0 +1,49 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from Pipeline.measurement_pipeline import MeasurementPipeline, ROLLING_MEAN, ROLLING_P95
+from TimeSeries.time_series_store import TimeSeriesStore
+
+
+class RecordingFanout:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, sensor_measurement):
+        self.submitted.append(sensor_measurement)
+
+
+def test_rolling_aggregates_are_exported_as_gauges():
+    sensor_measurements = create_sample_measurements()
+    pipeline = MeasurementPipeline(RecordingFanout(), TimeSeriesStore(), windows=(3600, 86400))
+    serial_number = sensor_measurements.device_serial_number
+
+    async def process():
+        for _ in range(3):
+            await pipeline.process(sensor_measurements)
+        # Measurements are only stored, gauges are updated by the periodic job
+        assert ROLLING_MEAN.get(serial_number, 'co2_level') is None
+        await pipeline.update_rolling_aggregates()
+
+    asyncio.run(process())
+    assert ROLLING_MEAN.get(serial_number, 'co2_level') == sensor_measurements.co2_level
+    assert ROLLING_P95.get(serial_number, 'co2_level') == sensor_measurements.co2_level
+    assert ROLLING_MEAN.get(serial_number, 'temperature') is None
+    assert len(pipeline.publisher_fanout.submitted) == 3
@@ -0,0 +1,80 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import threading
+
+import pytest
+
+from MQTT.mqtt_publisher import MqttPublisher
+from tests.stand_in_mqtt_broker import StandInMqttBroker
+
+
+async def publish_messages(broker, qos, count, connack_delay=0.0):
+    broker.connack_delay = connack_delay
+    await broker.start()
+    publisher = MqttPublisher("127.0.0.1", port=broker.port, connect_timeout=5)
+    try:
+        await asyncio.gather(*[publisher.publish_and_wait("airthings", "message-{0}".format(index), qos, False,
+                                                          timeout=5)
+                               for index in range(count)])
+    finally:
+        publisher.close()
+        await broker.close()
+
+
+def test_qos_0_messages_published_right_after_startup_wait_for_the_connection():
+    broker = StandInMqttBroker()
+    asyncio.run(publish_messages(broker, 0, 10, connack_delay=0.3))
+    assert sorted(message[1] for message in broker.messages) == sorted(
+        "message-{0}".format(index).encode() for index in range(10))
+
+
+def test_qos_1_messages_share_one_persistent_connection():
+    broker = StandInMqttBroker()
+    asyncio.run(publish_messages(broker, 1, 200))
+    assert len(broker.messages) == 200
+    assert all(qos == 1 for _, _, qos in broker.messages)
+    assert broker.connections == 1
+
+
+def test_many_concurrent_qos_1_publishes_do_not_deadlock():
+    # Acknowledgements arrive on the network thread while the event loop thread keeps publishing
+    def publish_rounds():
+        for _ in range(10):
+            broker = StandInMqttBroker()
+            asyncio.run(publish_messages(broker, 1, 2000))
+            results.append(len(broker.messages))
+
+    results = []
+    thread = threading.Thread(target=publish_rounds, daemon=True)
+    thread.start()
+    thread.join(120)
+    assert not thread.is_alive(), "Publishing deadlocked"
+    assert results == [2000] * 10
+
+
+def test_publishing_fails_when_the_broker_is_unreachable():
+    async def publish():
+        publisher = MqttPublisher("127.0.0.1", port=1, connect_timeout=0.5)
+        try:
+            await publisher.publish_and_wait("airthings", "message", 0, False)
+        finally:
+            publisher.close()
+
+    with pytest.raises(Exception, match="Not connected"):
+        asyncio.run(publish())
@@ -0,0 +1,88 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import json
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from Pipeline.measurement_spool import MeasurementSpool
+from Pipeline.publisher_fanout import PublisherFanout
+from Serialization.serializers import get_batch_serializer
+from Sinks.sink import Sink
+
+
+class RecordingSink(Sink):
+    def __init__(self, name):
+        super().__init__(name)
+        self.failing = False
+        self.payloads = []
+
+    async def publish(self, payload, topic):
+        if self.failing:
+            raise Exception("Sink unavailable")
+        self.payloads.append(payload)
+
+
+def get_measurement_count(payload):
+    return len(json.loads(payload)['measurements']['serial_num'])
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+def publish_batched(spool_filename, failing):
+    async def scenario():
+        spool = MeasurementSpool(spool_filename)
+        publisher_fanout = PublisherFanout(spool, replay_interval=0.05)
+        sink = RecordingSink("file")
+        sink.failing = failing
+        publisher_fanout.add_sink("file", sink, get_batch_serializer("json"), "airthings", batch_max_wait=60)
+        await publisher_fanout.start()
+
+        tasks = [publisher_fanout.submit(create_sample_measurements()) for _ in range(3)]
+        await wait_until(lambda: len(publisher_fanout.in_flight_spool_ids) == 3)
+        # Measurements waiting for their batch are already in the spool and would survive a crash
+        spooled_while_batched = await spool.fetch("file", 10)
+
+        await publisher_fanout.sinks[0].batcher.flush()
+        results = await asyncio.gather(*tasks)
+        spooled_after_batch = await spool.fetch("file", 10)
+        sink.failing = False
+        await wait_until(lambda: len(sink.payloads) >= 3 if failing else True)
+        await wait_until(lambda: publisher_fanout.spool.entry_count == 0)
+        await publisher_fanout.close()
+        return results, len(spooled_while_batched), len(spooled_after_batch), sink.payloads
+
+    return asyncio.run(scenario())
+
+
+def test_batched_measurements_are_spooled_until_batch_is_delivered(tmp_path):
+    results, spooled_while_batched, spooled_after_batch, payloads = publish_batched(str(tmp_path / "spool.db"), False)
+    assert results == [{"file": True}] * 3
+    assert spooled_while_batched == 3
+    assert spooled_after_batch == 0
+    assert [get_measurement_count(payload) for payload in payloads] == [3]
+
+
+def test_measurements_of_failed_batch_are_replayed_from_spool(tmp_path):
+    results, spooled_while_batched, spooled_after_batch, payloads = publish_batched(str(tmp_path / "spool.db"), True)
+    assert results == [{"file": False}] * 3
+    assert spooled_while_batched == 3
+    assert spooled_after_batch == 3
+    assert [get_measurement_count(payload) for payload in payloads] == [1, 1, 1]
@@ -0,0 +1,239 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import http.server
+import json
+import struct
+import threading
+import types
+
+import pytest
+
+import Sinks.kafka_sinks
+import Sinks.mqtt_sinks
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from Benchmarks.simulated_brokers import SimulatedBroker, simulated_brokers
+from Serialization.serializers import get_serializer, JsonSerializer
+from Sinks.file_sink import FileSink
+from Sinks.http_sink import HttpSink
+from Sinks.kafka_sinks import KafkaSink, AioKafkaSink
+from Sinks.mqtt_sinks import MqttSink, AsyncioMqttSink
+from Sinks.sink_factory import create_sink
+from tests.stand_in_mqtt_broker import StandInMqttBroker
+
+
+class FakeAIOKafkaProducer:
+    instances = []
+
+    def __init__(self, **options):
+        self.options = options
+        self.started = False
+        self.sent = []
+        FakeAIOKafkaProducer.instances.append(self)
+
+    async def start(self):
+        self.started = True
+
+    async def send(self, topic, value):
+        self.sent.append((topic, value))
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result(None)
+        return delivery
+
+    async def send_and_wait(self, topic, value):
+        return await (await self.send(topic, value))
+
+    async def flush(self):
+        pass
+
+    async def stop(self):
+        self.started = False
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_create_sink_defaults_type_to_section_name_and_keeps_legacy_names():
+    with simulated_brokers(SimulatedBroker(), SimulatedBroker()):
+        kafka_sink = create_sink("kafka", {'bootstrap_servers': "localhost:9092"})
+        backup_sink = create_sink("kafka_backup", {'type': "kafka", 'bootstrap_servers': "localhost:9092"})
+    assert isinstance(kafka_sink, KafkaSink) and kafka_sink.name == "Kafka"
+    assert isinstance(backup_sink, KafkaSink) and backup_sink.name == "kafka_backup"
+    with pytest.raises(Exception, match="Unsupported sink type"):
+        create_sink("backup", {})
+
+
+def test_kafka_sink_waits_for_acknowledgement():
+    async def publish(kafka_broker):
+        sink = KafkaSink.from_config("Kafka", {'bootstrap_servers': "localhost:9092"})
+        try:
+            await sink.publish(b"payload", "airthings")
+            kafka_broker.failure_rate = 1.0
+            with pytest.raises(Exception, match="Simulated broker failure"):
+                await sink.publish(b"payload", "airthings")
+        finally:
+            await sink.close()
+
+    kafka_broker = SimulatedBroker(0.01)
+    with simulated_brokers(kafka_broker, SimulatedBroker()):
+        run(publish(kafka_broker))
+    assert kafka_broker.received_count == 2
+
+
+def test_aiokafka_sink_publishes_batches_through_one_producer(monkeypatch):
+    monkeypatch.setattr(Sinks.kafka_sinks, "aiokafka", types.SimpleNamespace(AIOKafkaProducer=FakeAIOKafkaProducer))
+    FakeAIOKafkaProducer.instances = []
+
+    async def publish():
+        sink = AioKafkaSink.from_config("Kafka", {'bootstrap_servers': "localhost:9092", 'linger_ms': 5})
+        await sink.start()
+        await sink.publish(b"first", "airthings")
+        await sink.publish_batch([b"second", b"third"], "airthings")
+        await sink.close()
+
+    run(publish())
+    producer, = FakeAIOKafkaProducer.instances
+    assert producer.options['linger_ms'] == 5
+    assert producer.sent == [("airthings", b"first"), ("airthings", b"second"), ("airthings", b"third")]
+    assert not producer.started
+
+
+def test_aiokafka_sink_requires_aiokafka(monkeypatch):
+    monkeypatch.setattr(Sinks.kafka_sinks, "aiokafka", None)
+    with pytest.raises(Exception, match="pip install aiokafka"):
+        AioKafkaSink("Kafka", "localhost:9092")
+
+
+def test_mqtt_sink_publishes_through_paho_client():
+    async def publish():
+        sink = MqttSink.from_config("MQTT", {'hostname': "localhost", 'qos': 1})
+        await sink.publish_batch([b"first", b"second"], "airthings")
+        await sink.close()
+
+    mqtt_broker = SimulatedBroker(0.001)
+    with simulated_brokers(SimulatedBroker(), mqtt_broker):
+        run(publish())
+    assert mqtt_broker.received_count == 2
+
+
+def test_asyncio_mqtt_sink_publishes_to_stand_in_broker():
+    pytest.importorskip("asyncio_mqtt")
+
+    async def publish():
+        broker = StandInMqttBroker()
+        await broker.start()
+        sink = AsyncioMqttSink.from_config("MQTT", {'hostname': "127.0.0.1", 'port': broker.port, 'qos': 1,
+                                                    'max_inflight_messages': 5})
+        try:
+            await sink.start()
+            await sink.publish_batch(["message-{0}".format(index).encode() for index in range(20)], "airthings")
+        finally:
+            await sink.close()
+            await broker.close()
+        return broker
+
+    broker = run(publish())
+    assert len(broker.messages) == 20
+    assert broker.connections == 1
+
+
+def test_asyncio_mqtt_sink_requires_asyncio_mqtt(monkeypatch):
+    monkeypatch.setattr(Sinks.mqtt_sinks, "asyncio_mqtt", None)
+    with pytest.raises(Exception, match="pip install asyncio-mqtt"):
+        AsyncioMqttSink("MQTT", "localhost")
+
+
+def test_http_sink_posts_each_message_to_topic_url():
+    received = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((self.path, self.headers['Content-Type'], body))
+            self.send_response(204 if self.path != "/failing" else 503)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    async def publish():
+        sink = HttpSink.from_config("http", {'url': "http://127.0.0.1:{0}/{{topic}}".format(server.server_port),
+                                             'content_type': "application/json"})
+        try:
+            await sink.publish('{"a": 1}', "airthings")
+            with pytest.raises(Exception, match="503"):
+                await sink.publish(b"{}", "failing")
+        finally:
+            await sink.close()
+
+    try:
+        run(publish())
+    finally:
+        server.shutdown()
+    assert received[0] == ("/airthings", "application/json", b'{"a": 1}')
+
+
+@pytest.mark.parametrize("framing", ["newline", "length_prefix"])
+def test_file_sink_appends_framed_messages(tmp_path, framing):
+    async def publish():
+        sink = FileSink.from_config("file", {'path': str(tmp_path / "{topic}.log"), 'framing': framing})
+        await sink.publish(b"first", "airthings")
+        await sink.publish_batch([b"second", "third"], "airthings")
+        await sink.close()
+
+    run(publish())
+    content = (tmp_path / "airthings.log").read_bytes()
+    if framing == "newline":
+        assert content == b"first\nsecond\nthird\n"
+    else:
+        messages = []
+        while content:
+            length, = struct.unpack(">I", content[:4])
+            messages.append(content[4:4 + length])
+            content = content[4 + length:]
+        assert messages == [b"first", b"second", b"third"]
+
+
+def test_file_sink_writes_json_messages_on_single_lines(tmp_path):
+    sensor_measurements = create_sample_measurements()
+    sink = FileSink.from_config("file", {'path': str(tmp_path / "{topic}.log"), 'format': JsonSerializer.name})
+    # The default json format is indented, the newline-framed sink replaces it with the same JSON on one line
+    serializer = get_serializer(sink.message_formats.get(JsonSerializer.name, JsonSerializer.name))
+
+    async def publish():
+        await sink.publish(serializer.serialize(sensor_measurements), "airthings")
+        await sink.publish_batch([serializer.serialize(sensor_measurements)] * 2, "airthings")
+        await sink.close()
+
+    run(publish())
+    lines = (tmp_path / "airthings.log").read_bytes().splitlines()
+    assert [json.loads(line) for line in lines] == \
+           [json.loads(get_serializer(JsonSerializer.name).serialize(sensor_measurements))] * 3
+
+
+def test_file_sink_rejects_binary_formats_with_newline_framing(tmp_path):
+    with pytest.raises(Exception):
+        FileSink.from_config("file", {'path': str(tmp_path / "{topic}.log"), 'format': "msgpack"})
+    sink = FileSink.from_config("file", {'path': str(tmp_path / "{topic}.log"), 'format': "msgpack",
+                                         'framing': "length_prefix"})
+    assert sink.message_formats == {}
+    run(sink.close())
@@ -0,0 +1,46 @@
+# MIT License
+# Copyright (c) 2022 Andrej988
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+import math
+
+from Benchmarks.serialization_benchmark import create_sample_measurements
+from TimeSeries.time_series_store import TimeSeriesStore
+
+
+def test_aggregate_covers_samples_of_the_window_after_wrap_around():
+    store = TimeSeriesStore(capacity=4)
+    sensor_measurements = create_sample_measurements()
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    for index, co2_level in enumerate([400, 500, 600, 700, 800, 900]):
+        sensor_measurements.timestamp = start + datetime.timedelta(minutes=5 * index)
+        sensor_measurements.co2_level = co2_level
+        sensor_measurements.radon_short_term_avg = "N/A" if index == 5 else 10 * index
+        store.add(sensor_measurements)
+    now = (start + datetime.timedelta(minutes=25)).timestamp()
+    serial_number = sensor_measurements.device_serial_number
+
+    # The two oldest samples were overwritten, the window of 10 minutes has the last three samples
+    assert store.aggregate(serial_number, 'co2_level', 3600, now=now) == {
+        "count": 4, "min": 600, "max": 900, "mean": 750, "p50": 750, "p95": 885}
+    assert store.aggregate(serial_number, 'co2_level', 600, percentiles=(), now=now) == {
+        "count": 3, "min": 700, "max": 900, "mean": 800}
+    # Missing values are left out
+    assert store.aggregate(serial_number, 'radon_short_term_avg', 3600, now=now)["count"] == 3
+    assert store.aggregate(serial_number, 'co2_level', 60, now=now + 3600) is None
+    assert store.aggregate("unknown", 'co2_level', 3600, now=now) is None
+    assert math.isclose(store.memory_size(), 4 * 8 + 4 * 4 * 7)